@@ -3,18 +3,36 @@ from bs4 import BeautifulSoup
 import time
 import random
 import json
-import re
 import logging
 from discord_webhook import DiscordWebhook, DiscordEmbed
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 from urllib.parse import urljoin, urlparse
 from datetime import datetime
 import os
 import signal
 import sys
-import csv
+import threading
 from collections import defaultdict
+import tracing
+import log_config
+import summary_stats
+import atomic_io
+import catalog_events
+import http_client
+import retry_policy
+import crawl_checkpoint
+import price_analytics
+import price_store
+import variant_store
+import keyword_filter
+import extraction_rules
+import scraper_configs
+import scraper_engine
+import fast_pass
+import seen_index
+import product_store
+import watchlist
+from extraction_rules import PRICE_RANGE_SPLIT, NON_PRICE_CHARS, PRODUCT_ID, SIZE_PREFIX, POUND_AMOUNT, PRICE_CLASS
+from product import Product
 
 
 # Configure directories and logging for Windows
@@ -23,38 +41,31 @@ LOG_DIR = os.path.join(PROJECT_DIR, 'logs')
 STATE_DIR = os.path.join(PROJECT_DIR, 'state')
 CSV_FILE = os.path.join(PROJECT_DIR, 'johnlewisv2.csv')
 PRICE_HISTORY_FILE = os.path.join(STATE_DIR, 'price_history.json')  # Track price changes
+PRICE_HISTORY_DB = price_store.store_path(PRICE_HISTORY_FILE)  # Tiered long-term history
+VARIANT_STORE_FILE = os.path.join(STATE_DIR, 'variants.db')  # Every colour variant, grouped by product
+RETAILER_KEY = 'johnlewis'  # Key in the web app's retailer registry, used for update notifications
 LOG_FILE = os.path.join(LOG_DIR, 'price_monitor.log')  # Unified log
+TRACE_FILE = os.path.join(LOG_DIR, 'trace.jsonl')  # Per-stage timing spans
+CHECKPOINT_FILE = os.path.join(STATE_DIR, 'crawl_checkpoint.jsonl')  # Resume point for an interrupted cycle
+GLOBAL_STATE_FILE = os.path.join(PROJECT_DIR, 'global_state.json')  # Legacy seen_product_ids list
+SEEN_INDEX_PATH = os.path.join(STATE_DIR, 'seen_ids')  # Every product ID ever listed (.ids snapshot + .log)
+PRODUCT_STORE_DB = os.path.join(STATE_DIR, 'products.db')  # Indexed CSV rows; CSV_FILE is its export
+WATCHLIST_DB = watchlist.DEFAULT_PATH  # Users' watches and saved searches: the web app's file (SALESCOUT_WATCHLIST_DB)
 os.makedirs(LOG_DIR, exist_ok=True)
 os.makedirs(STATE_DIR, exist_ok=True)
-logging.basicConfig(
-    filename=LOG_FILE,
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+log_config.setup_logging(LOG_FILE, console=True)
+tracing.configure(TRACE_FILE)
 
 
 # Discord webhook URL for notifications (using main one)
 WEBHOOK_URL = "https://discord.com/api/webhooks/1369560794769133609/g-XtphNUL0kMICbJj88viJ7t4bUSeJMgRUvOFevKZvBJUcWE-jcLke9epNrzaS0uH2Dl"
 
 
-# Multiple category URLs with configs
+# Category URLs and filters come from the shared John Lewis scraper config
+# (optional "excluded_keywords" replaces EXCLUDED_KEYWORDS for that category)
 CATEGORY_URLS = {
-    "John Lewis Branded": {
-        "url": "https://www.johnlewis.com/brand/john-lewis/all-offers/_/N-1z141ilZ1yzvw1q?sortBy=discount",
-        "min_discount": 50.0,
-        "max_pages": 4,
-        "max_products_per_page": 192,
-        "state_file": os.path.join(STATE_DIR, 'category_state.json'),
-        "log_tag": "John Lewis Branded"
-    },
-    "Boots": {
-        "url": "https://www.johnlewis.com/browse/women/womens-boots/all-offers/_/N-7oo3Z1yzvw1q?sortBy=discount",
-        "min_discount": 50.0,
-        "max_pages": 2,
-        "max_products_per_page": 192,
-        "state_file": os.path.join(STATE_DIR, 'boots_state.json'),
-        "log_tag": "Boots"
-    }
+    name: {**config, "state_file": os.path.join(STATE_DIR, config["state_file"])}
+    for name, config in scraper_configs.JOHN_LEWIS["categories"].items()
 }
 
 
@@ -62,22 +73,69 @@ CATEGORY_URLS = {
 USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36"
 
 
-# Merged keywords to exclude (case-insensitive)
-EXCLUDED_KEYWORDS = [
-    "kids", "baby", "bikini", "top", "bra", "hat", "bodysuit", "dress", "pyjama", "boys", "girls", "Knickers", "Blouse", "Cincher", "Children", "Swimsuit", "Skirt", "Briefs"
-]
+# Merged keywords to exclude (case-insensitive, whole words, plurals included)
+EXCLUDED_KEYWORDS = scraper_configs.JOHN_LEWIS["excluded_keywords"]
+
+
+def keyword_matcher(category_name):
+    """Compiled exclusion matcher for a category (built once per keyword list)"""
+    config = CATEGORY_URLS.get(category_name, {})
+    return keyword_filter.matcher_for(config.get("excluded_keywords", EXCLUDED_KEYWORDS))
+
 
+def excluded_keyword(product, category_name):
+    """Matched exclusion keyword for a product ('' if none), cached on the record"""
+    if product.excluded_keyword is None:
+        product.excluded_keyword = keyword_matcher(category_name).search(product.name)
+    return product.excluded_keyword
+
+
+# Shared HTTP client: keep-alive pool sized to the crawl, DNS cache, separate connect/read timeouts
+HTTP_CONFIG = {
+    "concurrency": scraper_configs.JOHN_LEWIS["concurrency"],  # product pages fetched in parallel
+    "connect_timeout": 5,
+    "read_timeout": 15,
+    "http2": False,  # needs httpx[http2]
+    "dns_cache_ttl": 300,  # opts this process into the DNS cache
+    "max_retries": 0  # retries are handled by RETRY_POLICY
+}
+http = http_client.HttpClient(HTTP_CONFIG)
+
+# One retry policy for every request (capped exponential backoff with jitter,
+# honours Retry-After) and a per-host breaker that pauses the crawl when the
+# error rate spikes
+RETRY_POLICY = retry_policy.RetryPolicy({"max_attempts": 3, "base_delay": 2.0, "max_delay": 60.0})
+CIRCUIT_BREAKERS = retry_policy.CircuitBreakers(
+    {"window": 20, "min_requests": 10, "error_rate": 0.5, "cooldown": 1800},
+    on_open=lambda host, rate: send_error_webhook(f"Error rate for {host} hit {rate:.0%}. Pausing requests to it for 30 minutes.")
+)
+# Politeness delay per host, shared by the parallel workers: concurrency
+# overlaps the waits but the request rate stays ~0.33/s (one per 2-4s)
+REQUEST_LIMITER = retry_policy.HostRateLimiter(scraper_configs.JOHN_LEWIS["request_delay"])
 
-# Set up session with retries for robust requests
-session = requests.Session()
-retries = Retry(total=3, backoff_factor=1, status_forcelist=[400, 429, 500, 502, 503, 504, 403, 408])
-session.mount("https://", HTTPAdapter(max_retries=retries))
 
+# Listing-only fast pass between full cycles: poll the first discount-sorted
+# listing page of each category and deep fetch only new or repriced products
+FAST_PASS_ENABLED = True
+FAST_PASS_INTERVAL = (240, 360)  # seconds between listing polls
+FAST_PASS_PAGES = 1
+listing_scraper = scraper_engine.RetailerScraper("johnlewis", client=http, policy=RETRY_POLICY, breakers=CIRCUIT_BREAKERS,
+                                                 limiter=REQUEST_LIMITER)
+fast_pass_watcher = fast_pass.ListingWatcher()
 
-# Counters
+# O(1) "ever seen this product?" across cycles and categories. Only feeds the
+# "never seen before" counts in the log: new-product alerts still come from the
+# category state, so a product that returns to a listing gets its CSV row back
+seen_ids = seen_index.SeenIndex(SEEN_INDEX_PATH)
+
+# Product pages are fetched concurrently; the JSON history is read-modify-write
+price_history_lock = threading.Lock()
+
+# Counters (the per-cycle ones are bumped from the crawl worker threads)
 cycle_count = 0
 ssl_error_count = 0
 excluded_keyword_count = 0
+counter_lock = threading.Lock()
 NOTIFY_EVERY_CYCLES = 3
 MAX_CHUNKS = 8
 MAX_PAGE_REQUESTS = 50  # Global max
@@ -92,8 +150,7 @@ def get_headers():
         "User-Agent": USER_AGENT,
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
         "Accept-Language": "en-GB,en;q=0.5",
-        "Accept-Encoding": "gzip, deflate, br",
-        "Connection": "keep-alive"
+        "Accept-Encoding": "gzip, deflate, br"
     }
 
 
@@ -101,8 +158,8 @@ def clean_price(text):
     """Clean price text to float, removing £, commas, and handling ranges."""
     if not text:
         return None
-    text = re.split(r'\s*-\s*', text)[0]
-    text = re.sub(r'[^\d.]', '', text)
+    text = PRICE_RANGE_SPLIT.split(text, 1)[0]
+    text = NON_PRICE_CHARS.sub('', text)
     try:
         return float(text)
     except ValueError:
@@ -111,13 +168,12 @@ def clean_price(text):
 
 def extract_product_id(url):
     """Extract product ID from URL."""
-    match = re.search(r"p(\d+)$", url)
+    match = PRODUCT_ID.search(url)
     if match:
         product_id = match.group(1)
         logging.debug(f"Extracted product ID {product_id} from URL: {url}")
         return product_id
     logging.error(f"Failed to extract product ID from URL: {url}")
-    print(f"Failed to extract product ID from URL: {url}")
     return None
 
 
@@ -131,7 +187,7 @@ def normalize_url(url):
 def normalize_size(size):
     """Normalize size formats (e.g., 'UK7' to 'UK 7')."""
     size = size.strip()
-    size = re.sub(r'^(uk|eu)(\d+)$', r'\1 \2', size, flags=re.I)
+    size = SIZE_PREFIX.sub(r'\1 \2', size)
     return size
 
 
@@ -148,81 +204,32 @@ def load_price_history():
 def save_price_history(price_history):
     """Save price history to file."""
     try:
-        with open(PRICE_HISTORY_FILE, 'w') as f:
-            json.dump(price_history, f, indent=2)
+        atomic_io.write_json(PRICE_HISTORY_FILE, price_history, indent=2)
     except Exception as e:
         logging.error(f"Failed to save price history: {e}")
 
 
 def update_price_history(product_id, current_price, product_name):
-    """Update price history for a product and return if it's recently reduced with improved logic."""
+    """Update price history for a product and return if it's recently reduced."""
     price_history = load_price_history()
-    current_time = datetime.now().isoformat()
-    
-    if product_id not in price_history:
-        # First time seeing this product - record initial price
-        price_history[product_id] = {
-            "name": product_name,
-            "initial_price": current_price,  # Track original discovery price
-            "prices": [{"price": current_price, "timestamp": current_time}],
-            "recently_reduced": False,
-            "reduction_from_initial": 0.0
-        }
+    is_new = product_id not in price_history
+    recently_reduced = price_store.apply_price(price_history, product_id, current_price, product_name,
+                                               datetime.now().isoformat())
+    if is_new:
         logging.info(f"New product tracked: {product_name} at £{current_price}")
-    else:
-        # Add new price entry
-        price_history[product_id]["prices"].append({
-            "price": current_price, 
-            "timestamp": current_time
-        })
-        
-        # Keep only last 20 price entries to prevent file bloat
-        price_history[product_id]["prices"] = price_history[product_id]["prices"][-20:]
-        
-        # Get initial price (first time we saw this product)
-        initial_price = price_history[product_id].get("initial_price")
-        if not initial_price:
-            # Backward compatibility - use oldest price if initial_price missing
-            initial_price = price_history[product_id]["prices"][0]["price"]
-            price_history[product_id]["initial_price"] = initial_price
-        
-        # Calculate reduction from initial discovery price
-        reduction_from_initial = 0.0
-        if current_price is not None and initial_price is not None and initial_price > 0:
-            reduction_from_initial = ((initial_price - current_price) / initial_price) * 100
-        
-        price_history[product_id]["reduction_from_initial"] = reduction_from_initial
-        
-        # Mark as recently reduced if:
-        # 1. Price has dropped significantly from initial discovery (>= 5% additional reduction)
-        # 2. OR price has dropped in the last 3 price checks
-        recent_reduction_threshold = 5.0  # 5% additional reduction from initial
-        
-        # Check for significant reduction from initial price
-        is_significantly_reduced = reduction_from_initial >= recent_reduction_threshold
-        
-        # Check for recent price drops (last 3 entries)
-        recent_drop = False
-        if len(price_history[product_id]["prices"]) >= 3:
-            last_3_prices = [p["price"] for p in price_history[product_id]["prices"][-3:] if p["price"] is not None]
-            if len(last_3_prices) >= 2:
-                # Check if there's a downward trend in recent prices
-                recent_drop = last_3_prices[-1] < last_3_prices[0]
-        
-        price_history[product_id]["recently_reduced"] = is_significantly_reduced or recent_drop
-        
-        if price_history[product_id]["recently_reduced"]:
-            logging.info(f"Recently reduced detected: {product_name} - Initial: £{initial_price}, Current: £{current_price}, Reduction: {reduction_from_initial:.1f}%")
-            print(f"🔥 RECENTLY REDUCED: {product_name} - {reduction_from_initial:.1f}% off initial price")
-    
+    elif recently_reduced:
+        entry = price_history[product_id]
+        logging.info(f"Recently reduced detected: {product_name} - Initial: £{entry['initial_price']}, Current: £{current_price}, Reduction: {entry['reduction_from_initial']:.1f}%")
+
     save_price_history(price_history)
-    return price_history[product_id].get("recently_reduced", False)
+    price_store.record(PRICE_HISTORY_DB, product_id, current_price)
+    return recently_reduced
 
 
 def get_recently_reduced_products():
-    """Get list of recently reduced product IDs."""
+    """Get the set of recently reduced product IDs."""
     price_history = load_price_history()
-    return [pid for pid, data in price_history.items() if data.get("recently_reduced", False)]
+    return {pid for pid, data in price_history.items() if data.get("recently_reduced", False)}
 
 
 def is_recently_added(product_id, state_file):
@@ -256,114 +263,101 @@ def is_recently_added(product_id, state_file):
 # CSV cleanup function
 def clean_old_products_from_csv(current_product_ids):
     """Remove products from CSV that are no longer available, keep recently reduced ones."""
-    if not os.path.exists(CSV_FILE):
-        return
-    
     recently_reduced_ids = get_recently_reduced_products()
     
     try:
-        # Read current CSV
-        rows_to_keep = []
-        removed_count = 0
+        # Keep if currently active OR recently reduced; the rest are tombstoned in the store
+        keep_ids = set(current_product_ids) | recently_reduced_ids
+        removed_ids = product_store.tombstone_missing(PRODUCT_STORE_DB, keep_ids)
+        for product_id in removed_ids:
+            logging.info(f"Removing old product from CSV (ID: {product_id})")
         
-        with open(CSV_FILE, 'r', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            headers = reader.fieldnames
-            
-            for row in reader:
-                product_id = row.get('Product ID', '')
-                
-                # Keep if currently active OR recently reduced
-                if product_id in current_product_ids or product_id in recently_reduced_ids:
-                    rows_to_keep.append(row)
-                else:
-                    removed_count += 1
-                    logging.info(f"Removing old product from CSV: {row.get('Product Name', 'Unknown')} (ID: {product_id})")
+        # The CSV is only rewritten if the store changed since the last export
+        exported = product_store.export_csv(PRODUCT_STORE_DB, CSV_FILE)
+        if exported is None:
+            logging.info("CSV unchanged since last export, skipping rewrite")
         
-        # Write back cleaned CSV
-        with open(CSV_FILE, 'w', newline='', encoding='utf-8') as csvfile:
-            if rows_to_keep and headers:
-                writer = csv.DictWriter(csvfile, fieldnames=headers, quoting=csv.QUOTE_ALL)
-                writer.writeheader()
-                writer.writerows(rows_to_keep)
+        # Homepage stats: recently reduced flags change every cycle, rows only sometimes
+        rows = exported if exported is not None else product_store.live_rows(PRODUCT_STORE_DB)
+        summary_stats.rebuild_from_rows(CSV_FILE, rows, recently_reduced_ids)
         
-        logging.info(f"CSV cleanup complete: Removed {removed_count} old products, kept {len(rows_to_keep)} products")
-        print(f"CSV cleanup complete: Removed {removed_count} old products, kept {len(rows_to_keep)} products")
+        logging.info(f"CSV cleanup complete: Removed {len(removed_ids)} old products, kept {len(rows)} rows")
         
     except Exception as e:
         logging.error(f"Error cleaning CSV: {e}")
-        print(f"Error cleaning CSV: {e}")
+
+
+def count_request_error(error, status, attempt):
+    """retry_policy callback: log each failed attempt and keep the SSL error tally."""
+    global ssl_error_count
+    if isinstance(error, requests.exceptions.SSLError):
+        with counter_lock:
+            ssl_error_count += 1
+    logging.warning(f"Request failed (attempt {attempt+1}/{RETRY_POLICY.max_attempts}): {error or f'HTTP {status}'}")
+
+
+def fetch_url(url, label=None):
+    """GET a URL under the shared retry policy and circuit breaker; None if it couldn't be fetched."""
+    try:
+        with tracing.span('http', url=url):
+            return retry_policy.fetch(http, url, RETRY_POLICY, CIRCUIT_BREAKERS, headers=get_headers,
+                                      sleep=tracing.sleep, on_error=count_request_error, limiter=REQUEST_LIMITER)
+    except retry_policy.FetchError as e:
+        message = f"Failed to fetch {label or url}: {e}"
+        if e.status in (404, 410):
+            # Delisted page: not worth an alert
+            logging.warning(message)
+        else:
+            logging.error(message)
+            send_error_webhook(message)
+        return None
 
 
 def fetch_category_page(url, page=1, chunk=1):
     """Fetch a category page or chunk and extract product URLs."""
-    global ssl_error_count
-    max_attempts = 3
     page_url = f"{url}&page={page}&chunk={chunk}" if chunk > 1 else f"{url}&page={page}"
-    for attempt in range(max_attempts):
-        try:
-            delay = random.uniform(2, 4)
-            print(f"Fetching page {page}, chunk {chunk}, waiting {delay:.2f}s...")
-            logging.info(f"Fetching {page_url} (Attempt {attempt+1}/{max_attempts}, waiting {delay:.2f}s)")
-            time.sleep(delay)
-            response = session.get(page_url, headers=get_headers(), timeout=8)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            # Try JSON-LD first
-            product_urls = []
-            json_ld_script = soup.find('script', type='application/ld+json')
-            if json_ld_script:
-                try:
-                    json_data = json.loads(json_ld_script.string)
-                    if json_data.get('@type') == 'ItemList' and 'itemListElement' in json_data:
-                        product_urls = [
-                            item['url'] for item in json_data['itemListElement']
-                            if item.get('url') and '/p' in item['url']
-                        ]
-                        product_urls = [urljoin("https://www.johnlewis.com", url) for url in product_urls]
-                except json.JSONDecodeError:
-                    logging.warning(f"Failed to parse JSON-LD on {page_url}")
-
-            # Fallback to CSS selector
-            if not product_urls:
-                links = soup.select('a.product-card_c-product-card__link___7IQk')
-                product_urls = [urljoin("https://www.johnlewis.com", link.get('href')) for link in links if link.get('href')]
-
-            if not product_urls:
-                debug_file = os.path.join(LOG_DIR, f"debug_page_{page}_chunk_{chunk}.html")
-                with open(debug_file, "w", encoding="utf-8") as f:
-                    f.write(soup.prettify())
-                logging.warning(f"No product links found on {page_url}. Saved HTML to {debug_file}")
-                print(f"No product links found on {page_url}. Saved HTML to {debug_file}")
-
-            if product_urls:
-                print(f"Sample product URLs: {product_urls[:3]}")
-            print(f"Found {len(product_urls)} products on page {page}, chunk {chunk}")
-            logging.info(f"Found {len(product_urls)} products on page {page}, chunk {chunk} (Response size: {len(response.text)} bytes, Status: {response.status_code})")
-            return list(set(product_urls))
-
-        except requests.exceptions.SSLError as ssl_err:
-            ssl_error_count += 1
-            logging.error(f"SSL error fetching {page_url} (attempt {attempt+1}/{max_attempts}): {ssl_err}")
-            print(f"SSL error fetching page {page}, chunk {chunk} (attempt {attempt+1}/{max_attempts}): {ssl_err}")
-            if attempt == max_attempts - 1:
-                message = f"Failed to fetch {page_url} after {max_attempts} attempts: {ssl_err}"
-                logging.error(message)
-                print(message)
-                send_error_webhook(message)
-                return []
-            time.sleep(random.uniform(5, 10))
-        except Exception as e:
-            logging.error(f"Error fetching {page_url} (attempt {attempt+1}/{max_attempts}): {e}")
-            print(f"Error fetching page {page}, chunk {chunk} (attempt {attempt+1}/{max_attempts}): {e}")
-            if attempt == max_attempts - 1:
-                message = f"Failed to fetch {page_url} after {max_attempts} attempts: {e}"
-                logging.error(message)
-                print(message)
-                send_error_webhook(message)
-                return []
-            time.sleep(random.uniform(1, 2))
+    logging.debug(f"Fetching {page_url}")
+    response = fetch_url(page_url)
+    if response is None:
+        return []
+    try:
+        parse_span = tracing.start_span('parse', url=page_url)
+        soup = BeautifulSoup(response.text, 'html.parser')
+
+        # Try JSON-LD first
+        product_urls = []
+        json_ld_script = soup.find(**extraction_rules.JSON_LD)
+        if json_ld_script:
+            try:
+                json_data = json.loads(json_ld_script.string)
+                if json_data.get('@type') == 'ItemList' and 'itemListElement' in json_data:
+                    product_urls = [
+                        item['url'] for item in json_data['itemListElement']
+                        if item.get('url') and '/p' in item['url']
+                    ]
+                    product_urls = [urljoin("https://www.johnlewis.com", url) for url in product_urls]
+            except json.JSONDecodeError:
+                logging.warning(f"Failed to parse JSON-LD on {page_url}")
+
+        # Fallback to CSS selector
+        if not product_urls:
+            links = extraction_rules.find_all('listing_links', soup)
+            product_urls = [urljoin("https://www.johnlewis.com", link.get('href')) for link in links if link.get('href')]
+
+        if not product_urls:
+            debug_file = os.path.join(LOG_DIR, f"debug_page_{page}_chunk_{chunk}.html")
+            with open(debug_file, "w", encoding="utf-8") as f:
+                f.write(soup.prettify())
+            logging.warning(f"No product links found on {page_url}. Saved HTML to {debug_file}")
+
+        if product_urls:
+            logging.debug(f"Sample product URLs: {product_urls[:3]}")
+        logging.info(f"Found {len(product_urls)} products on page {page}, chunk {chunk} (Response size: {len(response.text)} bytes, Status: {response.status_code})")
+        tracing.end_span(parse_span, products=len(product_urls))
+        return list(set(product_urls))
+    except Exception as e:
+        logging.error(f"Error parsing {page_url}: {e}")
+        return []
 
 
 def fetch_category_products(category_name, category_config):
@@ -381,13 +375,12 @@ def fetch_category_products(category_name, category_config):
         total_products = 0
         while chunk <= MAX_CHUNKS:
             if request_count >= MAX_PAGE_REQUESTS:
-                print(f"Reached max page requests ({MAX_PAGE_REQUESTS}) on page {page}, chunk {chunk} for {category_name}.")
                 logging.warning(f"Reached max page requests ({MAX_PAGE_REQUESTS}) on page {page}, chunk {chunk} for {category_name}.")
                 break
-            product_urls = fetch_category_page(category_config["url"], page, chunk)
+            with tracing.span('listing_page', category=category_name, page=page, chunk=chunk):
+                product_urls = fetch_category_page(category_config["url"], page, chunk)
             request_count += 1
             if not product_urls or len(product_urls) < 10:
-                print(f"Low product count ({len(product_urls)}) in page {page}, chunk {chunk} for {category_name}.")
                 logging.info(f"Low product count ({len(product_urls)}) in page {page}, chunk {chunk} for {category_name}.")
                 break
             normalized_urls = []
@@ -404,12 +397,10 @@ def fetch_category_products(category_name, category_config):
                 product_id_set.add(product_id)
                 new_product_ids.add(product_id)
                 normalized_urls.append(normalized_url)
-            print(f"Page {page}, Chunk {chunk} ({category_name}): {len(new_product_ids)} unique new products")
             logging.info(f"Page {page}, Chunk {chunk} ({category_name}): {len(new_product_ids)} unique new products")
             current_chunk_urls = set(normalized_urls)
             total_products += len(current_chunk_urls - previous_chunk_urls)
             if current_chunk_urls <= previous_chunk_urls or total_products >= max_products_per_page:
-                print(f"Reached {total_products} products in page {page}, chunk {chunk} for {category_name}. Stopping chunk loop.")
                 logging.info(f"Reached {total_products} products in page {page}, chunk {chunk} for {category_name}. Stopping chunk loop.")
                 break
             page_urls.extend(normalized_urls)
@@ -417,12 +408,10 @@ def fetch_category_products(category_name, category_config):
             chunk += 1
 
         page_urls = list(set(page_urls))
-        print(f"Total unique products on page {page} ({category_name}): {len(page_urls)}")
         logging.info(f"Total unique products on page {page} ({category_name}): {len(page_urls)}")
         all_product_urls.extend(page_urls)
 
     all_product_urls = list(set(all_product_urls))
-    print(f"Total unique products fetched for {category_name}: {len(all_product_urls)}, {request_count} requests made")
     logging.info(f"Total unique products fetched for {category_name}: {len(all_product_urls)}, {request_count} requests made")
     return all_product_urls
 
@@ -434,14 +423,8 @@ def extract_variants(soup, url, category_name):
     """
     variants = []
     
-    # Find all color/variant buttons
-    variant_buttons = soup.find_all(['button', 'a'], attrs={
-        'data-testid': re.compile(r'colour:option', re.I)
-    })
-    
-    if not variant_buttons:
-        # Try alternative selectors
-        variant_buttons = soup.find_all(['button', 'span'], class_=re.compile(r'.*colour.*option.*', re.I))
+    # Find all color/variant buttons (data-testid first, then class names)
+    variant_buttons = extraction_rules.find_all('variant_buttons', soup)
     
     if not variant_buttons:
         logging.info(f"No variants found for {url}, treating as single product")
@@ -462,20 +445,20 @@ def extract_variants(soup, url, category_name):
                 continue
             
             # Method 1: Find price spans near this variant
-            price_container = variant_container.find_next(['div', 'span'], class_=re.compile(r'price', re.I))
+            price_container = variant_container.find_next(['div', 'span'], class_=PRICE_CLASS)
             
             current_price = None
             original_price = None
             
             if price_container:
                 # Look for current price
-                current_price_elem = price_container.select_one('.prod-price__current') or \
+                current_price_elem = extraction_rules.CURRENT_PRICE.select_one(price_container) or \
                                     price_container.find('span', attrs={'data-testid': 'price-current'})
                 if current_price_elem:
                     current_price = clean_price(current_price_elem.get_text(strip=True))
                 
                 # Look for original price
-                original_price_elem = price_container.select_one('.prod-price__was') or \
+                original_price_elem = extraction_rules.WAS_PRICE_CSS.select_one(price_container) or \
                                      price_container.find('span', attrs={'data-testid': 'price-prev'})
                 if original_price_elem:
                     original_price = clean_price(original_price_elem.get_text(strip=True))
@@ -485,7 +468,7 @@ def extract_variants(soup, url, category_name):
                 next_sibling = variant_btn.find_next_sibling()
                 if next_sibling:
                     price_text = next_sibling.get_text()
-                    prices = re.findall(r'£([\d,]+\.?\d*)', price_text)
+                    prices = POUND_AMOUNT.findall(price_text)
                     if len(prices) >= 1:
                         current_price = clean_price(prices[0])
                     if len(prices) >= 2:
@@ -516,191 +499,181 @@ def extract_variants(soup, url, category_name):
     return variants if variants else None
 
 
-def fetch_product_info(url, counter, total, category_name):
+def fetch_product_info(url, counter, total, category_name, on_filtered=None):
     """
     MODIFIED: Fetch product details with multi-variant support
     If variants exist with different prices, returns the BEST variant
+
+    Returns None both when the page couldn't be fetched/parsed and when the
+    product was filtered out; on_filtered(reason) is called only for the latter.
     """
     normalized_url = normalize_url(url)
     product_id = extract_product_id(normalized_url)
-    global ssl_error_count, excluded_keyword_count
-    max_attempts = 3
-    
-    for attempt in range(max_attempts):
-        try:
-            delay = random.uniform(2, 4)
-            print(f"Fetching product {counter}/{total} ({category_name}): {url}, waiting {delay:.2f}s...")
-            logging.info(f"Fetching product {counter}/{total} ({category_name}): {url} (Attempt {attempt+1}/{max_attempts})")
-            time.sleep(delay)
-            response = session.get(url, headers=get_headers(), timeout=8)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            # Extract basic info
-            data_script = soup.find('script', type='application/ld+json')
-            
-            # Get name
-            if data_script:
-                try:
-                    json_data = json.loads(data_script.string)
-                    name = json_data.get("name") or "Unknown"
-                except:
-                    name_elem = soup.select_one("h1.product-header__name")
-                    name = name_elem.get_text(strip=True) if name_elem else "Unknown Product"
-            else:
-                name_elem = soup.select_one("h1.product-header__name")
+    global excluded_keyword_count
+
+    logging.debug(f"Fetching product {counter}/{total} ({category_name}): {url}")
+    response = fetch_url(url, f"product {url} ({category_name})")
+    if response is None:
+        return None
+    try:
+        # Closed early (with the enclosing product span) when the product is filtered out
+        parse_span = tracing.start_span('parse', url=url)
+        soup = BeautifulSoup(response.text, 'html.parser')
+
+        # Extract basic info
+        data_script = soup.find(**extraction_rules.JSON_LD)
+        
+        # Get name
+        if data_script:
+            try:
+                json_data = json.loads(data_script.string)
+                name = json_data.get("name") or "Unknown"
+            except:
+                name_elem = extraction_rules.PRODUCT_NAME.select_one(soup)
                 name = name_elem.get_text(strip=True) if name_elem else "Unknown Product"
-            
-            # Check excluded keywords early
-            name_lower = name.lower()
-            has_excluded_keyword = any(keyword.lower() in name_lower for keyword in EXCLUDED_KEYWORDS)
-            if has_excluded_keyword:
+        else:
+            name_elem = extraction_rules.PRODUCT_NAME.select_one(soup)
+            name = name_elem.get_text(strip=True) if name_elem else "Unknown Product"
+        
+        # Check excluded keywords early
+        matched_keyword = keyword_matcher(category_name).search(name)
+        if matched_keyword:
+            with counter_lock:
                 excluded_keyword_count += 1
-                logging.warning(f"Skipping {name} ({category_name}): Contains excluded keyword")
-                return None
+            logging.warning(f"Skipping {name} ({category_name}): Contains excluded keyword '{matched_keyword}'")
+            if on_filtered:
+                on_filtered('excluded_keyword')
+            return None
+        
+        # NEW: Try to extract variants first
+        variants = extract_variants(soup, url, category_name)
+        
+        if variants:
+            # Multi-variant product - use BEST variant (highest discount)
+            best_variant = max(variants, key=lambda v: v['discount'])
+            logging.info(f"Multi-variant product: Using best variant '{best_variant['name']}' with {best_variant['discount']:.1f}% off")
             
-            # NEW: Try to extract variants first
-            variants = extract_variants(soup, url, category_name)
+            current_price = best_variant['current_price']
+            original_price = best_variant['original_price']
+            discount = best_variant['discount']
             
-            if variants:
-                # Multi-variant product - use BEST variant (highest discount)
-                best_variant = max(variants, key=lambda v: v['discount'])
-                logging.info(f"Multi-variant product: Using best variant '{best_variant['name']}' with {best_variant['discount']:.1f}% off")
-                
-                current_price = best_variant['current_price']
-                original_price = best_variant['original_price']
-                discount = best_variant['discount']
-                
-                # Append variant name to product name
-                name = f"{name} - {best_variant['name']}"
-                
-                # Store ALL variants for webhook
-                variant_list = [v['name'] for v in variants]
-            else:
-                # Single-price product - use original extraction
-                if data_script:
-                    try:
-                        json_data = json.loads(data_script.string)
-                        current_price = json_data.get("offers", {}).get("price")
-                        current_price = float(current_price) if current_price else None
-                    except:
-                        current_price = None
-                else:
-                    current_price = None
-                
-                if current_price is None:
-                    current_price_elem = soup.select_one(".prod-price__current") or \
-                                        soup.select_one("span[data-testid='price-current']") or \
-                                        soup.find("span", class_=re.compile(r"price", re.I))
-                    current_price = clean_price(current_price_elem.get_text(strip=True)) if current_price_elem else None
-                
-                # Extract original price
-                original_price = None
-                price_prev = soup.find("span", attrs={"data-testid": "price-prev"})
-                if price_prev:
-                    original_price = clean_price(price_prev.get_text(strip=True))
-                
-                if not original_price:
-                    price_was = soup.find(lambda tag: tag.name in ['span', 'div', 's'] and 
-                                        re.search(r'was\s*£?\d', tag.get_text(strip=True), re.I))
-                    if price_was:
-                        original_price = clean_price(price_was.get_text(strip=True))
-                
-                # Calculate discount
-                discount = 0.0
-                if original_price and current_price and original_price > current_price > 0:
-                    discount = ((original_price - current_price) / original_price) * 100
-                
-                # Get variant names from old method
-                variant_elements = soup.find_all("a", attrs={"data-testid": re.compile(r"colour:option", re.I)}) or \
-                                  soup.find_all("span", class_=re.compile(r"colour", re.I))
-                variant_list = []
-                for variant in variant_elements:
-                    variant_name = variant.get_text(strip=True)
-                    if variant_name:
-                        variant_list.append(variant_name)
+            # Append variant name to product name
+            base_name = name
+            name = f"{name} - {best_variant['name']}"
             
-            # Extract other fields (stock, sizes, image)
+            # Store ALL variants for webhook
+            variant_list = [v['name'] for v in variants]
+        else:
+            # Single-price product - use original extraction
             if data_script:
                 try:
                     json_data = json.loads(data_script.string)
-                    availability = json_data.get("offers", {}).get("availability")
-                    stock_status = "In Stock" if availability and "InStock" in availability else "Out of Stock"
-                    image_url = json_data.get("image")
+                    current_price = json_data.get("offers", {}).get("price")
+                    current_price = float(current_price) if current_price else None
                 except:
-                    stock_elem = soup.select_one(".stock-availability-message")
-                    stock_status = stock_elem.get_text(strip=True) if stock_elem else "Not listed"
-                    image_elem = soup.select_one("img.product-image")
-                    image_url = image_elem.get("src") if image_elem else None
+                    current_price = None
             else:
-                stock_elem = soup.select_one(".stock-availability-message")
-                stock_status = stock_elem.get_text(strip=True) if stock_elem else "Not listed"
-                image_elem = soup.select_one("img.product-image")
-                image_url = image_elem.get("src") if image_elem else None
+                current_price = None
             
-            # Extract sizes
-            sizes = []
-            size_elements = soup.find_all("a", attrs={"data-testid": "size:option:button"}) or \
-                           soup.find_all("span", class_=re.compile(r"size", re.I))
-            for size in size_elements:
-                label = size.get_text(strip=True)
-                if label:
-                    sizes.append(normalize_size(label))
-            if not sizes:
-                sizes = ["One Size"]
+            if current_price is None:
+                current_price_elem = extraction_rules.find('current_price', soup)
+                current_price = clean_price(current_price_elem.get_text(strip=True)) if current_price_elem else None
             
-            if not product_id:
-                logging.warning(f"Skipping {url} ({category_name}): Could not extract product ID")
-                return None
+            # Extract original price (the full-page "was £..." scan only runs if the selectors miss)
+            original_price = None
+            price_prev = extraction_rules.find('original_price', soup)
+            if price_prev:
+                original_price = clean_price(price_prev.get_text(strip=True))
             
-            # Check minimum discount
-            category_min_discount = CATEGORY_URLS[category_name]["min_discount"]
-            if discount < category_min_discount:
-                logging.warning(f"Skipping {name} ({category_name}): Discount {discount:.2f}% < {category_min_discount}%")
-                return None
+            # Calculate discount
+            discount = 0.0
+            if original_price and current_price and original_price > current_price > 0:
+                discount = ((original_price - current_price) / original_price) * 100
             
-            # Update price history and check if recently reduced
+            # Get variant names from old method
+            variant_elements = extraction_rules.find_all('variant_names', soup)
+            variant_list = []
+            for variant in variant_elements:
+                variant_name = variant.get_text(strip=True)
+                if variant_name:
+                    variant_list.append(variant_name)
+        
+        # Extract other fields (stock, sizes, image)
+        if data_script:
+            try:
+                json_data = json.loads(data_script.string)
+                availability = json_data.get("offers", {}).get("availability")
+                stock_status = "In Stock" if availability and "InStock" in availability else "Out of Stock"
+                image_url = json_data.get("image")
+            except:
+                stock_elem = extraction_rules.STOCK_MESSAGE.select_one(soup)
+                stock_status = stock_elem.get_text(strip=True) if stock_elem else "Not listed"
+                image_elem = extraction_rules.PRODUCT_IMAGE.select_one(soup)
+                image_url = image_elem.get("src") if image_elem else None
+        else:
+            stock_elem = extraction_rules.STOCK_MESSAGE.select_one(soup)
+            stock_status = stock_elem.get_text(strip=True) if stock_elem else "Not listed"
+            image_elem = extraction_rules.PRODUCT_IMAGE.select_one(soup)
+            image_url = image_elem.get("src") if image_elem else None
+        
+        # Extract sizes
+        sizes = []
+        size_elements = extraction_rules.find_all('sizes', soup)
+        for size in size_elements:
+            label = size.get_text(strip=True)
+            if label:
+                sizes.append(normalize_size(label))
+        if not sizes:
+            sizes = ["One Size"]
+        
+        if not product_id:
+            logging.warning(f"Skipping {url} ({category_name}): Could not extract product ID")
+            if on_filtered:
+                on_filtered('no_product_id')
+            return None
+        
+        # Check minimum discount
+        category_min_discount = CATEGORY_URLS[category_name]["min_discount"]
+        if discount < category_min_discount:
+            logging.warning(f"Skipping {name} ({category_name}): Discount {discount:.2f}% < {category_min_discount}%")
+            if on_filtered:
+                on_filtered('min_discount')
+            return None
+        
+        tracing.end_span(parse_span)
+
+        # Update price history and check if recently reduced
+        with tracing.span('history_update', product_id=product_id), price_history_lock:
             is_recently_reduced = update_price_history(product_id, current_price, name)
-            
-            product = {
-                "product_id": product_id,
-                "name": name,
-                "url": url,
-                "current_price": current_price,
-                "original_price": original_price,
-                "discount": discount,
-                "stock_status": stock_status,
-                "image": image_url or "",
-                "sizes": sizes,
-                "variants": variant_list,
-                "category": category_name,
-                "recently_reduced": is_recently_reduced
-            }
-            
-            price_status = f"Current: {current_price if current_price is not None else 'None'}, Original: {original_price if original_price is not None else 'None'}, Discount: {discount:.2f}%"
-            if is_recently_reduced:
-                price_status += " [RECENTLY REDUCED]"
-            print(f"Fetched product {counter}/{total} ({category_name}): {name}, {price_status}")
-            logging.info(f"Fetched product {counter}/{total} ({category_name}): {name}, {price_status}")
-            return product
-
-        except requests.exceptions.SSLError as ssl_err:
-            ssl_error_count += 1
-            logging.error(f"SSL error fetching {url} ({category_name}) (attempt {attempt+1}/{max_attempts}): {ssl_err}")
-            if attempt == max_attempts - 1:
-                message = f"Failed to fetch product {url} ({category_name}) after {max_attempts} attempts: {ssl_err}"
-                logging.error(message)
-                send_error_webhook(message)
-                return None
-            time.sleep(random.uniform(5, 10))
-        except Exception as e:
-            logging.error(f"Error fetching {url} ({category_name}) (attempt {attempt+1}/{max_attempts}): {e}")
-            if attempt == max_attempts - 1:
-                message = f"Failed to fetch product {url} ({category_name}) after {max_attempts} attempts: {e}"
-                logging.error(message)
-                send_error_webhook(message)
-                return None
-            time.sleep(random.uniform(1, 2))
+            if variants:
+                # All variants of the page in one write, not one history rewrite each
+                variant_store.record_page(VARIANT_STORE_FILE, product_id, base_name, variants)
+        
+        product = Product(
+            id=product_id,
+            name=name,
+            url=url,
+            current_price=current_price,
+            original_price=original_price,
+            discount=discount,
+            stock_status=stock_status,
+            image=image_url or "",
+            sizes=sizes,
+            variants=variant_list,
+            category=category_name,
+            retailer="John Lewis",
+            recently_reduced=is_recently_reduced,
+            excluded_keyword=matched_keyword
+        )
+        
+        price_status = f"Current: {current_price if current_price is not None else 'None'}, Original: {original_price if original_price is not None else 'None'}, Discount: {discount:.2f}%"
+        if is_recently_reduced:
+            price_status += " [RECENTLY REDUCED]"
+        logging.info(f"Fetched product {counter}/{total} ({category_name}): {name}, {price_status}")
+        return product
+    except Exception as e:
+        logging.error(f"Error parsing {url} ({category_name}): {e}")
+        return None
 
 
 def load_previous_state(state_file):
@@ -752,14 +725,12 @@ def save_state(products, current_product_ids, state_file):
     previous_state = load_previous_state(state_file)
     
     for product in products:
-        product_id = product["product_id"]
+        product_id = product.id
         if not product_id:
-            logging.error(f"Skipping save for product {product['name']}: No product_id")
+            logging.error(f"Skipping save for product {product.name}: No product_id")
             continue
         
-        name_lower = product["name"].lower()
-        has_excluded_keyword = any(keyword.lower() in name_lower for keyword in EXCLUDED_KEYWORDS)
-        if has_excluded_keyword:
+        if excluded_keyword(product, product.category):
             logging.warning(f"Skipping save for product ID {product_id}: Contains excluded keyword")
             continue
         
@@ -770,14 +741,14 @@ def save_state(products, current_product_ids, state_file):
         else:
             # New product - set first_seen to now
             first_seen = current_time
-            logging.info(f"NEW PRODUCT DETECTED: {product['name']} (ID: {product_id}) - first_seen set to {current_time}")
+            logging.info(f"NEW PRODUCT DETECTED: {product.name} (ID: {product_id}) - first_seen set to {current_time}")
         
         new_state[product_id] = {
-            "name": product["name"],
-            "url": product["url"],
-            "original_price": product["original_price"],
-            "latest_price": product["current_price"],
-            "stock_status": product["stock_status"],
+            "name": product.name,
+            "url": product.url,
+            "original_price": product.original_price,
+            "latest_price": product.current_price,
+            "stock_status": product.stock_status,
             "first_seen": first_seen  # NEW: Track discovery time
         }
     
@@ -794,8 +765,7 @@ def save_state(products, current_product_ids, state_file):
             del previous_state[product_id]
     
     try:
-        with open(state_file, "w") as f:
-            json.dump(previous_state, f, indent=4)
+        atomic_io.write_json(state_file, previous_state, indent=4)
         logging.info(f"Saved and verified category state in {state_file} with {len(previous_state)} items")
     except Exception as e:
         logging.error(f"Failed to save state file {state_file}: {e}")
@@ -809,14 +779,14 @@ def send_error_webhook(message):
         try:
             delay = random.uniform(1, 1.5)
             logging.info(f"Waiting {delay:.2f}s before sending error webhook (attempt {attempt+1}/3)")
-            time.sleep(delay)
+            tracing.sleep(delay, 'webhook delay')
             response = webhook.execute()
             logging.info(f"Sent error webhook: {message} (Status: {response.status_code})")
             return
         except Exception as e:
             logging.error(f"Failed to send error webhook (attempt {attempt+1}/3): {e}")
             if attempt < 2:
-                time.sleep(2)
+                tracing.sleep(2, 'webhook retry')
     logging.error(f"Failed to send error webhook after 3 attempts")
 
 
@@ -828,14 +798,14 @@ def send_cycle_start_webhook(cycle, category_name):
         try:
             delay = random.uniform(1, 1.5)
             logging.info(f"Waiting {delay:.2f}s before sending cycle start webhook for {category_name} (attempt {attempt+1}/3)")
-            time.sleep(delay)
+            tracing.sleep(delay, 'webhook delay')
             response = webhook.execute()
             logging.info(f"Sent cycle start webhook for {category_name}: Cycle {cycle} (Status: {response.status_code})")
             return
         except Exception as e:
             logging.error(f"Failed to send cycle start webhook for {category_name} (attempt {attempt+1}/3): {e}")
             if attempt < 2:
-                time.sleep(2)
+                tracing.sleep(2, 'webhook retry')
     logging.error(f"Failed to send cycle start webhook for {category_name} after 3 attempts")
 
 
@@ -848,29 +818,24 @@ def send_periodic_webhook(cycle, category_name, num_products, changes_detected):
         try:
             delay = random.uniform(1, 1.5)
             logging.info(f"Waiting {delay:.2f}s before sending periodic webhook for {category_name} (attempt {attempt+1}/3)")
-            time.sleep(delay)
+            tracing.sleep(delay, 'webhook delay')
             response = webhook.execute()
             logging.info(f"Sent periodic webhook for {category_name}: Cycle {cycle} (Status: {response.status_code})")
             return
         except Exception as e:
             logging.error(f"Failed to send periodic webhook for {category_name} (attempt {attempt+1}/3): {e}")
             if attempt < 2:
-                time.sleep(2)
+                tracing.sleep(2, 'webhook retry')
     logging.error(f"Failed to send periodic webhook for {category_name} after 3 attempts")
 
 
 def is_duplicate_in_csv(product_name, product_url, check_last_n=10):
     """Check if similar product already exists in recent CSV rows to avoid immediate duplicates."""
-    if not os.path.exists(CSV_FILE):
-        return False
     try:
-        with open(CSV_FILE, 'r', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            rows = list(reader)[-check_last_n:]
-            for row in rows:
-                if row.get('Product Name') == product_name and row.get('URL') == product_url:
-                    logging.info(f"Skipping CSV append for duplicate: {product_name}")
-                    return True
+        for row in product_store.recent_rows(PRODUCT_STORE_DB, check_last_n):
+            if row.get('Product Name') == product_name and row.get('URL') == product_url:
+                logging.info(f"Skipping CSV append for duplicate: {product_name}")
+                return True
         return False
     except Exception as e:
         logging.error(f"Error checking CSV for duplicates: {e}")
@@ -881,32 +846,32 @@ def send_item_webhook(product, event_type, previous_state, price_diff=None, dire
     """
     MODIFIED: Send webhook with recently added badge and CSV logging
     """
-    discount = product["discount"]
-    category = product["category"]
-    product_id = product["product_id"]
+    discount = product.discount
+    category = product.category
+    product_id = product.id
     
     # Check if recently added
     state_file = CATEGORY_URLS[category]["state_file"]
     recently_added = is_recently_added(product_id, state_file)
     
-    logging.info(f"Sending webhook for {product['name']} ({category}): Event={event_type}, Recently Added={recently_added}")
+    logging.info(f"Sending webhook for {product.name} ({category}): Event={event_type}, Recently Added={recently_added}")
     
     # Check for CSV duplicate before webhook
-    if is_duplicate_in_csv(product['name'], product['url']):
-        logging.info(f"Skipping webhook and CSV for duplicate product: {product['name']}")
+    if is_duplicate_in_csv(product.name, product.url):
+        logging.info(f"Skipping webhook and CSV for duplicate product: {product.name}")
         return
    
     webhook = DiscordWebhook(url=WEBHOOK_URL)
     embed = DiscordEmbed(
-        title=product["name"][:256],
-        url=product["url"],
-        color=0x00ff00 if product["stock_status"] == "In Stock" else 0xff0000
+        title=product.name[:256],
+        url=product.url,
+        color=0x00ff00 if product.stock_status == "In Stock" else 0xff0000
     )
    
-    if product.get("image"):
-        embed.set_thumbnail(url=product["image"])
+    if product.image:
+        embed.set_thumbnail(url=product.image)
    
-    current_price = product["current_price"]
+    current_price = product.current_price
     embed.add_embed_field(
         name="Current Price",
         value=f"£{current_price:.2f}" if current_price is not None else "No price found",
@@ -914,7 +879,7 @@ def send_item_webhook(product, event_type, previous_state, price_diff=None, dire
     )
    
     if event_type == "price_change":
-        previous_price = previous_state[product["product_id"]]["latest_price"]
+        previous_price = previous_state[product.id]["latest_price"]
         embed.add_embed_field(
             name="Previous Price",
             value=f"£{previous_price:.2f}" if previous_price is not None else "No price found",
@@ -929,7 +894,7 @@ def send_item_webhook(product, event_type, previous_state, price_diff=None, dire
         embed.add_embed_field(name="Previous Price", value="N/A (New Product)", inline=True)
         embed.add_embed_field(name="Price Change", value="N/A (New Product)", inline=True)
    
-    original_price = product["original_price"]
+    original_price = product.original_price
     embed.add_embed_field(
         name="Original Price",
         value=f"£{original_price:.2f}" if original_price is not None else "No price found",
@@ -940,18 +905,18 @@ def send_item_webhook(product, event_type, previous_state, price_diff=None, dire
         value=f"{discount:.2f}%" if discount >= 0 else "N/A",
         inline=True
     )
-    embed.add_embed_field(name="Stock Status", value=product["stock_status"], inline=True)
+    embed.add_embed_field(name="Stock Status", value=product.stock_status, inline=True)
     embed.add_embed_field(name="Category", value=category, inline=True)
    
-    sizes_value = ", ".join(product["sizes"]) if product["sizes"] else "One Size"
+    sizes_value = ", ".join(product.sizes) if product.sizes else "One Size"
     embed.add_embed_field(name="Sizes", value=sizes_value[:1024], inline=False)
-    variants_value = ", ".join(product["variants"]) if product.get("variants") else "None"
+    variants_value = ", ".join(product.variants) if product.variants else "None"
     embed.add_embed_field(name="Variants", value=variants_value[:1024], inline=False)
-    embed.add_embed_field(name="Link", value=f"[View Product]({product['url']})", inline=False)
+    embed.add_embed_field(name="Link", value=f"[View Product]({product.url})", inline=False)
    
     # NEW: Add badges to footer
     badges = [f"Event: {'New Product' if event_type == 'new' else f'Price {direction.capitalize()}'}"]
-    if product.get("recently_reduced", False):
+    if product.recently_reduced:
         badges.append("🔥 Recently Reduced")
     if recently_added:
         badges.append("✨ Recently Added")
@@ -965,58 +930,52 @@ def send_item_webhook(product, event_type, previous_state, price_diff=None, dire
     for attempt in range(3):
         try:
             delay = random.uniform(1, 1.5)
-            time.sleep(delay)
+            tracing.sleep(delay, 'webhook delay')
             response = webhook.execute()
-            logging.info(f"Sent webhook for {product['name']} ({category}) ({event_type})")
+            logging.info(f"Sent webhook for {product.name} ({category}) ({event_type})")
             
             # Append to CSV with Recently Added flag
             row_data = {
                 'Product ID': product_id,
-                'Product Name': product['name'],
-                'Current Price': f"{product['current_price']:.2f}" if product['current_price'] is not None else "N/A",
-                'Original Price': f"{product['original_price']:.2f}" if product['original_price'] is not None else "N/A",
-                'Discount': f"{product['discount']:.2f}" if product['discount'] >= 0 else "N/A",
-                'Stock Status': product['stock_status'],
+                'Product Name': product.name,
+                'Current Price': f"{product.current_price:.2f}" if product.current_price is not None else "N/A",
+                'Original Price': f"{product.original_price:.2f}" if product.original_price is not None else "N/A",
+                'Discount': f"{product.discount:.2f}" if product.discount >= 0 else "N/A",
+                'Stock Status': product.stock_status,
                 'Sizes': sizes_value,
-                'URL': product['url'],
+                'URL': product.url,
                 'Event Type': event_type.capitalize(),
                 'Timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'Image': product['image'] if product['image'] else "",
+                'Image': product.image if product.image else "",
                 'Category': category,
                 'Variants': variants_value,
-                'Recently Reduced': 'Yes' if product.get('recently_reduced', False) else 'No',
+                'Recently Reduced': 'Yes' if product.recently_reduced else 'No',
                 'Recently Added': 'Yes' if recently_added else 'No'  # NEW: Add to CSV
             }
             
-            file_exists = os.path.exists(CSV_FILE) and os.path.getsize(CSV_FILE) > 0
-            with open(CSV_FILE, 'a', newline='', encoding='utf-8') as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=row_data.keys(), quoting=csv.QUOTE_ALL)
-                if not file_exists:
-                    writer.writeheader()
-                writer.writerow(row_data)
-                csvfile.flush()
+            # Stored, then appended to the CSV export in the store's column order
+            product_store.append(PRODUCT_STORE_DB, CSV_FILE, row_data)
+            summary_stats.ingest_row(CSV_FILE, row_data, product.recently_reduced)  # written by send_webhook's flush
             
             logging.info(f"Appended to CSV: {row_data['Product Name']} ({category}) - Recently Added: {recently_added}")
             return
         except Exception as e:
             logging.error(f"Failed to send webhook (attempt {attempt+1}/3): {e}")
             if attempt < 2:
-                time.sleep(2)
-    logging.error(f"Failed to send webhook for {product['name']} ({category}) after 3 attempts")
+                tracing.sleep(2, 'webhook retry')
+    logging.error(f"Failed to send webhook for {product.name} ({category}) after 3 attempts")
 
 
 def send_webhook(products, previous_state, category_name):
     """Send webhooks for new products or price changes, sorted by discount."""
     items_to_report = []
     for product in products:
-        product_id = product["product_id"]
-        current_price = product["current_price"]
-        stock_status = product["stock_status"]
+        product_id = product.id
+        current_price = product.current_price
+        stock_status = product.stock_status
        
-        name_lower = product["name"].lower()
-        has_excluded_keyword = any(keyword.lower() in name_lower for keyword in EXCLUDED_KEYWORDS)
-        if has_excluded_keyword:
-            logging.warning(f"Skipping {product['name']} ({category_name}): Contains excluded keyword")
+        if excluded_keyword(product, category_name):
+            logging.warning(f"Skipping {product.name} ({category_name}): Contains excluded keyword")
             continue
 
         event_type = None
@@ -1026,7 +985,7 @@ def send_webhook(products, previous_state, category_name):
         if product_id not in previous_state:
             event_type = "new"
             items_to_report.append((product, event_type, price_diff, direction))
-            logging.info(f"New product detected ({category_name}): {product['name']}, Product ID: {product_id}, URL: {product['url']}")
+            logging.info(f"New product detected ({category_name}): {product.name}, Product ID: {product_id}, URL: {product.url}")
         else:
             old_price = previous_state[product_id]["latest_price"]
             old_stock_status = previous_state[product_id]["stock_status"]
@@ -1053,18 +1012,32 @@ def send_webhook(products, previous_state, category_name):
                     else "changed"
                 )
                 items_to_report.append((product, event_type, price_diff, direction))
-                logging.info(f"Price change detected ({category_name}) for {product['name']}: Price {old_price} -> {current_price}")
+                logging.info(f"Price change detected ({category_name}) for {product.name}: Price {old_price} -> {current_price}")
             elif stock_changed:
-                logging.info(f"Stock status change ({category_name}) for {product['name']}: {old_stock_status} -> {stock_status}")
+                logging.info(f"Stock status change ({category_name}) for {product.name}: {old_stock_status} -> {stock_status}")
 
-    items_to_report.sort(key=lambda x: x[0]["discount"] or 0, reverse=True)
+    items_to_report.sort(key=lambda x: x[0].discount or 0, reverse=True)
+
+    # Users' watches and saved searches: one indexed match per batch
+    try:
+        watchlist.match_events(WATCHLIST_DB, [
+            (product, event_type, previous_state[product.id]["latest_price"] if event_type == "price_change" else None)
+            for product, event_type, _, _ in items_to_report
+        ], RETAILER_KEY)
+    except Exception as e:
+        logging.error(f"Watchlist matching failed ({category_name}): {e}")
 
     changes_detected = len(items_to_report)
-    for product, event_type, price_diff, direction in items_to_report:
-        send_item_webhook(product, event_type, previous_state, price_diff, direction)
-        delay = random.uniform(1, 1.5)
-        logging.info(f"Waiting {delay:.2f}s before next webhook ({category_name})")
-        time.sleep(delay)
+    try:
+        for product, event_type, price_diff, direction in items_to_report:
+            with tracing.span('webhook', url=product.url, event=event_type):
+                send_item_webhook(product, event_type, previous_state, price_diff, direction)
+            delay = random.uniform(1, 1.5)
+            logging.info(f"Waiting {delay:.2f}s before next webhook ({category_name})")
+            tracing.sleep(delay, 'webhook delay')
+    finally:
+        # One summary write for the rows this batch appended
+        summary_stats.flush(CSV_FILE)
 
     return changes_detected
 
@@ -1072,27 +1045,66 @@ def send_webhook(products, previous_state, category_name):
 def signal_handler(sig, frame):
     """Handle graceful shutdown."""
     logging.info("Received shutdown signal. Saving state and exiting...")
-    print("Shutting down gracefully...")
     sys.exit(0)
 
 
+def run_fast_pass(deadline):
+    """Fast passes until the deadline; new deals go through the same alerts, CSV and state as a full cycle."""
+    states = {name: load_previous_state(config["state_file"]) for name, config in CATEGORY_URLS.items()}
+
+    def deep_fetch(idx, total, url, category_name):
+        with tracing.span('product', url=url, category=category_name):
+            return fetch_product_info(url, idx, total, category_name)
+
+    def on_products(category_name, products):
+        state_file = CATEGORY_URLS[category_name]["state_file"]
+        previous_state = states[category_name]
+        changes = send_webhook(products, previous_state, category_name)
+        seen_ids.add_many(p.id for p in products)
+        # Keep every tracked ID: a partial scan mustn't prune the state
+        save_state(products, set(previous_state) | {p.id for p in products}, state_file)
+        states[category_name] = load_previous_state(state_file)
+        if changes:
+            logging.info(f"Fast pass ({category_name}): {changes} changes alerted")
+            catalog_events.publish(RETAILER_KEY, atomic_io.read_generation(CSV_FILE))
+
+    fast_pass_watcher.reset()  # the full cycle just refreshed every product
+    passes = fast_pass.run_until(deadline, listing_scraper, CATEGORY_URLS, fast_pass_watcher, deep_fetch, on_products,
+                                 known_ids=lambda name: states[name], interval=FAST_PASS_INTERVAL, pages=FAST_PASS_PAGES)
+    logging.info(f"Ran {passes} fast passes before the next full cycle")
+
+
 def main():
     """Monitor all categories for new products and price changes."""
     global cycle_count, ssl_error_count, excluded_keyword_count
     logging.info("Starting unified John Lewis monitor (v27 with variant extraction and recently added tracking)...")
-    print("Starting unified John Lewis monitor (v27 with variant extraction and recently added tracking)...")
 
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
+
+    # One-off: seed the tiered store with the points already in the JSON history
+    price_store.migrate_from_json(PRICE_HISTORY_DB, load_price_history())
+    seen_ids.migrate_from_json(GLOBAL_STATE_FILE)
+    product_store.import_csv(PRODUCT_STORE_DB, CSV_FILE)
+
+    # Pick up an interrupted cycle where it stopped instead of starting over
+    checkpoint = crawl_checkpoint.CrawlCheckpoint(CHECKPOINT_FILE)
+    resuming = checkpoint.resume()
+    if resuming:
+        cycle_count = checkpoint.cycle - 1
    
     while True:
+        cycle_span = None
         try:
             cycle_count += 1
+            if not resuming:
+                checkpoint.start_cycle(cycle_count)
+            resuming = False
             ssl_error_count = 0
             excluded_keyword_count = 0
             start_time = datetime.now()
+            cycle_span = tracing.start_span('cycle', cycle=cycle_count)
             logging.info(f"Cycle {cycle_count} started at {start_time.strftime('%Y-%m-%d %H:%M:%S')}")
-            print(f"Cycle {cycle_count} started at {start_time.strftime('%Y-%m-%d %H:%M:%S')}")
            
             total_products_all = 0
             total_changes_all = 0
@@ -1101,25 +1113,50 @@ def main():
             all_current_product_ids = set()
 
             for category_name, category_config in CATEGORY_URLS.items():
-                print(f"\n--- Starting {category_name} ---")
+                if checkpoint.is_category_done(category_name):
+                    all_current_product_ids.update(checkpoint.category_ids(category_name))
+                    logging.info(f"--- Skipping {category_name}: already completed earlier in cycle {cycle_count} ---")
+                    continue
+
                 logging.info(f"--- Starting {category_name} ---")
+                category_span = tracing.start_span('category', category=category_name)
 
-                send_cycle_start_webhook(cycle_count, category_name)
+                with tracing.span('webhook', kind='cycle_start'):
+                    send_cycle_start_webhook(cycle_count, category_name)
 
                 previous_state = load_previous_state(category_config["state_file"])
-                product_urls = fetch_category_products(category_name, category_config)
+                product_urls = checkpoint.frontier(category_name)
+                if product_urls is None:
+                    product_urls = fetch_category_products(category_name, category_config)
+                    checkpoint.record_frontier(category_name, product_urls)
+                else:
+                    logging.info(f"Resuming {category_name} with {len(product_urls)} product URLs from checkpoint")
                 products = []
                 request_count = len(product_urls)
                 filtered_count = 0
                 current_product_ids = set()
 
                 total_products = len(product_urls)
-                for idx, url in enumerate(product_urls, 1):
-                    product = fetch_product_info(url, idx, total_products, category_name)
+
+                # Workers run on pool threads, so their spans name the category span as parent
+                def fetch_one(idx, url, parent=category_span):
+                    already_fetched, product = checkpoint.completed(category_name, url)
+                    if not already_fetched:
+                        filtered_out = []
+                        with tracing.span('product', parent=parent, url=url, category=category_name):
+                            product = fetch_product_info(url, idx, total_products, category_name,
+                                                         on_filtered=filtered_out.append)
+                        # Failed fetches aren't journaled, so a resumed cycle retries them
+                        if product is not None or filtered_out:
+                            checkpoint.record_product(category_name, url, product)
+                    return product
+
+                # Product pages on the shared crawler core, HTTP_CONFIG["concurrency"] at a time
+                for product in scraper_engine.crawl(product_urls, fetch_one, HTTP_CONFIG["concurrency"]):
                     if product:
                         products.append(product)
-                        current_product_ids.add(product["product_id"])
-                        all_current_product_ids.add(product["product_id"])
+                        current_product_ids.add(product.id)
+                        all_current_product_ids.add(product.id)
                     else:
                         filtered_count += 1
                     request_count += 1
@@ -1127,7 +1164,8 @@ def main():
                 changes_detected = 0
                 if products:
                     changes_detected = send_webhook(products, previous_state, category_name)
-                    save_state(products, current_product_ids, category_config["state_file"])
+                    with tracing.span('state_save', category=category_name):
+                        save_state(products, current_product_ids, category_config["state_file"])
                 else:
                     logging.warning(f"No valid products fetched for {category_name}.")
                     send_error_webhook(f"No valid products found in {category_name}: {category_config['url']}")
@@ -1137,44 +1175,68 @@ def main():
                 filtered_count_all += filtered_count
                 request_count_all += request_count
 
-                print(f"{category_name} complete: Checked {len(products)} products, {filtered_count} filtered out, {changes_detected} changes detected")
                 logging.info(f"{category_name} complete: Checked {len(products)} products, {filtered_count} filtered out, {changes_detected} changes detected")
+                tracing.end_span(category_span, products=len(products), changes=changes_detected)
+                checkpoint.complete_category(category_name, current_product_ids)
+                first_seen = seen_ids.add_many(current_product_ids)
+                if first_seen:
+                    logging.info(f"{category_name}: {len(first_seen)} products never seen before")
+                if changes_detected:
+                    catalog_events.publish(RETAILER_KEY, atomic_io.read_generation(CSV_FILE))
 
                 # Delay between categories
-                time.sleep(random.uniform(30, 60))
+                tracing.sleep(random.uniform(30, 60), 'category delay')
            
             # Clean old products from CSV
-            print("\n--- Cleaning old products from CSV ---")
             logging.info("--- Cleaning old products from CSV ---")
-            clean_old_products_from_csv(all_current_product_ids)
+            with tracing.span('csv_cleanup'):
+                clean_old_products_from_csv(all_current_product_ids)
+
+            # Refresh lowest-ever / rolling min-max / drop stats for the web app
+            with tracing.span('price_store_compact'):
+                price_store.compact(PRICE_HISTORY_DB)
+            with tracing.span('price_analytics'):
+                analysed = price_analytics.run(PRICE_HISTORY_FILE)
+            logging.info(f"Price analytics updated for {len(analysed)} products")
+            catalog_events.publish(RETAILER_KEY, atomic_io.read_generation(CSV_FILE))
+            checkpoint.finish()
+            seen_ids.compact()
            
             end_time = datetime.now()
             duration = (end_time - start_time).total_seconds() / 60.0
             logging.info(f"Cycle {cycle_count} finished at {end_time.strftime('%Y-%m-%d %H:%M:%S')}, took {duration:.2f} minutes")
-            print(f"Cycle {cycle_count} finished at {end_time.strftime('%Y-%m-%d %H:%M:%S')}, took {duration:.2f} minutes")
             logging.info(f"Cycle {cycle_count} complete: Checked {total_products_all} products across categories, {filtered_count_all} filtered out, {excluded_keyword_count} excluded by keywords, {total_changes_all} changes detected, {request_count_all} requests made, {ssl_error_count} SSL errors")
+            http_metrics = http.metrics()
+            logging.info(f"HTTP client: {http_metrics['requests']} requests over {http_metrics['connections_opened']} connections (reuse {http_metrics['reuse_ratio']:.0%}, backend {http_metrics['backend']})")
+            extraction_rules.log_hit_rates()
+            extraction_rules.reset_stats()
+            tracing.end_span(cycle_span, products=total_products_all, changes=total_changes_all, ssl_errors=ssl_error_count,
+                             http_requests=http_metrics['requests'], http_connections=http_metrics['connections_opened'])
+            cycle_span = None
 
             if cycle_count % NOTIFY_EVERY_CYCLES == 0:
                 summary_msg = f"✅ Full Cycle {cycle_count} Complete: {total_products_all} products checked, {total_changes_all} changes across all categories. CSV cleaned of old products."
                 webhook = DiscordWebhook(url=WEBHOOK_URL, content=summary_msg)
                 webhook.execute()
 
-            if ssl_error_count > 10:
-                logging.warning(f"High SSL error count ({ssl_error_count}) in cycle {cycle_count}. Pausing for 30 minutes...")
-                send_error_webhook(f"High SSL error count ({ssl_error_count}) in cycle {cycle_count}. Pausing for 30 minutes.")
-                time.sleep(1800)
-                check_interval = random.uniform(6900, 7500)
-            else:
-                check_interval = random.uniform(6900, 7500)
+            check_interval = random.uniform(*scraper_configs.JOHN_LEWIS["interval"])
 
             logging.info(f"Next check in {check_interval/60:.2f} minutes...")
-            print(f"Next check in {check_interval/60:.2f} minutes...")
-            time.sleep(check_interval)
+            if FAST_PASS_ENABLED:
+                run_fast_pass(time.time() + check_interval)
+            else:
+                time.sleep(check_interval)
        
         except Exception as e:
+            if cycle_span:
+                tracing.end_span(cycle_span, error=e)
             logging.error(f"Script crashed: {e}. Restarting in 60 seconds...")
             send_error_webhook(f"Unified monitor crashed: {e}. Restarting...")
             time.sleep(60)
+            # Continue the interrupted cycle from its checkpoint
+            resuming = checkpoint.resume()
+            if resuming:
+                cycle_count = checkpoint.cycle - 1
 
 
 if __name__ == "__main__":
@@ -1,344 +1,399 @@
 """
 Complete Flask app for SaleScout with modern design and recently added tracking
 """
-from flask import Flask, render_template, jsonify, request
-import csv
+from flask import Flask, render_template, jsonify, request, g
 import os
-import json
-from datetime import datetime, timedelta
+import re
+import logging
+import secrets
+from operator import attrgetter
+import log_config
+from render_cache import RenderCache
+import http_cache
+import image_proxy
+import watchlist
+from product import products_to_json
+import retailers
+from retailers import current_version, current_mtime, get_retailer_stats
 
 app = Flask(__name__)
-
-# Price history file paths
-PRICE_HISTORY_FILES = {
-    'johnlewis': 'price_history.json',  # Updated to match your actual file
-    'selfridges': 'selfridges_price_history.json'
-}
-
-# Recently added time threshold (hours)
-RECENTLY_ADDED_HOURS = 24
-
-def load_price_history(retailer):
-    """Load price history for recently reduced detection"""
-    price_history_file = PRICE_HISTORY_FILES.get(retailer)
-    
-    # If johnlewis, try the state directory path
-    if retailer == 'johnlewis':
-        state_dir_path = os.path.join('state', 'price_history.json')
-        if os.path.exists(state_dir_path):
-            price_history_file = state_dir_path
-    
-    if not price_history_file or not os.path.exists(price_history_file):
-        return {}
-
-    try:
-        with open(price_history_file, 'r') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {}
-
-def is_recently_reduced(product_id, retailer):
-    """Check if product is recently reduced"""
-    price_history = load_price_history(retailer)
-    return price_history.get(str(product_id), {}).get("recently_reduced", False)
-
-def is_recently_added(timestamp_str):
-    """
-    Check if product was added within the recently added time threshold
-    """
-    if not timestamp_str:
-        return False
-
-    try:
-        # Parse the timestamp from the CSV
-        timestamp = datetime.strptime(timestamp_str, '%Y-%m-%d %H:%M:%S')
-        current_time = datetime.now()
-        time_diff = current_time - timestamp
-
-        # Check if the product was added within the threshold
-        is_recent = time_diff <= timedelta(hours=RECENTLY_ADDED_HOURS)
-        
-        return is_recent
-    except (ValueError, TypeError) as e:
-        return False
-
-def read_selfridges_csv(csv_path='salescout_selfridges.csv'):
-    """Read Selfridges CSV data with recently reduced detection"""
-    products = []
-    if not os.path.exists(csv_path):
-        return products
-
-    try:
-        with open(csv_path, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                # Handle CSV fields based on your structure
-                product_id = row.get('Product ID', '')
-                
-                try:
-                    current_price = float(row.get('Current Price', 0)) if row.get('Current Price') else 0
-                except ValueError:
-                    current_price = 0
-                    
-                try:
-                    original_price = float(row.get('Original Price', 0)) if row.get('Original Price') else 0
-                except ValueError:
-                    original_price = 0
-
-                try:
-                    discount = float(row.get('Discount', 0)) if row.get('Discount') else 0
-                except ValueError:
-                    discount = 0
-
-                product = {
-                    'id': product_id,
-                    'name': row.get('Product Name', ''),
-                    'brand': row.get('brand', ''),
-                    'current_price': current_price,
-                    'original_price': original_price,
-                    'discount': round(discount, 1),
-                    'stock_status': row.get('Stock Status', 'Unknown'),
-                    'sizes': row.get('Sizes', 'See product page'),
-                    'url': row.get('URL', ''),
-                    'image': row.get('Image', ''),
-                    'category': row.get('Category', 'Selfridges'),
-                    'timestamp': row.get('Timestamp', ''),
-                    'retailer': 'Selfridges',
-                    'recently_reduced': is_recently_reduced(product_id, 'selfridges'),
-                    'recently_added': is_recently_added(row.get('Timestamp', ''))
-                }
-
-                if product['original_price'] and product['current_price']:
-                    product['savings'] = product['original_price'] - product['current_price']
-                else:
-                    product['savings'] = 0
-
-                products.append(product)
-    except Exception as e:
-        print(f"Error reading Selfridges CSV: {e}")
-
-    return products
-
-def read_johnlewis_csv(csv_path='johnlewisv2.csv'):
-    """Read John Lewis CSV data with recently reduced and recently added detection"""
-    products = []
-    if not os.path.exists(csv_path):
-        print(f"CSV not found: {csv_path}")
-        return products
-
-    try:
-        with open(csv_path, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            
-            for row in reader:
-                product_id = row.get('Product ID', '')
-                
-                # Parse prices safely
-                try:
-                    current_price = float(row.get('Current Price', 0)) if row.get('Current Price') else 0
-                except ValueError:
-                    current_price = 0
-                
-                try:
-                    original_price = float(row.get('Original Price', 0)) if row.get('Original Price') else 0
-                except ValueError:
-                    original_price = 0
-                
-                try:
-                    discount = float(row.get('Discount', 0)) if row.get('Discount') else 0
-                except ValueError:
-                    discount = 0
-                
-                timestamp = row.get('Timestamp', '')
-                
-                # Check recently added status
-                recently_added = is_recently_added(timestamp)
-                
-                product = {
-                    'id': product_id,
-                    'name': row.get('Product Name', ''),
-                    'brand': 'John Lewis',
-                    'current_price': current_price,
-                    'original_price': original_price,
-                    'discount': discount,
-                    'stock_status': row.get('Stock Status', 'Unknown'),
-                    'sizes': row.get('Sizes', 'See product page'),
-                    'url': row.get('URL', ''),
-                    'image': row.get('Image', ''),
-                    'category': row.get('Category', 'John Lewis'),
-                    'timestamp': timestamp,
-                    'retailer': 'John Lewis',
-                    'recently_reduced': is_recently_reduced(product_id, 'johnlewis'),
-                    'recently_added': recently_added
-                }
-
-                if product['original_price'] and product['current_price']:
-                    product['savings'] = product['original_price'] - product['current_price']
-                else:
-                    product['savings'] = 0
-
-                products.append(product)
-        
-        print(f"Loaded {len(products)} products from John Lewis CSV")
-        recently_added_count = sum(1 for p in products if p.get('recently_added', False))
-        print(f"  Recently added: {recently_added_count} products")
-        
-    except Exception as e:
-        print(f"Error reading John Lewis CSV: {e}")
-
-    return products
+http_cache.register_template_globals(app)
+app.after_request(http_cache.static_cache_headers)
+
+# Anonymous per-browser ID that owns a watchlist and saved searches
+USER_COOKIE = 'salescout_user'
+USER_COOKIE_MAX_AGE = 2 * 365 * 24 * 3600
+USER_ID_PATTERN = re.compile(r'[A-Za-z0-9_-]{16,64}')
+
+# Debug output is off unless SALESCOUT_LOG_LEVEL=DEBUG
+log_config.setup_logging(os.environ.get('SALESCOUT_APP_LOG_FILE'))
+logger = logging.getLogger(__name__)
+
+# Catalogs are rebuilt in the background when the scraper publishes an update
+# (SALESCOUT_LIVE_CATALOG=0 falls back to checking the files on each request)
+if os.environ.get('SALESCOUT_LIVE_CATALOG', '1') != '0':
+    retailers.enable_live_updates()
+
+# Encoded page and API bodies, keyed by (scope, normalized query args, encoding)
+SORT_OPTIONS = ('discount', 'recently_reduced', 'recently_added', 'all_time_low', 'net_reduction', 'price', 'name')
+page_cache = RenderCache(max_entries=128, max_bytes=64 * 1024 * 1024, ttl_seconds=300)
+api_cache = RenderCache(max_entries=64, max_bytes=32 * 1024 * 1024, ttl_seconds=300)
+# Filtered/sorted product lists, so paging through a view doesn't re-sort it (sizes are product counts)
+selection_cache = RenderCache(max_entries=32, max_bytes=200000, ttl_seconds=300)
+
+# The retailer page renders the first PAGE_SIZE cards; the grid fetches the rest
+# from /api/<retailer>/products as the user scrolls
+PAGE_SIZE = 48
+MAX_PAGE_SIZE = 200
+CARD_FIELDS = ('id', 'name', 'url', 'current_price', 'original_price', 'discount', 'stock_status',
+               'sizes', 'retailer', 'recently_reduced', 'recently_added')
 
 @app.route('/')
 def home():
     """Modern SaaS homepage"""
-    selfridges = read_selfridges_csv()
-    johnlewis = read_johnlewis_csv()
-
-    # Calculate live stats for homepage
-    jl_stats = {
-        'total': len(johnlewis),
-        'max_discount': max([p['discount'] for p in johnlewis], default=0),
-        'recently_reduced': sum(1 for p in johnlewis if p.get('recently_reduced', False)),
-        'recently_added': sum(1 for p in johnlewis if p.get('recently_added', False))
-    }
-
-    sf_stats = {
-        'total': len(selfridges),
-        'max_discount': max([p['discount'] for p in selfridges], default=0),
-        'recently_reduced': sum(1 for p in selfridges if p.get('recently_reduced', False)),
-        'recently_added': sum(1 for p in selfridges if p.get('recently_added', False))
-    }
-
-    return render_template('modern_home.html',
-                         johnlewis_stats=jl_stats,
-                         selfridges_stats=sf_stats)
+    version = (current_version('johnlewis'), current_version('selfridges'))
+    return http_cache.cached_response(
+        page_cache, 'home', (), version,
+        lambda: render_template('modern_home.html',
+                                johnlewis_stats=get_retailer_stats('johnlewis'),
+                                selfridges_stats=get_retailer_stats('selfridges')),
+        'text/html',
+        last_modified=current_mtime('johnlewis', 'selfridges'))
+
+@app.route('/img/<key>', endpoint='image')
+def image(key):
+    """Cached, resized retailer image (see image_proxy)"""
+    return image_proxy.serve(key)
 
 @app.route('/<retailer>')
 def retailer_page(retailer):
     """Modern retailer pages with filtering and sorting"""
-    if retailer not in ['selfridges', 'johnlewis']:
+    if retailers.get_config(retailer) is None:
         return "Retailer not found", 404
 
-    # Get query parameters for filtering/sorting
-    search_query = request.args.get('search', '').lower()
+    # Serve (or 304) a previously rendered page if the catalog hasn't changed since
+    args = view_args()
+    return http_cache.cached_response(
+        page_cache, retailer, args, current_version(retailer),
+        lambda: render_retailer_page(retailer, *args),
+        'text/html',
+        last_modified=current_mtime(retailer))
+
+def view_args():
+    """Filter/sort query parameters, normalized so equivalent URLs share a cache entry"""
+    raw_search = request.args.get('search', '').strip()
     sort_by = request.args.get('sort', 'discount')
-    category_filter = request.args.get('category', '')
-    recently_added_filter = request.args.get('recently_added', '')
-
-    # Load products
-    if retailer == 'selfridges':
-        products = read_selfridges_csv()
-        retailer_name = 'Selfridges'
-        color_theme = 'purple'
-    else:
-        products = read_johnlewis_csv()
-        retailer_name = 'John Lewis'
-        color_theme = 'green'
-
-    print(f"\n=== {retailer_name} Filter Debug ===")
-    print(f"Total products loaded: {len(products)}")
-    print(f"Recently added filter: '{recently_added_filter}'")
-    
-    # Count recently added BEFORE filtering
-    recently_added_count_before = sum(1 for p in products if p.get('recently_added', False))
-    print(f"Recently added products before filter: {recently_added_count_before}")
-
-    # Apply filters
+    if sort_by not in SORT_OPTIONS:
+        sort_by = 'discount'
+    category_filter = request.args.get('category', '').strip().lower()
+    recently_added_filter = 'true' if request.args.get('recently_added', '') == 'true' else ''
+    return raw_search, sort_by, category_filter, recently_added_filter
+
+def filter_and_sort(products, search_query, category_filter, recently_added_filter, sort_by, filtered):
+    """Pure-Python filtering, sorting and stats (used when NumPy isn't installed)"""
     if search_query:
-        products = [p for p in products if search_query in p['name'].lower()]
-        print(f"After search filter: {len(products)} products")
+        products = [p for p in products if search_query in p.name.lower()]
 
     if category_filter:
-        products = [p for p in products if category_filter.lower() in p['category'].lower()]
-        print(f"After category filter: {len(products)} products")
+        products = [p for p in products if category_filter in p.category.lower()]
 
     # Recently added filter
     if recently_added_filter == 'true':
-        before_count = len(products)
-        products = [p for p in products if p.get('recently_added', False)]
-        print(f"Recently added filter applied: {before_count} -> {len(products)} products")
-        
-        # Debug: Show which products passed
-        if products:
-            print("Recently added products:")
-            for p in products[:5]:  # Show first 5
-                print(f"  - {p['name'][:50]} (added: {p.get('timestamp', 'N/A')})")
+        products = [p for p in products if p.recently_added]
 
     # Apply sorting
     if sort_by == 'recently_reduced':
-        products.sort(key=lambda x: (x.get('recently_reduced', False), x['discount']), reverse=True)
+        products.sort(key=attrgetter('recently_reduced', 'discount'), reverse=True)
     elif sort_by == 'recently_added':
-        products.sort(key=lambda x: (x.get('recently_added', False), x['discount']), reverse=True)
+        products.sort(key=attrgetter('recently_added', 'discount'), reverse=True)
+    elif sort_by == 'all_time_low':
+        products.sort(key=attrgetter('at_all_time_low', 'discount'), reverse=True)
     elif sort_by == 'net_reduction':
-        products.sort(key=lambda x: x.get('savings', 0), reverse=True)
+        products.sort(key=attrgetter('savings'), reverse=True)
     elif sort_by == 'price':
-        products.sort(key=lambda x: x['current_price'] or float('inf'))
+        products.sort(key=lambda x: x.current_price or float('inf'))
     elif sort_by == 'name':
-        products.sort(key=lambda x: x['name'])
+        products.sort(key=attrgetter('name'))
     else:  # discount
-        products.sort(key=lambda x: x['discount'], reverse=True)
+        products.sort(key=attrgetter('discount'), reverse=True)
 
-    # Calculate stats
+    if not filtered:
+        return products, None
+    discounted = [p.discount for p in products if p.discount > 0]
     stats = {
         'total_products': len(products),
-        'avg_discount': round(sum(p['discount'] for p in products if p['discount'] > 0) / max(1, len([p for p in products if p['discount'] > 0])), 1),
-        'max_discount': max([p['discount'] for p in products], default=0),
-        'total_savings': sum(p.get('savings', 0) for p in products),
-        'recently_reduced_count': sum(1 for p in products if p.get('recently_reduced', False)),
-        'recently_added_count': sum(1 for p in products if p.get('recently_added', False)),
-        'last_updated': products[0]['timestamp'] if products else 'Never'
+        'avg_discount': round(sum(discounted) / max(1, len(discounted)), 1),
+        'max_discount': max([p.discount for p in products], default=0),
+        'total_savings': sum(p.savings for p in products),
+        'recently_reduced_count': sum(1 for p in products if p.recently_reduced),
+        'recently_added_count': sum(1 for p in products if p.recently_added),
     }
-    
-    print(f"Final stats - Recently added: {stats['recently_added_count']}")
-    print(f"=================================\n")
+    return products, stats
+
+def select_products(retailer, raw_search, sort_by, category_filter, recently_added_filter):
+    """Filtered, sorted products and their stats (None when unfiltered), cached per catalog version"""
+    version = current_version(retailer)
+    key = (retailer, raw_search, sort_by, category_filter, recently_added_filter)
+    cached = selection_cache.get(key, version)
+    if cached is not None:
+        return cached
+
+    search_query = raw_search.lower()
+    filtered = bool(search_query or category_filter or recently_added_filter == 'true')
+
+    catalog = retailers.get_catalog(retailer)
+    columns = catalog.columns
+    if columns is not None:
+        # Vectorized path: boolean masks for filters, argsort for ordering
+        mask = columns.mask(search_query, category_filter, recently_added_filter == 'true')
+        products = columns.select(mask, sort_by)
+        stats = columns.stats(mask) if filtered else None
+    else:
+        products, stats = filter_and_sort(list(catalog.products), search_query, category_filter, recently_added_filter, sort_by, filtered)
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"{retailer} filters: search='{search_query}', category='{category_filter}', recently_added='{recently_added_filter}', {len(products)} products after filters")
+    selection_cache.put(key, version, (products, stats), size=max(1, len(products)))
+    return products, stats
+
+def grid_cards(products):
+    """Card fields for the scrolling grid, with proxied image URLs"""
+    cards = []
+    for product in products:
+        card = {name: getattr(product, name) for name in CARD_FIELDS}
+        if isinstance(card['sizes'], list):
+            card['sizes'] = ', '.join(card['sizes'])
+        card['image'] = image_proxy.image_url(product.image)
+        card['srcset'] = image_proxy.image_srcset(product.image)
+        cards.append(card)
+    return cards
+
+def render_retailer_page(retailer, raw_search, sort_by, category_filter, recently_added_filter):
+    """Render the first page of a retailer view (only called on a cache miss)"""
+    config = retailers.get_config(retailer)
+    products, stats = select_products(retailer, raw_search, sort_by, category_filter, recently_added_filter)
+
+    # Unfiltered views use the precomputed summary
+    if stats is None:
+        summary = get_retailer_stats(retailer)
+        stats = {
+            'total_products': summary['total'],
+            'avg_discount': summary['avg_discount'],
+            'max_discount': summary['max_discount'],
+            'total_savings': summary['total_savings'],
+            'recently_reduced_count': summary['recently_reduced'],
+            'recently_added_count': summary['recently_added'],
+        }
+    else:
+        stats = dict(stats)
+    stats['last_updated'] = products[0].timestamp if products else 'Never'
 
+    first_page = products[:PAGE_SIZE]
     return render_template('modern_retailer.html',
-                         products=products,
-                         retailer=retailer_name,
+                         products=first_page,
+                         grid_cards=grid_cards(first_page),
+                         total_count=len(products),
+                         page_size=PAGE_SIZE,
+                         retailer=config['name'],
                          retailer_key=retailer,
                          stats=stats,
-                         color_theme=color_theme,
-                         current_search=request.args.get('search', ''),
+                         color_theme=config['color_theme'],
+                         current_search=raw_search,
                          current_sort=sort_by,
                          current_category=category_filter,
                          current_recently_added=recently_added_filter)
 
 # API endpoints
+def json_response(scope, version, build_payload, *retailers, args_key=()):
+    """Cached, compressed JSON response with a catalog-version ETag"""
+    return http_cache.cached_response(
+        api_cache, scope, args_key, version,
+        lambda: app.json.dumps(build_payload()),
+        'application/json',
+        last_modified=current_mtime(*retailers))
+
 @app.route('/api/selfridges')
 def api_selfridges():
     """Selfridges API endpoint"""
-    products = read_selfridges_csv()
-    return jsonify({
-        'retailer': 'Selfridges',
-        'total_products': len(products),
-        'products': products
-    })
+    def build():
+        products = retailers.get_products('selfridges')
+        return {
+            'retailer': 'Selfridges',
+            'total_products': len(products),
+            'products': products_to_json(products)
+        }
+    return json_response('api_selfridges', current_version('selfridges'), build, 'selfridges')
 
 @app.route('/api/johnlewis')
 def api_johnlewis():
     """John Lewis API endpoint"""
-    products = read_johnlewis_csv()
-    return jsonify({
-        'retailer': 'John Lewis',
-        'total_products': len(products),
-        'products': products
-    })
+    def build():
+        products = retailers.get_products('johnlewis')
+        return {
+            'retailer': 'John Lewis',
+            'total_products': len(products),
+            'products': products_to_json(products)
+        }
+    return json_response('api_johnlewis', current_version('johnlewis'), build, 'johnlewis')
 
 @app.route('/api/deals')
 def api_deals():
     """Combined deals API"""
-    selfridges = read_selfridges_csv()
-    johnlewis = read_johnlewis_csv()
-
-    all_products = selfridges + johnlewis
-    all_products.sort(key=lambda x: x['discount'], reverse=True)
-
-    return jsonify({
-        'total_products': len(all_products),
-        'selfridges_count': len(selfridges),
-        'johnlewis_count': len(johnlewis),
-        'products': all_products
+    def build():
+        selfridges = retailers.get_products('selfridges')
+        johnlewis = retailers.get_products('johnlewis')
+
+        all_products = selfridges + johnlewis
+        all_products.sort(key=attrgetter('discount'), reverse=True)
+
+        return {
+            'total_products': len(all_products),
+            'selfridges_count': len(selfridges),
+            'johnlewis_count': len(johnlewis),
+            'products': products_to_json(all_products)
+        }
+    version = (current_version('johnlewis'), current_version('selfridges'))
+    return json_response('api_deals', version, build, 'johnlewis', 'selfridges')
+
+@app.route('/api/<retailer>/products')
+def api_retailer_products(retailer):
+    """One page of a retailer view (same filters and sort as the page) for the scrolling grid"""
+    if retailers.get_config(retailer) is None:
+        return jsonify({'error': 'Retailer not found'}), 404
+    args = view_args()
+    offset = max(0, request.args.get('offset', 0, type=int))
+    limit = min(max(1, request.args.get('limit', PAGE_SIZE, type=int)), MAX_PAGE_SIZE)
+
+    def build():
+        products, _ = select_products(retailer, *args)
+        return {
+            'retailer': retailers.get_config(retailer)['name'],
+            'total': len(products),
+            'offset': offset,
+            'limit': limit,
+            'products': grid_cards(products[offset:offset + limit])
+        }
+    return json_response(f'{retailer}_products', current_version(retailer), build, retailer,
+                         args_key=args + (offset, limit))
+
+@app.route('/api/product/<product_id>/history')
+def api_product_history(product_id):
+    """Price points and post-cycle analytics (lowest ever, rolling min/max, drops) for one product"""
+    found = retailers.find_product(product_id)
+    if found is None:
+        return jsonify({'error': 'Product not found'}), 404
+    retailer, catalog, product = found
+
+    def build():
+        history = catalog.price_history.get(product_id, {})
+        return {
+            'id': product.id,
+            'name': product.name,
+            'retailer': product.retailer,
+            'current_price': product.current_price,
+            'initial_price': history.get('initial_price'),
+            'prices': history.get('prices', []),
+            'analytics': catalog.analytics.get(product_id)
+        }
+    return json_response('api_history', catalog.version, build, retailer, args_key=(product_id,))
+
+# Watchlist and saved searches (per user, never cached)
+def current_user():
+    """The browser's user ID, issuing a new one (set as a cookie after the request) if needed"""
+    if 'user_id' not in g:
+        user_id = request.cookies.get(USER_COOKIE, '')
+        if not USER_ID_PATTERN.fullmatch(user_id):
+            user_id = secrets.token_urlsafe(18)
+            g.new_user = True
+        g.user_id = user_id
+    return g.user_id
+
+@app.after_request
+def set_user_cookie(response):
+    if g.get('new_user'):
+        response.set_cookie(USER_COOKIE, g.user_id, max_age=USER_COOKIE_MAX_AGE,
+                            httponly=True, samesite='Lax', secure=request.is_secure)
+    return response
+
+def private_json(payload, status=200):
+    response = jsonify(payload)
+    response.status_code = status
+    response.headers['Cache-Control'] = 'private, no-store'
+    return response
+
+@app.route('/api/watchlist')
+def api_watchlist():
+    """The user's watched products (with live prices) and saved searches"""
+    watches = watchlist.get_watches(watchlist.DEFAULT_PATH, current_user())
+    for watch in watches:
+        found = retailers.find_product(watch['product_id'])
+        if found is not None:
+            product = found[2]
+            watch.update(current_price=product.current_price, original_price=product.original_price,
+                         discount=product.discount, url=product.url, image=image_proxy.image_url(product.image),
+                         stock_status=product.stock_status)
+        watch['listed'] = found is not None
+    return private_json({
+        'watches': watches,
+        'searches': watchlist.get_searches(watchlist.DEFAULT_PATH, current_user())
     })
 
+@app.route('/api/watchlist', methods=['POST'])
+def api_watch():
+    """Add a product to the user's watchlist: {"product_id": ...}"""
+    product_id = str((request.get_json(silent=True) or {}).get('product_id', ''))
+    found = retailers.find_product(product_id)
+    if found is None:
+        return private_json({'error': 'Product not found'}, 404)
+    retailer, _, product = found
+    if not watchlist.add_watch(watchlist.DEFAULT_PATH, current_user(), product, retailer):
+        return private_json({'error': f'Watchlist is full ({watchlist.MAX_WATCHES} products)'}, 400)
+    return private_json({'product_id': product_id, 'watching': True}, 201)
+
+@app.route('/api/watchlist/<product_id>', methods=['DELETE'])
+def api_unwatch(product_id):
+    watchlist.remove_watch(watchlist.DEFAULT_PATH, current_user(), product_id)
+    return private_json({'product_id': product_id, 'watching': False})
+
+@app.route('/api/searches', methods=['POST'])
+def api_save_search():
+    """Save a search: {"term", "category", "retailer", "min_discount"} (term or category required)"""
+    data = request.get_json(silent=True) or {}
+    retailer = data.get('retailer') or ''
+    if retailer and retailers.get_config(retailer) is None:
+        return private_json({'error': 'Retailer not found'}, 404)
+    try:
+        min_discount = min(max(float(data.get('min_discount') or 0), 0), 100)
+    except (TypeError, ValueError):
+        return private_json({'error': 'min_discount must be a number'}, 400)
+    search_id = watchlist.add_search(watchlist.DEFAULT_PATH, current_user(), str(data.get('term', ''))[:100],
+                                     str(data.get('category', ''))[:100], retailer, min_discount)
+    if search_id is None:
+        return private_json({'error': f'Give a term or category (at most {watchlist.MAX_SEARCHES} searches)'}, 400)
+    return private_json({'id': search_id}, 201)
+
+@app.route('/api/searches/<int:search_id>', methods=['DELETE'])
+def api_delete_search(search_id):
+    if not watchlist.remove_search(watchlist.DEFAULT_PATH, current_user(), search_id):
+        return private_json({'error': 'Search not found'}, 404)
+    return private_json({'id': search_id, 'deleted': True})
+
+@app.route('/api/alerts')
+def api_alerts():
+    """Alerts raised for the user's watches and saved searches, newest first (?since=<alert id>)"""
+    since = request.args.get('since', 0, type=int)
+    alerts = watchlist.get_alerts(watchlist.DEFAULT_PATH, current_user(), since_id=since)
+    for alert in alerts:
+        alert['image'] = image_proxy.image_url(alert.get('image'))
+    return private_json({'alerts': alerts})
+
+@app.route('/api/alerts/seen', methods=['POST'])
+def api_alerts_seen():
+    """Mark alerts up to {"up_to": <alert id>} as seen"""
+    up_to = (request.get_json(silent=True) or {}).get('up_to', 0)
+    if not isinstance(up_to, int):
+        return private_json({'error': 'up_to must be an alert id'}, 400)
+    return private_json({'seen': watchlist.mark_seen(watchlist.DEFAULT_PATH, current_user(), up_to)})
+
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,115 @@
+"""
+Crash-safe file writes shared by the scraper and the web app.
+
+atomic_write() writes to a temp file in the same directory, fsyncs it and
+os.replace()s it over the target, so a reader sees either the old file or the
+new one, never a half-written one. Every completed write (and every append
+through append()) bumps a generation counter in a small sidecar file
+(johnlewisv2.csv -> johnlewisv2.csv.gen). Readers compare generations to
+detect updates without re-parsing or trusting mtimes.
+"""
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+
+GENERATION_SUFFIX = '.gen'
+REPLACE_RETRIES = 5  # Windows refuses os.replace while another process has the target open
+
+logger = logging.getLogger(__name__)
+
+
+def generation_path(path):
+    return path + GENERATION_SUFFIX
+
+
+def read_generation(path):
+    """Current generation of a file, or None if it has never been written through this module"""
+    try:
+        with open(generation_path(path), 'r') as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return None
+
+
+def bump_generation(path):
+    """Increment and return the generation counter of a file"""
+    generation = (read_generation(path) or 0) + 1
+    with atomic_write(generation_path(path), bump=False) as f:
+        f.write(str(generation))
+    return generation
+
+
+def _replace(tmp_path, path):
+    for attempt in range(REPLACE_RETRIES):
+        try:
+            os.replace(tmp_path, path)
+            return
+        except PermissionError:
+            if attempt == REPLACE_RETRIES - 1:
+                raise
+            time.sleep(0.05 * (attempt + 1))
+
+
+def _fsync_dir(directory):
+    """Persist the rename itself (no-op where directories can't be opened, e.g. Windows)"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def atomic_write(path, mode='w', bump=True, **open_kwargs):
+    """
+    Open a temp file for writing; on a clean exit it replaces path atomically.
+
+    If the block raises, the temp file is removed and path is left untouched.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, mode, **open_kwargs) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates 0600 files; keep the target's permissions so other readers still can
+        if os.path.exists(path):
+            shutil.copymode(path, tmp_path)
+        else:
+            os.chmod(tmp_path, 0o644)
+        _replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    _fsync_dir(directory)
+    if bump:
+        bump_generation(path)
+
+
+def write_json(path, data, **dump_kwargs):
+    """Atomically replace path with data serialized as JSON"""
+    with atomic_write(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, **dump_kwargs)
+
+
+@contextmanager
+def append(path, **open_kwargs):
+    """Append to a file, fsync, then bump its generation (appends are not rewritten atomically)"""
+    with open(path, 'a', **open_kwargs) as f:
+        yield f
+        f.flush()
+        os.fsync(f.fileno())
+    bump_generation(path)
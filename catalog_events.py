@@ -0,0 +1,170 @@
+"""
+Catalog update notifications from the scraper to the web app.
+
+The scraper calls publish() after it rewrites a retailer's files. Each app
+process binds its own Unix datagram socket in EVENT_DIR
+(app-<pid>.sock), and publish() sends a small JSON message
+{"retailer": ..., "generation": N} to every socket there, removing sockets
+whose process has gone.
+
+start_subscriber() runs a daemon thread that waits for those messages and
+calls on_update(retailer) so the catalog is rebuilt off the request path.
+The wait times out every SAFETY_POLL_SECONDS and calls on_update(None) to
+catch files changed by other tools. Where AF_UNIX datagram sockets aren't
+available (Windows), the thread polls every POLL_SECONDS instead.
+
+The thread belongs to the process that started it: a worker forked from a
+preloading server (gunicorn --preload) has no listener until it calls
+start_subscriber() itself, and subscriber_running() tells callers when they
+must check the files directly instead.
+"""
+import atexit
+import glob
+import json
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+
+EVENT_DIR = os.environ.get('SALESCOUT_EVENT_DIR', os.path.join(tempfile.gettempdir(), 'salescout-events'))
+POLL_SECONDS = 5
+SAFETY_POLL_SECONDS = 60
+DEBOUNCE_SECONDS = 1.0
+
+logger = logging.getLogger(__name__)
+
+_subscriber = None
+_subscriber_pid = None
+_start_lock = threading.Lock()
+
+
+def ipc_supported():
+    return hasattr(socket, 'AF_UNIX') and os.name != 'nt'
+
+
+def publish(retailer, generation=None):
+    """Tell every running app process that a retailer's catalog changed"""
+    if not ipc_supported():
+        return 0
+    message = json.dumps({'retailer': retailer, 'generation': generation}).encode('utf-8')
+    sent = 0
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    try:
+        sock.setblocking(False)
+        for path in glob.glob(os.path.join(EVENT_DIR, 'app-*.sock')):
+            try:
+                sock.sendto(message, path)
+                sent += 1
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Subscriber process is gone
+                _unlink_quietly(path)
+            except OSError as e:
+                logger.debug(f"Catalog event to {path} not delivered: {e}")
+    finally:
+        sock.close()
+    logger.debug(f"Published catalog update for {retailer} (generation {generation}) to {sent} subscriber(s)")
+    return sent
+
+
+def _bind():
+    os.makedirs(EVENT_DIR, exist_ok=True)
+    path = os.path.join(EVENT_DIR, f'app-{os.getpid()}.sock')
+    _unlink_quietly(path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sock.bind(path)
+    atexit.register(_unlink_quietly, path)
+    return sock, path
+
+
+def _unlink_quietly(path):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def _receive(sock, on_update):
+    """Wait for one burst of messages (or the safety timeout) and apply it"""
+    sock.settimeout(SAFETY_POLL_SECONDS)
+    try:
+        data = sock.recv(4096)
+    except socket.timeout:
+        on_update(None)
+        return
+    try:
+        changed = {json.loads(data.decode('utf-8')).get('retailer')}
+    except (ValueError, AttributeError):
+        return
+    # Coalesce bursts (one message per category) into a single rebuild
+    sock.settimeout(DEBOUNCE_SECONDS)
+    try:
+        while True:
+            data = sock.recv(4096)
+            try:
+                changed.add(json.loads(data.decode('utf-8')).get('retailer'))
+            except (ValueError, AttributeError):
+                pass
+    except socket.timeout:
+        pass
+    for retailer in changed:
+        on_update(retailer)
+
+
+def _listen(sock, on_update):
+    while True:
+        try:
+            _receive(sock, on_update)
+        except Exception as e:
+            # Keep listening: a dead thread would leave the catalogs frozen
+            logger.error(f"Catalog event listener error: {e}")
+            time.sleep(POLL_SECONDS)
+
+
+def _poll(on_update):
+    while True:
+        time.sleep(POLL_SECONDS)
+        on_update(None)
+
+
+def _run(on_update):
+    if ipc_supported():
+        try:
+            sock, path = _bind()
+        except OSError as e:
+            logger.warning(f"Catalog event socket unavailable ({e}), polling every {POLL_SECONDS}s")
+        else:
+            logger.info(f"Listening for catalog updates on {path}")
+            try:
+                _listen(sock, on_update)
+            finally:
+                sock.close()
+            return
+    _poll(on_update)
+
+
+def _safe(on_update):
+    def handler(retailer):
+        try:
+            on_update(retailer)
+        except Exception as e:
+            logger.error(f"Catalog refresh failed for {retailer or 'all retailers'}: {e}")
+    return handler
+
+
+def subscriber_running():
+    """True if this process has a live listener thread (False in a freshly forked worker)"""
+    return _subscriber is not None and _subscriber_pid == os.getpid() and _subscriber.is_alive()
+
+
+def start_subscriber(on_update):
+    """Start the background listener once per process; on_update(retailer or None)"""
+    global _subscriber, _subscriber_pid
+    with _start_lock:
+        if subscriber_running():
+            return _subscriber
+        _subscriber = threading.Thread(target=_run, args=(_safe(on_update),), name='catalog-events', daemon=True)
+        _subscriber_pid = os.getpid()
+        _subscriber.start()
+    return _subscriber
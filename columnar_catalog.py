@@ -0,0 +1,100 @@
+"""
+Optional columnar view of a product catalog backed by NumPy.
+
+Prices, discounts, savings and the recently reduced/added and all-time low
+flags are held as arrays so filters become boolean masks and the retailer
+stats become single vectorized reductions. Names and categories are
+fixed-width lowercase string arrays, so substring filters run in np.char.find
+instead of a Python loop. If NumPy isn't installed, build() returns None and the
+app falls back to plain list comprehensions.
+"""
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+MAX_CATEGORY_MASKS = 32  # category filters come from the query string, so keep only the most recent
+
+
+def build(products):
+    """Return a ColumnarCatalog for the products, or None when NumPy is unavailable"""
+    if np is None:
+        return None
+    return ColumnarCatalog(products)
+
+
+class ColumnarCatalog:
+    """Column arrays over a product list; row i of every array is products[i]"""
+
+    def __init__(self, products):
+        self.products = list(products)
+        n = len(self.products)
+        self.current_price = np.fromiter(
+            (p.current_price if p.current_price is not None else np.nan for p in self.products), dtype=np.float64, count=n)
+        self.original_price = np.fromiter(
+            (p.original_price if p.original_price is not None else np.nan for p in self.products), dtype=np.float64, count=n)
+        self.discount = np.fromiter((p.discount or 0.0 for p in self.products), dtype=np.float64, count=n)
+        self.savings = np.fromiter((p.savings or 0.0 for p in self.products), dtype=np.float64, count=n)
+        self.recently_reduced = np.fromiter((p.recently_reduced for p in self.products), dtype=bool, count=n)
+        self.recently_added = np.fromiter((p.recently_added for p in self.products), dtype=bool, count=n)
+        self.at_all_time_low = np.fromiter((p.at_all_time_low for p in self.products), dtype=bool, count=n)
+        # Lowercased fixed-width text columns for substring filters
+        self.name_lower = np.array([p.name.lower() for p in self.products], dtype=str)
+        self.category_lower = np.array([p.category.lower() for p in self.products], dtype=str)
+        self._category_masks = {}  # category -> mask, oldest first
+
+    def __len__(self):
+        return len(self.products)
+
+    def mask(self, search='', category='', recently_added=False):
+        """Boolean mask of rows matching the page filters"""
+        mask = np.ones(len(self.products), dtype=bool)
+        if search:
+            mask &= np.char.find(self.name_lower, search) >= 0
+        if category:
+            category_mask = self._category_masks.get(category)
+            if category_mask is None:
+                category_mask = np.char.find(self.category_lower, category) >= 0
+                if len(self._category_masks) >= MAX_CATEGORY_MASKS:
+                    self._category_masks.pop(next(iter(self._category_masks)), None)
+                self._category_masks[category] = category_mask
+            mask &= category_mask
+        if recently_added:
+            mask &= self.recently_added
+        return mask
+
+    def stats(self, mask):
+        """Retailer page stats over the selected rows"""
+        discount = self.discount[mask]
+        positive = discount[discount > 0]
+        return {
+            'total_products': int(mask.sum()),
+            'avg_discount': round(float(positive.mean()), 1) if positive.size else 0.0,
+            'max_discount': float(discount.max()) if discount.size else 0,
+            'total_savings': float(self.savings[mask].sum()),
+            'recently_reduced_count': int(self.recently_reduced[mask].sum()),
+            'recently_added_count': int(self.recently_added[mask].sum())
+        }
+
+    def select(self, mask, sort_by='discount'):
+        """Products under the mask, in the page's sort order (stable, like list.sort)"""
+        idx = np.flatnonzero(mask)
+        if sort_by == 'recently_reduced':
+            order = np.lexsort((-self.discount[idx], -self.recently_reduced[idx].astype(np.int8)))
+        elif sort_by == 'recently_added':
+            order = np.lexsort((-self.discount[idx], -self.recently_added[idx].astype(np.int8)))
+        elif sort_by == 'all_time_low':
+            order = np.lexsort((-self.discount[idx], -self.at_all_time_low[idx].astype(np.int8)))
+        elif sort_by == 'net_reduction':
+            order = np.argsort(-self.savings[idx], kind='stable')
+        elif sort_by == 'price':
+            price = self.current_price[idx]
+            price = np.where(np.isnan(price) | (price == 0), np.inf, price)
+            order = np.argsort(price, kind='stable')
+        elif sort_by == 'name':
+            names = [self.products[i].name for i in idx]
+            order = sorted(range(len(idx)), key=names.__getitem__)
+        else:  # discount
+            order = np.argsort(-self.discount[idx], kind='stable')
+        products = self.products
+        return [products[i] for i in idx[order]]
@@ -0,0 +1,144 @@
+"""
+Resumable crawl checkpoints for the scraper.
+
+Each cycle writes an append-only JSON-lines journal:
+
+    {"type": "cycle", "cycle": 12, "started_at": 1700000000.0}
+    {"type": "frontier", "category": "...", "urls": [...]}
+    {"type": "product", "category": "...", "url": "...", "record": {...} | null}
+    {"type": "category_done", "category": "...", "ids": [...]}
+
+Appending one line per product keeps checkpointing O(1) per page. After a
+crash or restart, resume() replays the journal: finished categories are
+skipped, the in-progress category reuses its discovered URLs, and products
+already fetched come back from their stored records instead of being
+re-requested (URLs whose fetch failed were never journaled, so they are
+tried again). A journal that has gone untouched for longer than the cycle
+window is ignored; age runs from the last appended record (the file's mtime),
+not from the cycle's start, so a long cycle that crashes late still resumes.
+finish() removes the journal once the cycle has completed. A torn last line from a
+crash is skipped.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+from product import Product
+
+DEFAULT_MAX_AGE_HOURS = 2  # roughly one cycle interval, since the journal was last written
+
+logger = logging.getLogger(__name__)
+
+
+class CrawlCheckpoint:
+    """Journal of one crawl cycle's frontier and completed products"""
+
+    def __init__(self, path, max_age_hours=DEFAULT_MAX_AGE_HOURS):
+        self.path = path
+        self.max_age = max_age_hours * 3600
+        self._lock = threading.Lock()  # products are recorded from crawler worker threads
+        self._reset()
+
+    def _reset(self, cycle=None, started_at=None):
+        self.cycle = cycle
+        self.started_at = started_at
+        self.frontiers = {}   # category -> [urls]
+        self.products = {}    # category -> {url: record or None}
+        self.done = {}        # category -> [product ids]
+
+    def resume(self):
+        """Load an unfinished cycle's journal; True if there is one worth resuming"""
+        self._reset()
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+            last_written = os.path.getmtime(self.path)
+        except FileNotFoundError:
+            return False
+
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn write from a crash
+            kind = entry.get('type')
+            if kind == 'cycle':
+                self._reset(entry.get('cycle'), entry.get('started_at'))
+            elif kind == 'frontier':
+                self.frontiers[entry['category']] = entry['urls']
+            elif kind == 'product':
+                self.products.setdefault(entry['category'], {})[entry['url']] = entry.get('record')
+            elif kind == 'category_done':
+                self.done[entry['category']] = entry.get('ids', [])
+
+        if self.cycle is None or not self.started_at or time.time() - last_written > self.max_age:
+            logger.info("Discarding stale or empty crawl checkpoint")
+            self._reset()
+            return False
+
+        fetched = sum(len(p) for p in self.products.values())
+        logger.info(f"Resuming cycle {self.cycle}: {len(self.done)} categories done, {fetched} products already fetched")
+        return True
+
+    def start_cycle(self, cycle):
+        """Begin a fresh journal for a new cycle"""
+        self._reset(cycle, time.time())
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'type': 'cycle', 'cycle': cycle, 'started_at': self.started_at}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _append(self, entry):
+        line = json.dumps(entry) + '\n'
+        try:
+            with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+        except Exception as e:
+            logger.error(f"Failed to write crawl checkpoint: {e}")
+
+    def record_frontier(self, category, urls):
+        self.frontiers[category] = list(urls)
+        self._append({'type': 'frontier', 'category': category, 'urls': self.frontiers[category]})
+
+    def record_product(self, category, url, product):
+        """
+        Record a fetched URL; product is None when it was deliberately filtered
+        out. Don't record failed fetches: a resumed cycle should retry them.
+        """
+        record = product.to_dict() if product is not None else None
+        self.products.setdefault(category, {})[url] = record
+        self._append({'type': 'product', 'category': category, 'url': url, 'record': record})
+
+    def complete_category(self, category, product_ids):
+        self.done[category] = sorted(product_ids)
+        self._append({'type': 'category_done', 'category': category, 'ids': self.done[category]})
+
+    def is_category_done(self, category):
+        return category in self.done
+
+    def category_ids(self, category):
+        return set(self.done.get(category, ()))
+
+    def frontier(self, category):
+        """URLs discovered for a category earlier in this cycle, or None"""
+        return self.frontiers.get(category)
+
+    def completed(self, category, url):
+        """(True, Product or None) if the URL was already fetched this cycle, else (False, None)"""
+        records = self.products.get(category, {})
+        if url not in records:
+            return False, None
+        record = records[url]
+        return True, Product(**record) if record is not None else None
+
+    def finish(self):
+        """The cycle completed: drop the journal"""
+        self._reset()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,157 @@
+"""
+Extraction rules for John Lewis product and listing pages.
+
+Every regex and CSS selector the scraper uses is compiled once here at import
+time instead of on every call. Fields with several ways of being found are
+ordered rule chains, cheapest first; find()/find_all() stop at the first rule
+that matches and count attempts and hits per rule. The full-tree
+"was £..." text scan is the last rule for the original price, so it only runs
+when the selectors miss, and hit_rates() shows how often that happens.
+
+    elem = extraction_rules.find('current_price', soup)
+    extraction_rules.hit_rates()   # {'current_price': {'css:.prod-price__current': {...}}}
+"""
+import logging
+import re
+import threading
+from collections import defaultdict
+
+try:
+    import soupsieve
+except ImportError:  # ships with bs4 >= 4.7; fall back to string selectors
+    soupsieve = None
+
+logger = logging.getLogger(__name__)
+
+
+# Patterns
+PRICE_RANGE_SPLIT = re.compile(r'\s*-\s*')
+NON_PRICE_CHARS = re.compile(r'[^\d.]')
+PRODUCT_ID = re.compile(r'p(\d+)$')
+SIZE_PREFIX = re.compile(r'^(uk|eu)(\d+)$', re.I)
+POUND_AMOUNT = re.compile(r'£([\d,]+\.?\d*)')
+WAS_PRICE = re.compile(r'was\s*£?\d', re.I)
+COLOUR_OPTION = re.compile(r'colour:option', re.I)
+COLOUR_OPTION_CLASS = re.compile(r'.*colour.*option.*', re.I)
+COLOUR_CLASS = re.compile(r'colour', re.I)
+PRICE_CLASS = re.compile(r'price', re.I)
+SIZE_CLASS = re.compile(r'size', re.I)
+
+
+class Selector:
+    """CSS selector compiled once (soupsieve) with the bs4 string API as fallback"""
+
+    def __init__(self, css):
+        self.css = css
+        self._compiled = soupsieve.compile(css) if soupsieve is not None else None
+
+    def select_one(self, element):
+        if self._compiled is not None:
+            return self._compiled.select_one(element)
+        return element.select_one(self.css)
+
+    def select(self, element):
+        if self._compiled is not None:
+            return self._compiled.select(element)
+        return element.select(self.css)
+
+
+# Selectors
+JSON_LD = {'name': 'script', 'attrs': {'type': 'application/ld+json'}}
+PRODUCT_NAME = Selector('h1.product-header__name')
+CURRENT_PRICE = Selector('.prod-price__current')
+CURRENT_PRICE_TESTID = Selector("span[data-testid='price-current']")
+WAS_PRICE_CSS = Selector('.prod-price__was')
+PREVIOUS_PRICE_TESTID = Selector("span[data-testid='price-prev']")
+STOCK_MESSAGE = Selector('.stock-availability-message')
+PRODUCT_IMAGE = Selector('img.product-image')
+PRODUCT_CARD_LINK = Selector('a.product-card_c-product-card__link___7IQk')
+
+
+def _was_price_scan(soup):
+    """Full-tree walk for a span/div/s reading "was £..."; the slow last resort"""
+    return soup.find(lambda tag: tag.name in ('span', 'div', 's') and
+                     WAS_PRICE.search(tag.get_text(strip=True)))
+
+
+# Rule chains: (rule name, finder), cheapest first
+RULES = {
+    'current_price': [
+        ('css:.prod-price__current', CURRENT_PRICE.select_one),
+        ('css:price-current', CURRENT_PRICE_TESTID.select_one),
+        ('span.class~price', lambda soup: soup.find('span', class_=PRICE_CLASS)),
+    ],
+    'original_price': [
+        ('css:price-prev', PREVIOUS_PRICE_TESTID.select_one),
+        ('css:.prod-price__was', WAS_PRICE_CSS.select_one),
+        ('scan:was-text', _was_price_scan),
+    ],
+    'variant_buttons': [
+        ('testid:colour:option', lambda soup: soup.find_all(['button', 'a'], attrs={'data-testid': COLOUR_OPTION})),
+        ('class~colour-option', lambda soup: soup.find_all(['button', 'span'], class_=COLOUR_OPTION_CLASS)),
+    ],
+    'variant_names': [
+        ('testid:colour:option', lambda soup: soup.find_all('a', attrs={'data-testid': COLOUR_OPTION})),
+        ('span.class~colour', lambda soup: soup.find_all('span', class_=COLOUR_CLASS)),
+    ],
+    'sizes': [
+        ('testid:size:option', lambda soup: soup.find_all('a', attrs={'data-testid': 'size:option:button'})),
+        ('span.class~size', lambda soup: soup.find_all('span', class_=SIZE_CLASS)),
+    ],
+    'listing_links': [
+        ('css:product-card-link', PRODUCT_CARD_LINK.select),
+    ],
+}
+
+_stats = defaultdict(lambda: [0, 0])  # (field, rule) -> [attempts, hits]
+_stats_lock = threading.Lock()
+
+
+def _run(field, element):
+    for rule_name, finder in RULES[field]:
+        result = finder(element)
+        hit = bool(result)
+        with _stats_lock:
+            counts = _stats[(field, rule_name)]
+            counts[0] += 1
+            counts[1] += hit
+        if hit:
+            return result
+    return None
+
+
+def find(field, element):
+    """First element matched by the field's rule chain, or None"""
+    return _run(field, element)
+
+
+def find_all(field, element):
+    """Elements from the first rule in the chain that matches any, or []"""
+    return _run(field, element) or []
+
+
+def hit_rates():
+    """{field: {rule: {'attempts', 'hits', 'hit_rate'}}} since the last reset"""
+    with _stats_lock:
+        snapshot = {key: list(counts) for key, counts in _stats.items()}
+    report = {}
+    for (field, rule_name), (attempts, hits) in sorted(snapshot.items()):
+        report.setdefault(field, {})[rule_name] = {
+            'attempts': attempts,
+            'hits': hits,
+            'hit_rate': round(hits / attempts, 3) if attempts else 0.0
+        }
+    return report
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def log_hit_rates(level=logging.INFO):
+    """One log line per field: rule hits/attempts in chain order"""
+    for field, rules in hit_rates().items():
+        order = [name for name, _ in RULES[field]]
+        parts = [f"{name} {rules[name]['hits']}/{rules[name]['attempts']}" for name in order if name in rules]
+        logger.log(level, f"Extraction rules [{field}]: " + ", ".join(parts))
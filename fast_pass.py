@@ -0,0 +1,110 @@
+"""
+Listing-only "fast pass" between full crawl cycles.
+
+Every few minutes the first (sortBy=discount) listing pages of each category
+are polled. The product IDs and listing prices are compared with an in-memory
+snapshot, and only products that are new, or whose listing price moved, are
+queued for a deep product-page fetch. A new deal therefore reaches the alert
+path within one poll interval instead of waiting for the next full cycle.
+
+    watcher = fast_pass.ListingWatcher()
+    fast_pass.run_until(deadline, scraper, categories, watcher,
+                        deep_fetch=..., on_products=..., known_ids=...)
+"""
+import logging
+import random
+import time
+
+import scraper_engine
+import tracing
+
+DEFAULT_INTERVAL = (240, 360)  # seconds between polls
+DEFAULT_PAGES = 1              # listing pages polled per category
+
+logger = logging.getLogger(__name__)
+
+
+class ListingWatcher:
+    """Last listing price seen per product, per category"""
+
+    def __init__(self):
+        self.snapshot = {}  # category -> {product id: listing price or None}
+
+    def changes(self, category_name, entries, known_ids=()):
+        """
+        Listing entries that need a deep fetch, as (entry, reason) pairs.
+
+        An ID missing from the snapshot and from known_ids (products the full
+        cycle already has) is 'new'. A listing price that differs from the last
+        one seen is 'price'. Known products seen for the first time only set
+        the baseline.
+        """
+        seen = self.snapshot.setdefault(category_name, {})
+        queued = []
+        for entry in entries:
+            product_id, price = entry['id'], entry.get('price')
+            if product_id not in seen:
+                if product_id not in known_ids:
+                    queued.append((entry, 'new'))
+            elif price is not None and seen[product_id] is not None and price != seen[product_id]:
+                queued.append((entry, 'price'))
+            if price is not None or product_id not in seen:
+                seen[product_id] = price
+        return queued
+
+    def reset(self):
+        """Forget the snapshot, e.g. after a full cycle has refreshed everything"""
+        self.snapshot.clear()
+
+
+def poll(scraper, categories, watcher, deep_fetch, on_products, known_ids=None, pages=DEFAULT_PAGES):
+    """
+    One fast pass over every category.
+
+    deep_fetch(index, total, url, category_name) -> Product or None, run on the
+    scraper's crawler pool; on_products(category_name, products) receives the
+    fetched products; known_ids(category_name) -> ids already tracked.
+    Returns the number of deep fetches made.
+    """
+    fetched = 0
+    for category_name, category in categories.items():
+        with tracing.span('fast_pass', category=category_name) as pass_span:
+            listed = scraper.crawl_listing(category_name, {**category, 'max_pages': pages})
+            known = known_ids(category_name) if known_ids else ()
+            queued = watcher.changes(category_name, listed.values(), known)
+            if not queued:
+                continue
+            reasons = {}
+            for _, reason in queued:
+                reasons[reason] = reasons.get(reason, 0) + 1
+            logger.info(f"Fast pass {category_name}: {len(listed)} listed, deep fetching {len(queued)} ({reasons})")
+            urls = [entry['url'] for entry, _ in queued]
+
+            def fetch(index, url):
+                # Pool threads don't see this thread's spans: parent the deep fetch explicitly
+                with tracing.span('deep_fetch', parent=pass_span, url=url):
+                    return deep_fetch(index, len(urls), url, category_name)
+
+            products = scraper_engine.crawl(urls, fetch, scraper.concurrency)
+            fetched += len(urls)
+            products = [p for p in products if p]
+            if products:
+                on_products(category_name, products)
+    return fetched
+
+
+def run_until(deadline, scraper, categories, watcher, deep_fetch, on_products, known_ids=None,
+              interval=DEFAULT_INTERVAL, pages=DEFAULT_PAGES):
+    """Poll until the deadline (time.time()), sleeping `interval` seconds between passes"""
+    passes = 0
+    while time.time() < deadline:
+        try:
+            poll(scraper, categories, watcher, deep_fetch, on_products, known_ids, pages)
+        except Exception as e:
+            logger.error(f"Fast pass failed: {e}")
+        passes += 1
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            break
+        tracing.sleep(min(random.uniform(*interval), remaining), 'fast pass interval')
+    return passes
@@ -2,147 +2,77 @@
 Flask routes for SaleScout v3 - Selfridges and John Lewis integration
 Copy this code to your main Flask app
 """
-import csv
-import os
+import logging
+from operator import attrgetter
 from flask import render_template, jsonify
-from datetime import datetime
-
-def read_selfridges_csv(csv_path='salescout_selfridges.csv'):
-    """Read Selfridges CSV data"""
-    products = []
-    if not os.path.exists(csv_path):
-        return products
-
-    try:
-        with open(csv_path, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                # Clean and format data
-                product = {
-                    'id': row.get('Product ID', ''),
-                    'name': row.get('Product Name', ''),
-                    'current_price': float(row.get('Current Price', 0)) if row.get('Current Price') else 0,
-                    'original_price': float(row.get('Original Price', 0)) if row.get('Original Price') else 0,
-                    'discount': float(row.get('Discount', 0)) if row.get('Discount') else 0,
-                    'stock_status': row.get('Stock Status', 'Unknown'),
-                    'sizes': row.get('Sizes', 'See product page'),
-                    'url': row.get('URL', ''),
-                    'image': row.get('Image', ''),
-                    'category': row.get('Category', 'Selfridges'),
-                    'timestamp': row.get('Timestamp', ''),
-                    'retailer': 'Selfridges'
-                }
-
-                # Calculate savings
-                if product['original_price'] and product['current_price']:
-                    product['savings'] = product['original_price'] - product['current_price']
-                else:
-                    product['savings'] = 0
-
-                products.append(product)
-    except Exception as e:
-        print(f"Error reading Selfridges CSV: {e}")
-
-    return products
-
-def read_johnlewis_csv(csv_path='salescout_johnlewis.csv'):
-    """Read John Lewis CSV data"""
-    products = []
-    if not os.path.exists(csv_path):
-        return products
-
-    try:
-        with open(csv_path, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                # Clean and format data
-                product = {
-                    'id': row.get('Product ID', ''),
-                    'name': row.get('Product Name', ''),
-                    'current_price': float(row.get('Current Price', 0)) if row.get('Current Price') else 0,
-                    'original_price': float(row.get('Original Price', 0)) if row.get('Original Price') else 0,
-                    'discount': float(row.get('Discount', 0)) if row.get('Discount') else 0,
-                    'stock_status': row.get('Stock Status', 'Unknown'),
-                    'sizes': row.get('Sizes', 'See product page'),
-                    'url': row.get('URL', ''),
-                    'image': row.get('Image', ''),
-                    'category': row.get('Category', 'John Lewis'),
-                    'timestamp': row.get('Timestamp', ''),
-                    'retailer': 'John Lewis'
-                }
-
-                # Calculate savings
-                if product['original_price'] and product['current_price']:
-                    product['savings'] = product['original_price'] - product['current_price']
-                else:
-                    product['savings'] = 0
-
-                products.append(product)
-    except Exception as e:
-        print(f"Error reading John Lewis CSV: {e}")
-
-    return products
 
-# Flask route for Selfridges page
-def selfridges_route():
-    """Route handler for /selfridges"""
-    products = read_selfridges_csv()
+import http_cache
+import image_proxy
+import retailers
+from product import products_to_json
 
-    # Sort by discount descending
-    products.sort(key=lambda x: x['discount'], reverse=True)
+logger = logging.getLogger(__name__)
 
-    stats = {
-        'total_products': len(products),
-        'avg_discount': round(sum(p['discount'] for p in products if p['discount'] > 0) / max(1, len([p for p in products if p['discount'] > 0])), 1),
-        'max_discount': max([p['discount'] for p in products], default=0),
-        'total_savings': sum(p['savings'] for p in products),
-        'last_updated': products[0]['timestamp'] if products else 'Never'
-    }
+def init_app(app):
+    """Template helpers and the image route retailer_page.html needs, as in app.py"""
+    http_cache.register_template_globals(app)
+    if 'image' not in app.view_functions:
+        app.add_url_rule('/img/<key>', 'image', image_proxy.serve)
+    app.after_request(http_cache.static_cache_headers)
 
-    return render_template('retailer_page.html',
-                         products=products,
-                         retailer='Selfridges',
-                         stats=stats)
+def read_selfridges_csv():
+    """Selfridges products from the shared catalog cache"""
+    return retailers.get_products('selfridges')
 
-# Flask route for John Lewis page
-def johnlewis_route():
-    """Route handler for /johnlewis"""
-    products = read_johnlewis_csv()
+def read_johnlewis_csv():
+    """John Lewis products from the shared catalog cache"""
+    return retailers.get_products('johnlewis')
 
-    # Sort by discount descending
-    products.sort(key=lambda x: x['discount'], reverse=True)
+def retailer_route(retailer):
+    """Render retailer_page.html for any registered retailer"""
+    products = sorted(retailers.get_products(retailer), key=attrgetter('discount'), reverse=True)
+    summary = retailers.get_retailer_stats(retailer)
 
     stats = {
-        'total_products': len(products),
-        'avg_discount': round(sum(p['discount'] for p in products if p['discount'] > 0) / max(1, len([p for p in products if p['discount'] > 0])), 1),
-        'max_discount': max([p['discount'] for p in products], default=0),
-        'total_savings': sum(p['savings'] for p in products),
-        'last_updated': products[0]['timestamp'] if products else 'Never'
+        'total_products': summary['total'],
+        'avg_discount': summary['avg_discount'],
+        'max_discount': summary['max_discount'],
+        'total_savings': summary['total_savings'],
+        'last_updated': products[0].timestamp if products else 'Never'
     }
 
     return render_template('retailer_page.html',
                          products=products,
-                         retailer='John Lewis',
+                         retailer=retailers.get_config(retailer)['name'],
                          stats=stats)
 
-# API endpoints for JSON data
-def selfridges_api():
-    """API endpoint for Selfridges data"""
-    products = read_selfridges_csv()
+def retailer_api(retailer):
+    """JSON payload for any registered retailer"""
+    products = retailers.get_products(retailer)
     return jsonify({
-        'retailer': 'Selfridges',
+        'retailer': retailers.get_config(retailer)['name'],
         'total_products': len(products),
-        'products': products
+        'products': products_to_json(products)
     })
 
+# Flask route for Selfridges page
+def selfridges_route():
+    """Route handler for /selfridges"""
+    return retailer_route('selfridges')
+
+# Flask route for John Lewis page
+def johnlewis_route():
+    """Route handler for /johnlewis"""
+    return retailer_route('johnlewis')
+
+# API endpoints for JSON data
+def selfridges_api():
+    """API endpoint for Selfridges data"""
+    return retailer_api('selfridges')
+
 def johnlewis_api():
     """API endpoint for John Lewis data"""
-    products = read_johnlewis_csv()
-    return jsonify({
-        'retailer': 'John Lewis',
-        'total_products': len(products),
-        'products': products
-    })
+    return retailer_api('johnlewis')
 
 # Combined data endpoint
 def combined_deals_api():
@@ -151,18 +81,20 @@ def combined_deals_api():
     johnlewis = read_johnlewis_csv()
 
     all_products = selfridges + johnlewis
-    all_products.sort(key=lambda x: x['discount'], reverse=True)
+    all_products.sort(key=attrgetter('discount'), reverse=True)
 
     return jsonify({
         'total_products': len(all_products),
         'selfridges_count': len(selfridges),
         'johnlewis_count': len(johnlewis),
-        'products': all_products
+        'products': products_to_json(all_products)
     })
 
 """
 ADD THESE ROUTES TO YOUR MAIN FLASK APP:
 
+init_app(app)  # template helpers and /img/<key>
+
 @app.route('/selfridges')
 def selfridges():
     return selfridges_route()
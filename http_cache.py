@@ -0,0 +1,136 @@
+"""
+HTTP caching helpers for the Flask app.
+
+- Catalog-version ETags with 304 Not Modified handling
+- gzip/brotli compression, with compressed bodies cached per catalog version
+- Fingerprinted static asset URLs served with long-lived Cache-Control
+- register_template_globals(): the Jinja helpers every page template uses
+"""
+import gzip
+import hashlib
+import os
+from datetime import datetime, timezone
+
+from flask import Response, request, url_for
+from werkzeug.http import http_date, parse_accept_header
+
+import image_proxy
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+MIN_COMPRESS_BYTES = 1024
+ETAG_SUFFIXES = {'gzip': '-gz', 'br': '-br', 'identity': ''}
+STATIC_MAX_AGE = 365 * 24 * 3600
+
+_asset_hashes = {}
+
+
+def make_etag(*parts, encoding='identity'):
+    """Strong ETag derived from the route, normalized args and catalog version, one per content coding"""
+    digest = hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:20]
+    return digest + ETAG_SUFFIXES[encoding]
+
+
+def choose_encoding(accept_encoding):
+    """Pick the best content coding the client accepts (highest q-value, brotli first on ties; q=0 refuses)"""
+    accepted = parse_accept_header((accept_encoding or '').lower())
+    candidates = (['br'] if brotli is not None else []) + ['gzip']
+    best, best_q = 'identity', 0
+    for encoding in candidates:
+        quality = accepted.quality(encoding)
+        if quality > best_q:
+            best, best_q = encoding, quality
+    return best
+
+
+def compress(body, encoding):
+    """Compress a str/bytes body with the given content coding"""
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=6)
+    return body
+
+
+def cached_response(cache, scope, args_key, version, build_body, mimetype,
+                    last_modified=None, max_age=60):
+    """
+    Serve a cacheable page or API payload.
+
+    cache: RenderCache holding encoded bodies, keyed by (scope, args_key, encoding)
+    version: catalog version; a new version invalidates the scope's entries
+    build_body: called only on a cache miss, returns str or bytes
+    last_modified: POSIX timestamp of the newest catalog file (optional)
+    """
+    accepted = choose_encoding(request.headers.get('Accept-Encoding'))
+    cache_key = (scope, args_key, accepted)
+    cached = cache.get(cache_key, version)
+
+    def response_headers(encoding):
+        # The ETag names the encoding actually sent: small bodies go out as identity
+        headers = {
+            'ETag': f'"{make_etag(scope, args_key, version, encoding=encoding)}"',
+            'Cache-Control': f'public, max-age={max_age}, must-revalidate',
+            'Vary': 'Accept-Encoding'
+        }
+        if last_modified:
+            headers['Last-Modified'] = http_date(datetime.fromtimestamp(last_modified, tz=timezone.utc))
+        return headers
+
+    # On a miss the encoding depends on the body size, so either tag revalidates
+    # without building the body
+    for encoding in ([cached[0]] if cached is not None else dict.fromkeys([accepted, 'identity'])):
+        if request.if_none_match.contains(make_etag(scope, args_key, version, encoding=encoding)):
+            return Response(status=304, headers=response_headers(encoding))
+
+    if cached is None:
+        body = build_body()
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        encoding = accepted if len(body) >= MIN_COMPRESS_BYTES else 'identity'
+        body = compress(body, encoding)
+        cache.put(cache_key, version, (encoding, body), size=len(body))
+    else:
+        encoding, body = cached
+
+    response = Response(body, mimetype=mimetype, headers=response_headers(encoding))
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def asset_url(filename):
+    """url_for('static') with a content hash so the file can be cached for a year"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', filename)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return url_for('static', filename=filename)
+
+    cached = _asset_hashes.get(filename)
+    if cached is None or cached[0] != mtime:
+        with open(path, 'rb') as f:
+            cached = (mtime, hashlib.md5(f.read()).hexdigest()[:10])
+        _asset_hashes[filename] = cached
+    return url_for('static', filename=filename, v=cached[1])
+
+
+def static_cache_headers(response):
+    """after_request hook: long-lived caching for fingerprinted static files"""
+    if request.path.startswith('/static/') and request.args.get('v') and response.status_code == 200:
+        response.headers['Cache-Control'] = f'public, max-age={STATIC_MAX_AGE}, immutable'
+    return response
+
+
+def register_template_globals(app):
+    """asset_url / image_url / image_srcset for an app's templates (image_url needs an 'image' endpoint)"""
+    app.jinja_env.globals.update(
+        asset_url=asset_url,
+        image_url=image_proxy.image_url,
+        image_srcset=image_proxy.image_srcset,
+    )
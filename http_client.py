@@ -0,0 +1,249 @@
+"""
+HTTP client layer for the scrapers.
+
+- Connection pool sized to the crawl concurrency (requests/urllib3 by default)
+- Optional HTTP/2 multiplexing through httpx when it is installed with h2
+- Opt-in process-wide DNS cache with a TTL (dns_cache_ttl > 0)
+- Separate connect and read timeouts
+- Connection reuse metrics (requests made vs new connections opened)
+
+Configure with a dict, e.g.
+    client = http_client.HttpClient({'concurrency': 4, 'http2': True})
+    response = client.get(url, headers=...)
+    client.metrics()
+
+Check against a local stand-in server:
+    python http_client.py check [requests] [--http2]
+"""
+import logging
+import socket
+import sys
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+    import h2  # noqa: F401  httpx needs it for http2=True
+except ImportError:  # HTTP/2 is optional
+    httpx = None
+
+DEFAULT_CONFIG = {
+    'concurrency': 4,          # parallel requests the crawler makes
+    'pool_connections': 4,     # distinct hosts kept in the pool
+    'connect_timeout': 5,
+    'read_timeout': 15,
+    'http2': False,
+    'dns_cache_ttl': 0,        # seconds; > 0 opts the whole process into the DNS cache
+    'max_retries': 0           # transport-level retries (urllib3 Retry or int)
+}
+
+logger = logging.getLogger(__name__)
+
+
+# DNS cache: wraps socket.getaddrinfo once per process, for the process's first
+# opted-in client; later clients can neither change its TTL nor remove it
+_dns_cache = {}
+_dns_lock = threading.Lock()
+_dns_ttl = 0
+_dns_hits = 0
+_dns_misses = 0
+_real_getaddrinfo = socket.getaddrinfo
+
+
+def _cached_getaddrinfo(host, port, *args, **kwargs):
+    global _dns_hits, _dns_misses
+    key = (host, port, args, tuple(sorted(kwargs.items())))
+    now = time.monotonic()
+    with _dns_lock:
+        entry = _dns_cache.get(key)
+        if entry and entry[0] > now:
+            _dns_hits += 1
+            return entry[1]
+        _dns_misses += 1
+    result = _real_getaddrinfo(host, port, *args, **kwargs)
+    with _dns_lock:
+        _dns_cache[key] = (now + _dns_ttl, result)
+    return result
+
+
+def install_dns_cache(ttl):
+    """Cache getaddrinfo results for ttl seconds (affects every socket in the process); once only"""
+    global _dns_ttl
+    with _dns_lock:
+        if _dns_ttl:
+            if ttl != _dns_ttl:
+                logger.warning(f"DNS cache already installed with a {_dns_ttl}s TTL; ignoring {ttl}s")
+            return False
+        _dns_ttl = ttl
+        socket.getaddrinfo = _cached_getaddrinfo
+    return True
+
+
+def uninstall_dns_cache():
+    """Restore the real getaddrinfo and drop cached entries"""
+    global _dns_ttl
+    with _dns_lock:
+        _dns_ttl = 0
+        socket.getaddrinfo = _real_getaddrinfo
+        _dns_cache.clear()
+
+
+class HttpClient:
+    """Shared client for the crawl; safe to use from several threads"""
+
+    def __init__(self, config=None):
+        self.config = {**DEFAULT_CONFIG, **(config or {})}
+        self.timeout = (self.config['connect_timeout'], self.config['read_timeout'])
+        self.requests_made = 0
+        self._connections = set()  # httpx network streams seen (HTTP/2 only)
+        self._lock = threading.Lock()
+        if self.config['dns_cache_ttl'] > 0:
+            install_dns_cache(self.config['dns_cache_ttl'])
+
+        self.http2 = bool(self.config['http2'] and httpx is not None)
+        if self.config['http2'] and httpx is None:
+            logger.warning("HTTP/2 requested but httpx[http2] is not installed; using requests")
+
+        if self.http2:
+            self._client = httpx.Client(
+                http2=True,
+                follow_redirects=True,
+                timeout=httpx.Timeout(self.config['read_timeout'], connect=self.config['connect_timeout']),
+                limits=httpx.Limits(max_connections=self.config['concurrency'],
+                                    max_keepalive_connections=self.config['concurrency']))
+        else:
+            self._session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.config['pool_connections'],
+                                  pool_maxsize=self.config['concurrency'],
+                                  pool_block=True,
+                                  max_retries=self.config['max_retries'])
+            self._session.mount('https://', adapter)
+            self._session.mount('http://', adapter)
+            self._adapters = (adapter,)
+
+    def get(self, url, headers=None, timeout=None):
+        """GET a URL; raises requests exceptions for both backends"""
+        timeout = timeout or self.timeout
+        with self._lock:
+            self.requests_made += 1
+        if not self.http2:
+            return self._session.get(url, headers=headers, timeout=timeout)
+
+        try:
+            response = self._client.get(url, headers=headers,
+                                        timeout=httpx.Timeout(timeout[1], connect=timeout[0]))
+        except httpx.ConnectError as e:
+            if 'ssl' in str(e).lower() or 'certificate' in str(e).lower():
+                raise requests.exceptions.SSLError(str(e)) from e
+            raise requests.exceptions.ConnectionError(str(e)) from e
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(str(e)) from e
+        except httpx.HTTPError as e:
+            raise requests.exceptions.RequestException(str(e)) from e
+        stream = response.extensions.get('network_stream')
+        if stream is not None:
+            with self._lock:
+                self._connections.add(id(stream))
+        return _Http2Response(response)
+
+    def metrics(self):
+        """Requests made, connections opened and the share of requests that reused a connection"""
+        if self.http2:
+            connections = len(self._connections)
+        else:
+            connections = 0
+            for adapter in self._adapters:
+                pools = adapter.poolmanager.pools
+                for key in pools.keys():
+                    pool = pools.get(key)
+                    if pool is not None:
+                        connections += pool.num_connections
+        requests_made = self.requests_made
+        return {
+            'backend': 'httpx-h2' if self.http2 else 'requests',
+            'requests': requests_made,
+            'connections_opened': connections,
+            'reuse_ratio': round(1 - connections / requests_made, 3) if requests_made else 0.0,
+            'dns_cache_hits': _dns_hits,
+            'dns_cache_misses': _dns_misses
+        }
+
+    def close(self):
+        if self.http2:
+            self._client.close()
+        else:
+            self._session.close()
+
+
+class _Http2Response:
+    """Adapts an httpx response to the parts of requests.Response the scrapers use"""
+
+    def __init__(self, response):
+        self._response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.url = str(response.url)
+        self.http_version = response.http_version
+
+    @property
+    def text(self):
+        return self._response.text
+
+    @property
+    def content(self):
+        return self._response.content
+
+    def json(self):
+        return self._response.json()
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+
+def _check(argv):
+    """Fetch a local stand-in server repeatedly and print reuse metrics"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            body = b'<html><body>ok</body></html>'
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    count = int(argv[0]) if argv and argv[0].isdigit() else 50
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_address[1]}/'
+
+    client = HttpClient({'http2': '--http2' in argv})
+    start = time.perf_counter()
+    for _ in range(count):
+        client.get(url).raise_for_status()
+    elapsed = time.perf_counter() - start
+    metrics = client.metrics()
+    client.close()
+    server.shutdown()
+    print(f"{count} requests in {elapsed:.3f}s ({elapsed / count * 1000:.2f} ms/request)")
+    for key, value in metrics.items():
+        print(f"  {key}: {value}")
+    return 0 if metrics['connections_opened'] <= client.config['concurrency'] else 1
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'check':
+        sys.exit(_check(sys.argv[2:]))
+    print("usage: python http_client.py check [requests] [--http2]")
+    sys.exit(2)
@@ -0,0 +1,304 @@
+"""
+Retailer image proxy with a local thumbnail cache.
+
+Templates call image_url(url) / image_srcset(url) instead of hot-linking the
+full-size retailer image. That registers the URL under a short hash and
+returns /img/<hash>?w=<width> (endpoint name 'image'). The first request for
+an image downloads the original, writes a WebP thumbnail for every width in
+WIDTHS into CACHE_DIR and discards the original; thumbnails are served with a
+one-year immutable Cache-Control. Without Pillow there is nothing to resize,
+so the templates get the retailer's own URL back and no srcset.
+
+The cache is bounded: every SWEEP_EVERY downloads, thumbnails unused for
+MAX_CACHE_AGE are deleted, then the least recently served ones until the cache
+is under MAX_CACHE_BYTES. An evicted image is downloaded again on demand.
+
+Only URLs the app itself has rendered can be fetched, so this isn't an open
+proxy. The hash -> URL mapping is kept on disk next to the cache so every
+worker process can resolve it.
+
+Check against a local image server:
+    python image_proxy.py check
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+from flask import Response, redirect, request, send_file, url_for
+
+import atomic_io
+
+try:
+    from PIL import Image
+except ImportError:  # without Pillow images are hot-linked from the retailer
+    Image = None
+
+CACHE_DIR = os.environ.get('SALESCOUT_IMAGE_CACHE', os.path.join(tempfile.gettempdir(), 'salescout-images'))
+WIDTHS = (240, 360, 480, 720)       # srcset candidates; cards are 240-360 CSS px wide
+DEFAULT_WIDTH = 360
+WEBP_QUALITY = 75
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+FETCH_TIMEOUT = (5, 15)
+MAX_AGE = 365 * 24 * 3600
+MAX_CACHE_BYTES = int(os.environ.get('SALESCOUT_IMAGE_CACHE_BYTES', 512 * 1024 * 1024))
+MAX_CACHE_AGE = 30 * 24 * 3600      # thumbnails not served for this long are evicted
+SWEEP_EVERY = 100                   # downloads between cache sweeps
+LOCK_STRIPES = 64
+
+logger = logging.getLogger(__name__)
+
+_sources = {}                       # hash -> original URL
+_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]  # striped by hash, so each image is downloaded once
+_sweep_lock = threading.Lock()
+_downloads = 0
+_session = requests.Session()
+
+
+def _hash(url):
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()[:20]
+
+
+def _path(key, suffix):
+    return os.path.join(CACHE_DIR, key[:2], f'{key}{suffix}')
+
+
+def register(url):
+    """Hash for an image URL, recorded so /img/<hash> can resolve it"""
+    key = _hash(url)
+    if key not in _sources:
+        source_path = _path(key, '.src')
+        if not os.path.exists(source_path):
+            os.makedirs(os.path.dirname(source_path), exist_ok=True)
+            _write_source(source_path, url)
+        _sources[key] = url
+    return key
+
+
+def _write_source(path, url):
+    with atomic_io.atomic_write(path, 'w', bump=False, encoding='utf-8') as f:
+        json.dump({'url': url}, f)
+
+
+def _source(key):
+    url = _sources.get(key)
+    if url is None:
+        try:
+            with open(_path(key, '.src'), 'r', encoding='utf-8') as f:
+                url = json.load(f)['url']
+        except (OSError, ValueError, KeyError):
+            return None
+        _sources[key] = url
+    return url
+
+
+def image_url(url, width=DEFAULT_WIDTH):
+    """Proxied thumbnail URL (Jinja global); empty input stays empty"""
+    if not url or Image is None:
+        return url or ''
+    return url_for('image', key=register(url), w=width)
+
+
+def image_srcset(url):
+    """srcset with every thumbnail width (Jinja global)"""
+    if not url or Image is None:
+        return ''
+    key = register(url)
+    return ', '.join(f"{url_for('image', key=key, w=width)} {width}w" for width in WIDTHS)
+
+
+def _lock_for(key):
+    return _locks[hash(key) % LOCK_STRIPES]
+
+
+def _download(url):
+    """Fetch an original image; returns its bytes"""
+    response = _session.get(url, timeout=FETCH_TIMEOUT, stream=True,
+                            headers={'User-Agent': 'SaleScout image cache'})
+    response.raise_for_status()
+    content_type = response.headers.get('Content-Type', 'application/octet-stream').split(';')[0]
+    if not content_type.startswith('image/'):
+        raise ValueError(f"{url} is not an image ({content_type})")
+    chunks, size = [], 0
+    for chunk in response.iter_content(64 * 1024):
+        chunks.append(chunk)
+        size += len(chunk)
+        if size > MAX_IMAGE_BYTES:
+            raise ValueError(f"{url} is larger than {MAX_IMAGE_BYTES} bytes")
+    logger.debug(f"Downloaded image {url} ({size} bytes)")
+    return b''.join(chunks)
+
+
+def _thumbnails(key, body):
+    """Write the WebP thumbnail for every width that isn't cached yet"""
+    with Image.open(io.BytesIO(body)) as original:
+        if original.mode not in ('RGB', 'RGBA'):
+            original = original.convert('RGBA' if 'transparency' in original.info else 'RGB')
+        for width in WIDTHS:
+            path = _path(key, f'_{width}.webp')
+            if os.path.exists(path):
+                continue
+            image = original.copy()
+            image.thumbnail((width, width * 4))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with atomic_io.atomic_write(path, 'wb', bump=False) as f:
+                image.save(f, 'WEBP', quality=WEBP_QUALITY, method=4)
+    # Originals kept by earlier versions of the cache
+    for suffix in ('.orig', '.meta'):
+        try:
+            os.remove(_path(key, suffix))
+        except FileNotFoundError:
+            pass
+
+
+def sweep(now=None):
+    """
+    Delete thumbnails not served for MAX_CACHE_AGE, then the least recently
+    served ones (by mtime) until the cache fits MAX_CACHE_BYTES. The small
+    .src records are kept. Returns the number of files removed.
+    """
+    now = now if now is not None else time.time()
+    files = []
+    for root, _, names in os.walk(CACHE_DIR):
+        for name in names:
+            if name.endswith('.src'):
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+    files.sort()
+    total = sum(size for _, size, _ in files)
+    removed = 0
+    for mtime, size, path in files:
+        if total <= MAX_CACHE_BYTES and now - mtime <= MAX_CACHE_AGE:
+            break
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+        total -= size
+    if removed:
+        logger.info(f"Image cache sweep removed {removed} files ({total} bytes left)")
+    return removed
+
+
+def _maybe_sweep():
+    """Run sweep() every SWEEP_EVERY downloads, on one thread at a time"""
+    global _downloads
+    _downloads += 1
+    if _downloads % SWEEP_EVERY or not _sweep_lock.acquire(blocking=False):
+        return
+    try:
+        sweep()
+    except OSError as e:
+        logger.warning(f"Image cache sweep failed: {e}")
+    finally:
+        _sweep_lock.release()
+
+
+def serve(key):
+    """Response for /img/<key>?w=<width>"""
+    url = _source(key)
+    if url is None:
+        return Response('Unknown image', status=404, mimetype='text/plain')
+    if Image is None:
+        # Can't resize here: send the browser to the original instead of caching it for a year
+        return redirect(url)
+    try:
+        width = int(request.args.get('w', DEFAULT_WIDTH))
+    except ValueError:
+        width = DEFAULT_WIDTH
+    # Snap to a known width so the cache can't be filled with arbitrary sizes
+    width = min(WIDTHS, key=lambda w: abs(w - width))
+
+    path = _path(key, f'_{width}.webp')
+    downloaded = False
+    try:
+        with _lock_for(key):
+            if not os.path.exists(path):
+                _thumbnails(key, _download(url))
+                downloaded = True
+            os.utime(path)  # mtime is the sweep's last-served time
+    except Exception as e:
+        logger.warning(f"Image proxy failed for {url}: {e}")
+        return Response('Image unavailable', status=502, mimetype='text/plain',
+                        headers={'Cache-Control': 'no-store'})
+    if downloaded:
+        _maybe_sweep()
+
+    # The default ETag includes the mtime, which serving touches; the thumbnail itself never changes
+    response = send_file(path, mimetype='image/webp', max_age=MAX_AGE, etag=f'{key}-{width}', conditional=True)
+    response.headers['Cache-Control'] = f'public, max-age={MAX_AGE}, immutable'
+    return response
+
+
+def _check(argv):
+    """Serve a generated image locally and fetch it through the proxy twice"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from flask import Flask
+
+    if Image is None:
+        print("Pillow is not installed: images are served from the retailer directly")
+        return 1
+    global CACHE_DIR
+    CACHE_DIR = tempfile.mkdtemp(prefix='salescout-images-')
+    buffer = io.BytesIO()
+    Image.new('RGB', (476, 634), (200, 30, 60)).save(buffer, 'JPEG')
+    body = buffer.getvalue()
+    fetches = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            fetches.append(self.path)
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/jpeg')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    source = f'http://127.0.0.1:{server.server_address[1]}/product.jpg?wid=476&hei=634'
+
+    app = Flask(__name__)
+    app.add_url_rule('/img/<key>', 'image', serve)
+    client = app.test_client()
+    try:
+        with app.test_request_context():
+            path = image_url(source, 240)
+            srcset = image_srcset(source)
+        first = client.get(path)
+        second = client.get(path)
+        revalidated = client.get(path, headers={'If-None-Match': first.headers.get('ETag', '')})
+        unknown = client.get('/img/' + '0' * 20)
+    finally:
+        server.shutdown()
+
+    print(f"{path}: {first.status_code} {first.mimetype} {len(body)} -> {len(first.data)} bytes")
+    print(f"  Cache-Control: {first.headers.get('Cache-Control')}")
+    print(f"  second request: {second.status_code}, origin fetches: {len(fetches)}")
+    print(f"  If-None-Match: {revalidated.status_code}, unknown hash: {unknown.status_code}")
+    print(f"  srcset: {srcset}")
+    ok = (first.status_code == 200 and second.status_code == 200 and len(fetches) == 1
+          and revalidated.status_code == 304 and unknown.status_code == 404)
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'check':
+        sys.exit(_check(sys.argv[2:]))
+    print("usage: python image_proxy.py check")
+    sys.exit(2)
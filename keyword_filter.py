@@ -0,0 +1,46 @@
+"""
+Precompiled keyword exclusion matcher.
+
+All keywords are folded into one case-insensitive alternation regex with
+word boundaries, so a product name is scanned once instead of once per
+keyword. "top" matches "Top" and "Tops" but not "Laptop" or "Topshop"; a
+keyword also matches its plural ("dress" -> "dresses", "brief" -> "briefs").
+
+    matcher = keyword_filter.matcher_for(["kids", "dress"])
+    matcher.search("Linen Dresses")   # -> "dresses"
+"""
+import re
+from functools import lru_cache
+
+
+class KeywordMatcher:
+    """One compiled regex for a set of keywords"""
+
+    def __init__(self, keywords):
+        # Longest first so "bodysuit" wins over "body" in the alternation
+        self.keywords = tuple(sorted({k.strip().lower() for k in keywords if k and k.strip()}, key=len, reverse=True))
+        if self.keywords:
+            alternation = '|'.join(re.escape(k) for k in self.keywords)
+            self.pattern = re.compile(rf"\b(?:{alternation})(?:e?s)?\b", re.IGNORECASE)
+        else:
+            self.pattern = None
+
+    def search(self, text):
+        """The matched keyword as it appears in text, or '' when nothing matches"""
+        if not self.pattern or not text:
+            return ''
+        match = self.pattern.search(text)
+        return match.group(0) if match else ''
+
+    def __bool__(self):
+        return self.pattern is not None
+
+
+@lru_cache(maxsize=32)
+def _matcher(keywords):
+    return KeywordMatcher(keywords)
+
+
+def matcher_for(keywords):
+    """Shared matcher for a keyword list (compiled once per distinct list)"""
+    return _matcher(tuple(keywords))
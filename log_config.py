@@ -0,0 +1,109 @@
+"""
+Logging configuration shared by the Flask app and the scraper.
+
+All records go through a QueueHandler; a QueueListener thread does the actual
+file/console I/O, so logging never blocks request threads or the crawl loop.
+
+Environment overrides:
+    SALESCOUT_LOG_LEVEL          DEBUG / INFO / WARNING ... (default INFO, so debug output is off)
+    SALESCOUT_DEBUG_SAMPLE_RATE  fraction of DEBUG records to keep, 0.0 - 1.0 (default 1.0)
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+DEFAULT_LEVEL = 'INFO'
+
+_listener = None
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of low-level records (everything above max_level always passes)"""
+
+    def __init__(self, rate=1.0, max_level=logging.DEBUG):
+        super().__init__()
+        self.rate = rate
+        self.max_level = max_level
+
+    def filter(self, record):
+        if record.levelno > self.max_level or self.rate >= 1.0:
+            return True
+        return random.random() < self.rate
+
+
+def _env_level(default):
+    name = os.environ.get('SALESCOUT_LOG_LEVEL', default)
+    level = logging.getLevelName(str(name).upper())
+    return level if isinstance(level, int) else logging.INFO
+
+
+def _env_sample_rate(default):
+    try:
+        return float(os.environ.get('SALESCOUT_DEBUG_SAMPLE_RATE', default))
+    except ValueError:
+        return default
+
+
+def setup_logging(log_file=None, console=False, level=None, debug_sample_rate=1.0):
+    """
+    Configure the root logger with a non-blocking queue handler.
+
+    log_file: path of the log file (optional)
+    console: also write records to stdout
+    level: overrides SALESCOUT_LOG_LEVEL when given
+    debug_sample_rate: fraction of DEBUG records kept, overridden by SALESCOUT_DEBUG_SAMPLE_RATE
+    """
+    global _listener
+
+    if level is None:
+        level = _env_level(DEFAULT_LEVEL)
+    elif isinstance(level, str):
+        level = logging.getLevelName(level.upper())
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = []
+    if log_file:
+        directory = os.path.dirname(log_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        file_handler = logging.FileHandler(log_file, encoding='utf-8')
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+    if console or not handlers:
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(formatter)
+        handlers.append(stream_handler)
+
+    # Restarting (e.g. Flask reloader) must not leave a second listener thread behind
+    if _listener is not None:
+        _listener.stop()
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(_env_sample_rate(debug_sample_rate)))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return root
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,241 @@
+"""
+Batch price-history analytics.
+
+Runs after each scraper cycle (not on the request path) over the whole price
+history and writes one record per product next to the history file
+(price_history.json -> price_history_analytics.json):
+
+    lowest_price / highest_price   all-time extremes, plus lowest_at
+    rolling_min / rolling_max      extremes over the last ROLLING_DAYS
+    current_price, at_all_time_low  (only after a higher price was seen)
+    avg_discount_depth             mean % below the highest price seen
+    drop_count, drop_frequency     price drops, and drops per observation
+    days_to_first_drop, mean_days_between_drops, last_drop_at
+
+Deep history is read from the tiered SQLite store (price_store) when present.
+With NumPy installed, every product's series is flattened into one array and
+the stats are segment reductions (reduceat/bincount); otherwise each series
+is processed in plain Python with the same results.
+
+CLI: python price_analytics.py <price_history.json>
+"""
+import json
+import logging
+import os
+import sys
+from datetime import datetime
+
+import atomic_io
+import price_store
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+ROLLING_DAYS = 30
+DAY_SECONDS = 86400.0
+
+logger = logging.getLogger(__name__)
+
+
+def analytics_path(history_path):
+    """Path of the analytics file that belongs to a price history file"""
+    return os.path.splitext(history_path)[0] + '_analytics.json'
+
+
+def _parse_time(value):
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def load_series(price_history):
+    """{product_id: [(epoch_seconds, price), ...]} in time order, skipping unpriced points"""
+    series = {}
+    for product_id, entry in price_history.items():
+        points = []
+        for point in entry.get('prices', []):
+            price = point.get('price')
+            ts = _parse_time(point.get('timestamp'))
+            if price is None or ts is None:
+                continue
+            points.append((ts, float(price)))
+        if points:
+            points.sort()
+            series[product_id] = points
+    return series
+
+
+def _at_all_time_low(current, lowest, highest):
+    """A single observation (or a price that never moved) isn't a low"""
+    return bool(current <= lowest and highest > current)
+
+
+def _iso(ts):
+    return datetime.fromtimestamp(ts).isoformat(timespec='seconds') if ts is not None else None
+
+
+def _record(lowest, lowest_at, highest, rolling_min, rolling_max, current, depth,
+            drop_count, points, first_seen, first_drop, last_drop):
+    drop_count, points = int(drop_count), int(points)
+    first_seen, first_drop, last_drop = float(first_seen), float(first_drop or 0), float(last_drop or 0)
+    return {
+        'lowest_price': round(float(lowest), 2),
+        'lowest_at': _iso(float(lowest_at)),
+        'highest_price': round(float(highest), 2),
+        'rolling_min': round(float(rolling_min), 2),
+        'rolling_max': round(float(rolling_max), 2),
+        'current_price': round(float(current), 2),
+        'at_all_time_low': _at_all_time_low(current, lowest, highest),
+        'avg_discount_depth': round(float(depth), 1),
+        'drop_count': drop_count,
+        'drop_frequency': round(drop_count / (points - 1), 3) if points > 1 else 0.0,
+        'days_to_first_drop': round((first_drop - first_seen) / DAY_SECONDS, 2) if drop_count else None,
+        'mean_days_between_drops': round((last_drop - first_drop) / DAY_SECONDS / (drop_count - 1), 2) if drop_count > 1 else None,
+        'last_drop_at': _iso(last_drop) if drop_count else None,
+        'points': points
+    }
+
+
+def _compute_python(series, rolling_days):
+    results = {}
+    for product_id, points in series.items():
+        times = [t for t, _ in points]
+        prices = [p for _, p in points]
+        lowest = min(prices)
+        highest = max(prices)
+        cutoff = times[-1] - rolling_days * DAY_SECONDS
+        recent = [p for t, p in points if t >= cutoff]
+        depth = sum((highest - p) / highest * 100 for p in prices) / len(prices) if highest > 0 else 0.0
+        drop_times = [times[i] for i in range(1, len(prices)) if prices[i] < prices[i - 1]]
+        results[product_id] = _record(
+            lowest, times[prices.index(lowest)], highest, min(recent), max(recent), prices[-1], depth,
+            len(drop_times), len(prices), times[0],
+            drop_times[0] if drop_times else None, drop_times[-1] if drop_times else None)
+    return results
+
+
+def _compute_numpy(series, rolling_days):
+    ids = list(series)
+    counts = np.fromiter((len(series[i]) for i in ids), dtype=np.int64, count=len(ids))
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    ends = starts + counts - 1
+    flat = np.array([pt for i in ids for pt in series[i]], dtype=np.float64)
+    times, prices = flat[:, 0], flat[:, 1]
+    segment = np.repeat(np.arange(len(ids)), counts)
+
+    lowest = np.minimum.reduceat(prices, starts)
+    highest = np.maximum.reduceat(prices, starts)
+
+    # First time each product hit its lowest price
+    low_idx = np.flatnonzero(prices == lowest[segment])
+    _, first = np.unique(segment[low_idx], return_index=True)
+    lowest_at = times[low_idx[first]]
+
+    # Rolling window relative to each product's latest observation
+    in_window = times >= (times[ends] - rolling_days * DAY_SECONDS)[segment]
+    rolling_min = np.minimum.reduceat(np.where(in_window, prices, np.inf), starts)
+    rolling_max = np.maximum.reduceat(np.where(in_window, prices, -np.inf), starts)
+
+    safe_highest = np.where(highest > 0, highest, 1.0)
+    depth_points = np.where(highest[segment] > 0, (highest[segment] - prices) / safe_highest[segment] * 100, 0.0)
+    depth = np.add.reduceat(depth_points, starts) / counts
+
+    # A drop is a lower price than the previous point of the same product
+    is_drop = (prices[1:] < prices[:-1]) & (segment[1:] == segment[:-1])
+    drop_segment = segment[1:][is_drop]
+    drop_times = times[1:][is_drop]
+    drop_count = np.bincount(drop_segment, minlength=len(ids))
+    first_drop = np.full(len(ids), np.inf)
+    last_drop = np.full(len(ids), -np.inf)
+    np.minimum.at(first_drop, drop_segment, drop_times)
+    np.maximum.at(last_drop, drop_segment, drop_times)
+
+    results = {}
+    for n, product_id in enumerate(ids):
+        results[product_id] = _record(
+            lowest[n], lowest_at[n], highest[n], rolling_min[n], rolling_max[n], prices[ends[n]], depth[n],
+            drop_count[n], counts[n], times[starts[n]], first_drop[n], last_drop[n])
+    return results
+
+
+def compute(series, rolling_days=ROLLING_DAYS):
+    """Analytics record per product for a {product_id: [(ts, price), ...]} mapping"""
+    if not series:
+        return {}
+    if np is not None:
+        return _compute_numpy(series, rolling_days)
+    return _compute_python(series, rolling_days)
+
+
+def merge_extremes(results, extremes):
+    """Fold tiered-store lows/highs (which bucket closes can hide) into the records"""
+    for product_id, record in results.items():
+        if product_id not in extremes:
+            continue
+        low, low_ts, high = extremes[product_id]
+        if low < record['lowest_price']:
+            record['lowest_price'] = round(low, 2)
+            record['lowest_at'] = _iso(low_ts)
+        record['highest_price'] = round(max(high, record['highest_price']), 2)
+        record['at_all_time_low'] = _at_all_time_low(record['current_price'], record['lowest_price'],
+                                                     record['highest_price'])
+    return results
+
+
+def run(history_path, rolling_days=ROLLING_DAYS):
+    """
+    Recompute analytics for a price history file and write them alongside it.
+
+    Deep history comes from the tiered SQLite store when it exists, otherwise
+    from the recent points kept in the JSON file.
+    """
+    db_path = price_store.store_path(history_path)
+    if os.path.exists(db_path):
+        results = compute(price_store.load_series(db_path), rolling_days)
+        merge_extremes(results, price_store.load_extremes(db_path))
+    else:
+        try:
+            with open(history_path, 'r') as f:
+                price_history = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            price_history = {}
+        results = compute(load_series(price_history), rolling_days)
+
+    payload = {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'rolling_days': rolling_days,
+        'products': results
+    }
+    try:
+        atomic_io.write_json(analytics_path(history_path), payload)
+    except Exception as e:
+        logger.error(f"Failed to save price analytics for {history_path}: {e}")
+    return results
+
+
+def load_analytics(history_path):
+    """Per-product analytics for a price history file ({} if not computed yet)"""
+    try:
+        with open(analytics_path(history_path), 'r') as f:
+            return json.load(f).get('products', {})
+    except (FileNotFoundError, json.JSONDecodeError, TypeError):
+        return {}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print("usage: python price_analytics.py <price_history.json> [rolling_days]")
+        return 1
+    rolling_days = int(argv[1]) if len(argv) > 1 else ROLLING_DAYS
+    results = run(argv[0], rolling_days)
+    at_low = sum(1 for r in results.values() if r['at_all_time_low'])
+    print(f"{len(results)} products analysed, {at_low} at their all-time low -> {analytics_path(argv[0])}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,237 @@
+"""
+Tiered long-term price history in SQLite.
+
+price_history.json only keeps the last 20 points per product (the hot tier
+used for the recently reduced check). Every observed price is also recorded
+here, and compact() downsamples old data after each cycle:
+
+    points   full resolution for RAW_DAYS (7 days)
+    daily    min/max/close per product per day, kept for DAILY_DAYS (1 year)
+    weekly   min/max/close per product per week, kept indefinitely
+
+The store lives next to the JSON (price_history.json -> price_history.db) and
+is read by price_analytics for deep history. apply_price() is the one place
+the JSON tier and its recently reduced rule are updated, for Backendtemp and
+scraper_engine alike.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+HISTORY_POINTS = 20  # prices kept per product in the JSON hot tier
+RECENT_REDUCTION_THRESHOLD = 5.0  # % below the first seen price that counts as recently reduced
+RAW_DAYS = 7
+DAILY_DAYS = 365
+DAY_SECONDS = 86400
+WEEK_SECONDS = 7 * DAY_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS points (
+    product_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    price REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS points_product_ts ON points (product_id, ts);
+CREATE TABLE IF NOT EXISTS daily (
+    product_id TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    min_price REAL NOT NULL,
+    max_price REAL NOT NULL,
+    close_price REAL NOT NULL,
+    close_ts REAL NOT NULL,
+    PRIMARY KEY (product_id, bucket)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS weekly (
+    product_id TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    min_price REAL NOT NULL,
+    max_price REAL NOT NULL,
+    close_price REAL NOT NULL,
+    close_ts REAL NOT NULL,
+    PRIMARY KEY (product_id, bucket)
+) WITHOUT ROWID;
+"""
+
+_connections = {}
+_lock = threading.Lock()
+
+
+def store_path(history_path):
+    """Path of the SQLite store that belongs to a price history JSON file"""
+    return os.path.splitext(history_path)[0] + '.db'
+
+
+def connect(path):
+    """Shared connection per store path (created with the schema on first use)"""
+    with _lock:
+        conn = _connections.get(path)
+        if conn is None:
+            conn = sqlite3.connect(path, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(_SCHEMA)
+            _connections[path] = conn
+        return conn
+
+
+def close_all():
+    with _lock:
+        for conn in _connections.values():
+            conn.close()
+        _connections.clear()
+
+
+def apply_price(price_history, product_id, price, name, timestamp):
+    """
+    Add one observed price to a loaded price_history.json dict and return
+    whether the product is recently reduced: at least
+    RECENT_REDUCTION_THRESHOLD % below the price it was first seen at, or
+    cheaper than it was two checks ago.
+    """
+    point = {"price": price, "timestamp": timestamp}
+    entry = price_history.get(product_id)
+    if entry is None:
+        price_history[product_id] = {"name": name, "initial_price": price, "prices": [point],
+                                     "recently_reduced": False, "reduction_from_initial": 0.0}
+        return False
+    entry["name"] = name
+    entry["prices"] = (entry.get("prices", []) + [point])[-HISTORY_POINTS:]
+    # Older entries have no initial_price: fall back to the oldest kept point
+    initial_price = entry.get("initial_price") or entry["prices"][0]["price"]
+    entry["initial_price"] = initial_price
+    reduction = 0.0
+    if price is not None and initial_price is not None and initial_price > 0:
+        reduction = (initial_price - price) / initial_price * 100
+    entry["reduction_from_initial"] = reduction
+    recent = [p["price"] for p in entry["prices"][-3:] if p["price"] is not None]
+    recent_drop = len(entry["prices"]) >= 3 and len(recent) >= 2 and recent[-1] < recent[0]
+    entry["recently_reduced"] = reduction >= RECENT_REDUCTION_THRESHOLD or recent_drop
+    return entry["recently_reduced"]
+
+
+def record(path, product_id, price, ts=None):
+    """Append one observed price at full resolution"""
+    if price is None:
+        return
+    conn = connect(path)
+    with _lock, conn:
+        conn.execute('INSERT INTO points (product_id, ts, price) VALUES (?, ?, ?)',
+                     (str(product_id), ts if ts is not None else time.time(), float(price)))
+
+
+def is_empty(path):
+    conn = connect(path)
+    with _lock:
+        return conn.execute('SELECT NOT EXISTS (SELECT 1 FROM points) AND NOT EXISTS (SELECT 1 FROM daily) '
+                            'AND NOT EXISTS (SELECT 1 FROM weekly)').fetchone()[0] == 1
+
+
+def migrate_from_json(path, price_history):
+    """Seed an empty store with the points already in price_history.json (one-off)"""
+    if not is_empty(path):
+        return 0
+    rows = []
+    for product_id, entry in price_history.items():
+        for point in entry.get('prices', []):
+            try:
+                ts = datetime.fromisoformat(point['timestamp']).timestamp()
+            except (KeyError, TypeError, ValueError):
+                continue
+            if point.get('price') is not None:
+                rows.append((str(product_id), ts, float(point['price'])))
+    conn = connect(path)
+    with _lock, conn:
+        conn.executemany('INSERT INTO points (product_id, ts, price) VALUES (?, ?, ?)', rows)
+    logger.info(f"Seeded price store with {len(rows)} points from JSON history")
+    return len(rows)
+
+
+def _aggregate(rows, bucket_seconds):
+    """(product_id, ts, min, max, close) rows in time order -> {(product_id, bucket): [min, max, close, close_ts]}"""
+    buckets = {}
+    for product_id, ts, low, high, close in rows:
+        key = (product_id, int(ts // bucket_seconds))
+        agg = buckets.get(key)
+        if agg is None:
+            buckets[key] = [low, high, close, ts]
+        else:
+            agg[0] = min(agg[0], low)
+            agg[1] = max(agg[1], high)
+            if ts >= agg[3]:
+                agg[2], agg[3] = close, ts
+    return buckets
+
+
+def _upsert(conn, table, buckets):
+    conn.executemany(f"""
+        INSERT INTO {table} (product_id, bucket, min_price, max_price, close_price, close_ts)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (product_id, bucket) DO UPDATE SET
+            min_price = min(min_price, excluded.min_price),
+            max_price = max(max_price, excluded.max_price),
+            close_price = CASE WHEN excluded.close_ts >= close_ts THEN excluded.close_price ELSE close_price END,
+            close_ts = max(close_ts, excluded.close_ts)
+    """, [(pid, bucket, *agg) for (pid, bucket), agg in buckets.items()])
+
+
+def compact(path, now=None):
+    """Downsample raw points older than RAW_DAYS to daily, and daily older than DAILY_DAYS to weekly"""
+    now = now if now is not None else time.time()
+    raw_cutoff = now - RAW_DAYS * DAY_SECONDS
+    daily_cutoff = int((now - DAILY_DAYS * DAY_SECONDS) // DAY_SECONDS)
+    conn = connect(path)
+    with _lock, conn:
+        rows = conn.execute('SELECT product_id, ts, price, price, price FROM points WHERE ts < ? ORDER BY ts',
+                            (raw_cutoff,)).fetchall()
+        daily = _aggregate(rows, DAY_SECONDS)
+        _upsert(conn, 'daily', daily)
+        conn.execute('DELETE FROM points WHERE ts < ?', (raw_cutoff,))
+
+        rows = conn.execute('SELECT product_id, close_ts, min_price, max_price, close_price FROM daily '
+                            'WHERE bucket < ? ORDER BY close_ts', (daily_cutoff,)).fetchall()
+        weekly = _aggregate(rows, WEEK_SECONDS)
+        _upsert(conn, 'weekly', weekly)
+        conn.execute('DELETE FROM daily WHERE bucket < ?', (daily_cutoff,))
+    logger.info(f"Price store compacted: {len(daily)} daily and {len(weekly)} weekly buckets updated")
+    return len(daily), len(weekly)
+
+
+_TIERS_SQL = """
+    SELECT product_id, close_ts AS ts, close_price AS price, min_price, max_price FROM weekly
+    UNION ALL
+    SELECT product_id, close_ts, close_price, min_price, max_price FROM daily
+    UNION ALL
+    SELECT product_id, ts, price, price, price FROM points
+"""
+
+
+def load_series(path):
+    """{product_id: [(ts, price), ...]} across all tiers (bucket closes, then raw points)"""
+    conn = connect(path)
+    series = {}
+    with _lock:
+        rows = conn.execute(f'SELECT product_id, ts, price FROM ({_TIERS_SQL}) ORDER BY product_id, ts').fetchall()
+    for product_id, ts, price in rows:
+        series.setdefault(product_id, []).append((ts, price))
+    return series
+
+
+def load_extremes(path):
+    """{product_id: (lowest, lowest_ts, highest)} including intra-bucket lows the closes miss"""
+    conn = connect(path)
+    with _lock:
+        rows = conn.execute(f"""
+            SELECT product_id, MIN(min_price), MAX(max_price) FROM ({_TIERS_SQL}) GROUP BY product_id
+        """).fetchall()
+        low_ts = dict(conn.execute(f"""
+            SELECT t.product_id, MIN(t.ts) FROM ({_TIERS_SQL}) t
+            JOIN (SELECT product_id, MIN(min_price) AS low FROM ({_TIERS_SQL}) GROUP BY product_id) m
+              ON t.product_id = m.product_id AND t.min_price = m.low
+            GROUP BY t.product_id
+        """).fetchall())
+    return {pid: (low, low_ts.get(pid), high) for pid, low, high in rows}
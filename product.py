@@ -0,0 +1,56 @@
+"""
+Compact product record shared by the Flask app and the scraper.
+
+Product uses __slots__ instead of a per-instance dict, and interns the
+low-cardinality strings (category, retailer, brand, stock status) so thousands
+of rows share one copy of each.
+"""
+import sys
+from dataclasses import dataclass, field, fields
+from operator import attrgetter
+
+
+@dataclass(slots=True)
+class Product:
+    id: str
+    name: str
+    url: str = ''
+    current_price: float = None
+    original_price: float = None
+    discount: float = 0.0
+    stock_status: str = 'Unknown'
+    sizes: object = ''  # joined string when read from CSV, list of labels when scraped
+    image: str = ''
+    category: str = ''
+    retailer: str = ''
+    brand: str = ''
+    timestamp: str = ''
+    recently_reduced: bool = False
+    recently_added: bool = False
+    savings: float = 0.0
+    lowest_price: float = None  # from price analytics, None until first computed
+    at_all_time_low: bool = False
+    variants: list = field(default_factory=list)
+    base_product_id: str = ''
+    excluded_keyword: str = None  # scraper's keyword check: None until run, '' when nothing matched
+
+    def __post_init__(self):
+        self.category = sys.intern(self.category or '')
+        self.retailer = sys.intern(self.retailer or '')
+        self.brand = sys.intern(self.brand or '')
+        self.stock_status = sys.intern(self.stock_status or 'Unknown')
+        if not self.savings and self.original_price and self.current_price:
+            self.savings = self.original_price - self.current_price
+
+    def to_dict(self):
+        """Plain dict for JSON responses"""
+        return dict(zip(FIELD_NAMES, _get_all(self)))
+
+
+FIELD_NAMES = tuple(f.name for f in fields(Product))
+_get_all = attrgetter(*FIELD_NAMES)
+
+
+def products_to_json(products):
+    """List of dicts for a JSON payload"""
+    return [p.to_dict() for p in products]
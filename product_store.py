@@ -0,0 +1,199 @@
+"""
+Indexed store for the scraper's product CSV rows (SQLite).
+
+The CSV the web app reads is an export of this store. Every alert row is
+inserted here and appended to the CSV in the same column order, so the export
+stays in sync without a rewrite. The end-of-cycle cleanup marks rows of
+products that are no longer listed with a tombstone (one indexed UPDATE) and
+bumps the store version. export_csv() rewrites the CSV only when that version
+differs from the last exported one, which means a cycle that removed nothing
+leaves the file alone.
+
+    product_store.import_csv(db, csv_path)          # one-off, when the store is empty
+    product_store.append(db, csv_path, row)
+    product_store.tombstone_missing(db, keep_ids)
+    product_store.export_csv(db, csv_path)          # None when nothing changed
+
+scraper_engine, which scrapes a retailer's whole catalog every cycle, swaps
+in the new rows with replace_all() and then exports.
+"""
+import csv
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import atomic_io
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rows (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    product_id TEXT NOT NULL,
+    data TEXT NOT NULL,
+    removed_at REAL
+);
+CREATE INDEX IF NOT EXISTS rows_live_product ON rows (product_id) WHERE removed_at IS NULL;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+_connections = {}
+_lock = threading.RLock()
+
+
+def connect(path):
+    """Shared connection per store path (created with the schema on first use)"""
+    with _lock:
+        conn = _connections.get(path)
+        if conn is None:
+            conn = sqlite3.connect(path, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(_SCHEMA)
+            _connections[path] = conn
+        return conn
+
+
+def _get_meta(conn, key, default=None):
+    row = conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+    return json.loads(row[0]) if row else default
+
+
+def _set_meta(conn, key, value):
+    conn.execute('INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value',
+                 (key, json.dumps(value)))
+
+
+def _bump_version(conn):
+    version = _get_meta(conn, 'version', 0) + 1
+    _set_meta(conn, 'version', version)
+    return version
+
+
+def fieldnames(path):
+    """CSV columns, in the order they first appeared"""
+    with _lock:
+        return _get_meta(connect(path), 'fieldnames', [])
+
+
+def is_empty(path):
+    with _lock:
+        return connect(path).execute('SELECT 1 FROM rows LIMIT 1').fetchone() is None
+
+
+def import_csv(path, csv_path):
+    """Load an existing CSV into an empty store; returns the number of rows imported"""
+    if not is_empty(path) or not os.path.exists(csv_path):
+        return 0
+    with open(csv_path, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        rows = list(reader)
+        columns = list(reader.fieldnames or [])
+    conn = connect(path)
+    with _lock, conn:
+        conn.executemany('INSERT INTO rows (product_id, data) VALUES (?, ?)',
+                         [(row.get('Product ID', ''), json.dumps(row)) for row in rows])
+        _set_meta(conn, 'fieldnames', columns)
+        version = _bump_version(conn)
+        _set_meta(conn, 'exported_version', version)  # the CSV already holds these rows
+    logger.info(f"Imported {len(rows)} rows from {csv_path} into the product store")
+    return len(rows)
+
+
+def append(path, csv_path, row):
+    """
+    Store a row and append it to the CSV export. A row with columns the CSV
+    doesn't have yet triggers a full export so the header stays correct.
+    """
+    conn = connect(path)
+    with _lock:
+        with conn:
+            columns = _get_meta(conn, 'fieldnames', [])
+            new_columns = [key for key in row if key not in columns]
+            if new_columns:
+                columns = columns + new_columns
+                _set_meta(conn, 'fieldnames', columns)
+            conn.execute('INSERT INTO rows (product_id, data) VALUES (?, ?)', (row.get('Product ID', ''), json.dumps(row)))
+            version = _bump_version(conn)
+            in_sync = _get_meta(conn, 'exported_version') == version - 1
+        if new_columns or not in_sync or not os.path.exists(csv_path):
+            export_csv(path, csv_path)
+            return
+        with atomic_io.append(csv_path, newline='', encoding='utf-8') as f:
+            csv.DictWriter(f, fieldnames=columns, quoting=csv.QUOTE_ALL, restval='').writerow(row)
+        with conn:
+            _set_meta(conn, 'exported_version', version)
+
+
+def live_ids(path):
+    """Set of product IDs with at least one live (not tombstoned) row"""
+    with _lock:
+        return {row[0] for row in connect(path).execute('SELECT DISTINCT product_id FROM rows WHERE removed_at IS NULL')}
+
+
+def live_rows(path):
+    """Live rows as dicts, in insertion order"""
+    with _lock:
+        cursor = connect(path).execute('SELECT data FROM rows WHERE removed_at IS NULL ORDER BY seq')
+        return [json.loads(data) for (data,) in cursor]
+
+
+def recent_rows(path, limit):
+    """The last `limit` live rows, oldest first"""
+    with _lock:
+        cursor = connect(path).execute('SELECT data FROM rows WHERE removed_at IS NULL ORDER BY seq DESC LIMIT ?', (limit,))
+        return [json.loads(data) for (data,) in cursor][::-1]
+
+
+def tombstone_missing(path, keep_ids):
+    """Tombstone every live row whose product isn't in keep_ids; returns the removed product IDs"""
+    keep_ids = set(keep_ids)
+    conn = connect(path)
+    with _lock, conn:
+        removed = [pid for pid in live_ids(path) if pid not in keep_ids]
+        if removed:
+            conn.executemany('UPDATE rows SET removed_at = ? WHERE product_id = ? AND removed_at IS NULL',
+                             [(time.time(), pid) for pid in removed])
+            _bump_version(conn)
+    return removed
+
+
+def replace_all(path, rows, columns):
+    """Tombstone every live row and store rows (CSV columns in order) in their place"""
+    conn = connect(path)
+    with _lock, conn:
+        conn.execute('UPDATE rows SET removed_at = ? WHERE removed_at IS NULL', (time.time(),))
+        conn.executemany('INSERT INTO rows (product_id, data) VALUES (?, ?)',
+                         [(row.get('Product ID', ''), json.dumps(row)) for row in rows])
+        _set_meta(conn, 'fieldnames', list(columns))
+        _bump_version(conn)
+
+
+def export_csv(path, csv_path, force=False):
+    """
+    Rewrite the CSV from the live rows if the store changed since the last
+    export (or force). Tombstoned rows are purged once exported. Returns the
+    exported rows, or None when the CSV was already current.
+    """
+    conn = connect(path)
+    with _lock:
+        version = _get_meta(conn, 'version', 0)
+        if not force and _get_meta(conn, 'exported_version') == version and os.path.exists(csv_path):
+            return None
+        columns = _get_meta(conn, 'fieldnames', [])
+        rows = live_rows(path)
+        with atomic_io.atomic_write(csv_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=columns, quoting=csv.QUOTE_ALL, restval='')
+            writer.writeheader()
+            writer.writerows(rows)
+        with conn:
+            purged = conn.execute('DELETE FROM rows WHERE removed_at IS NOT NULL').rowcount
+            _set_meta(conn, 'exported_version', version)
+    logger.info(f"Exported {len(rows)} rows to {csv_path} ({purged} removed rows purged)")
+    return rows
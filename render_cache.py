@@ -0,0 +1,87 @@
+"""
+In-memory LRU cache for rendered pages and API payloads.
+
+Keys are tuples whose first element is a scope (usually the retailer), and
+every entry is stamped with the catalog version it was rendered from. A lookup
+with a different version is a miss, and all older entries in that scope are
+dropped at the same time. A TTL bounds how stale time-based badges (recently
+added) can get.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class RenderCache:
+    """Thread-safe LRU of rendered bodies with an entry and byte cap"""
+
+    def __init__(self, max_entries=128, max_bytes=64 * 1024 * 1024, ttl_seconds=300):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (version, body, stored_at, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version):
+        """Return the cached body for key at this catalog version, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            entry_version, body, stored_at, _ = entry
+            if entry_version != version:
+                # Catalog snapshot changed: drop everything in this scope rendered from the old one
+                self._invalidate_scope(key[0], version)
+                self.misses += 1
+                return None
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key, version, body, size=None):
+        """Store a rendered body, evicting least recently used entries over the caps"""
+        if size is None:
+            size = len(body)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (version, body, time.monotonic(), size)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+    def _remove(self, key):
+        _, _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def _invalidate_scope(self, scope, current_version):
+        stale = [k for k, (v, _, _, _) in self._entries.items() if k[0] == scope and v != current_version]
+        for k in stale:
+            self._remove(k)
@@ -0,0 +1,342 @@
+"""
+Retailer registry and shared catalog loader for the web app.
+
+Every retailer is a config entry in RETAILERS; app.py and flask_routes.py
+both load products through get_catalog(), so each CSV is parsed once per
+catalog version and the product list, ID index and columnar view are shared
+by every page and API endpoint.
+
+To add a retailer, add an entry to RETAILERS:
+    'csv'            product CSV written by the scraper
+    'price_history'  price history JSON (list of candidates, first existing wins)
+    'name'           display name, also stored on each Product
+    'color_theme'    retailer page theme
+    'category'       fallback category when the CSV has none
+    'brand'          fixed brand, or 'brand_column' to read it from the CSV
+    'discount_decimals'  round discounts for display (optional)
+"""
+import csv
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import atomic_io
+import catalog_events
+import columnar_catalog
+import price_analytics
+import summary_stats
+from product import Product
+
+logger = logging.getLogger(__name__)
+
+RETAILERS = {
+    'johnlewis': {
+        'name': 'John Lewis',
+        'csv': 'johnlewisv2.csv',
+        'price_history': [os.path.join('state', 'price_history.json'), 'price_history.json'],
+        'color_theme': 'green',
+        'category': 'John Lewis',
+        'brand': 'John Lewis'
+    },
+    'selfridges': {
+        'name': 'Selfridges',
+        'csv': 'salescout_selfridges.csv',
+        'price_history': ['selfridges_price_history.json'],
+        'color_theme': 'purple',
+        'category': 'Selfridges',
+        'brand_column': 'brand',
+        'discount_decimals': 1
+    }
+}
+
+# Recently added time threshold (hours)
+RECENTLY_ADDED_HOURS = 24
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Catalogs are reloaded when their files change, or after this long so the
+# time-based recently added flags stay current. The reload time is part of the
+# version pages and ETags are cached under, so a 304 never pins stale badges.
+CATALOG_TTL_SECONDS = 300
+
+_catalogs = {}  # retailer -> Catalog
+_lock = threading.Lock()
+
+# Set by enable_live_updates(): requests use the in-memory catalogs as-is and a
+# background thread (catalog_events) rebuilds them when the scraper publishes.
+# Each process runs its own thread, started by the first request after a fork.
+_live = False
+
+
+def get_config(retailer):
+    """Config dict for a retailer key, or None if it isn't registered"""
+    return RETAILERS.get(retailer)
+
+
+def csv_path(retailer):
+    return RETAILERS[retailer]['csv']
+
+
+def price_history_path(retailer):
+    """Resolve the price history file for a retailer (first candidate that exists)"""
+    candidates = RETAILERS[retailer].get('price_history', [])
+    for path in candidates:
+        if os.path.exists(path):
+            return path
+    return candidates[-1] if candidates else None
+
+
+def _file_version(path):
+    """
+    Generation number written by atomic_io alongside the file, falling back to
+    size/mtime for files produced elsewhere (e.g. the Selfridges export)
+    """
+    if not path:
+        return None
+    generation = atomic_io.read_generation(path)
+    if generation is not None:
+        return ('gen', generation)
+    try:
+        st = os.stat(path)
+        return (st.st_size, st.st_mtime_ns)
+    except OSError:
+        return None
+
+
+def analytics_path(retailer):
+    """Post-cycle price analytics file for a retailer (may not exist yet)"""
+    history_path = price_history_path(retailer)
+    return price_analytics.analytics_path(history_path) if history_path else None
+
+
+def catalog_version(retailer):
+    """Cheap fingerprint of the files a retailer's catalog is built from"""
+    return (_file_version(csv_path(retailer)), _file_version(price_history_path(retailer)),
+            _file_version(analytics_path(retailer)))
+
+
+def catalog_mtime(*retailers):
+    """Newest modification time of the catalog files, for Last-Modified"""
+    mtimes = []
+    for retailer in retailers:
+        for path in (csv_path(retailer), price_history_path(retailer)):
+            try:
+                mtimes.append(os.stat(path).st_mtime)
+            except (OSError, TypeError):
+                pass
+    return max(mtimes, default=None)
+
+
+def load_price_history(retailer):
+    """Load price history for recently reduced detection"""
+    path = price_history_path(retailer)
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def load_analytics(retailer):
+    """Per-product price analytics written by the scraper after each cycle"""
+    history_path = price_history_path(retailer)
+    return price_analytics.load_analytics(history_path) if history_path else {}
+
+
+def is_recently_added(timestamp_str, now=None):
+    """Check if product was added within the recently added time threshold"""
+    if not timestamp_str:
+        return False
+    try:
+        timestamp = datetime.strptime(timestamp_str, TIMESTAMP_FORMAT)
+    except (ValueError, TypeError):
+        return False
+    return (now or datetime.now()) - timestamp <= timedelta(hours=RECENTLY_ADDED_HOURS)
+
+
+def _to_float(value):
+    try:
+        return float(value) if value else 0
+    except ValueError:
+        return 0
+
+
+def read_catalog_csv(retailer, path=None, price_history=None, analytics=None):
+    """Parse a retailer CSV into Product records (price history is read once per call)"""
+    config = RETAILERS[retailer]
+    path = path or config['csv']
+    products = []
+    if not os.path.exists(path):
+        logger.warning(f"CSV not found: {path}")
+        return products
+
+    if price_history is None:
+        price_history = load_price_history(retailer)
+    if analytics is None:
+        analytics = load_analytics(retailer)
+    now = datetime.now()
+    decimals = config.get('discount_decimals')
+    brand_column = config.get('brand_column')
+
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            for row in csv.DictReader(file):
+                product_id = row.get('Product ID', '')
+                timestamp = row.get('Timestamp', '')
+                discount = _to_float(row.get('Discount'))
+                if decimals is not None:
+                    discount = round(discount, decimals)
+                trend = analytics.get(product_id, {})
+
+                products.append(Product(
+                    id=product_id,
+                    name=row.get('Product Name', ''),
+                    brand=row.get(brand_column, '') if brand_column else config.get('brand', ''),
+                    current_price=_to_float(row.get('Current Price')),
+                    original_price=_to_float(row.get('Original Price')),
+                    discount=discount,
+                    stock_status=row.get('Stock Status', 'Unknown'),
+                    sizes=row.get('Sizes', 'See product page'),
+                    url=row.get('URL', ''),
+                    image=row.get('Image', ''),
+                    category=row.get('Category', config['category']),
+                    timestamp=timestamp,
+                    retailer=config['name'],
+                    recently_reduced=price_history.get(str(product_id), {}).get('recently_reduced', False),
+                    recently_added=is_recently_added(timestamp, now),
+                    lowest_price=trend.get('lowest_price'),
+                    at_all_time_low=trend.get('at_all_time_low', False)
+                ))
+    except Exception as e:
+        logger.error(f"Error reading {config['name']} CSV: {e}")
+
+    if logger.isEnabledFor(logging.DEBUG):
+        recently_added_count = sum(1 for p in products if p.recently_added)
+        logger.debug(f"Loaded {len(products)} products from {config['name']} CSV ({recently_added_count} recently added)")
+    return products
+
+
+class Catalog:
+    """One loaded snapshot of a retailer's products plus derived indexes"""
+
+    def __init__(self, retailer, version, products, price_history=None, analytics=None, source=None):
+        self.retailer = retailer
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.built_at = int(time.time())  # wall clock, for the served version
+        self.mtime = catalog_mtime(retailer)
+        self.products = products
+        self.by_id = {p.id: p for p in products}
+        self.price_history = price_history or {}
+        self.analytics = analytics or {}
+        self.source = source  # CSV signature the products were read from (for the summary)
+        self._columns = None
+
+    @property
+    def config(self):
+        return RETAILERS[self.retailer]
+
+    @property
+    def columns(self):
+        """Columnar (NumPy) view, built on first use; None without NumPy"""
+        if self._columns is None and columnar_catalog.np is not None:
+            self._columns = columnar_catalog.build(self.products)
+        return self._columns
+
+
+def _load(retailer, version):
+    source = summary_stats.source_signature(csv_path(retailer))  # taken before reading, so it is never newer than the rows
+    price_history = load_price_history(retailer)
+    analytics = load_analytics(retailer)
+    return Catalog(retailer, version, read_catalog_csv(retailer, price_history=price_history, analytics=analytics),
+                   price_history, analytics, source)
+
+
+def refresh(retailer, force=False):
+    """Reload a retailer's catalog if its files changed or the TTL expired; returns the current Catalog"""
+    version = catalog_version(retailer)
+    with _lock:
+        catalog = _catalogs.get(retailer)
+        if not force and catalog is not None and catalog.version == version \
+                and time.monotonic() - catalog.loaded_at < CATALOG_TTL_SECONDS:
+            return catalog
+
+    # Parse outside the lock; concurrent loads of the same version are harmless
+    catalog = _load(retailer, version)
+    with _lock:
+        _catalogs[retailer] = catalog
+    if _live:
+        logger.info(f"Rebuilt {retailer} catalog: {len(catalog.products)} products, version {version}")
+    return catalog
+
+
+def get_catalog(retailer):
+    """Shared Catalog for a retailer (checked against its files unless live updates are on)"""
+    if _live:
+        if not catalog_events.subscriber_running():
+            # First request in a forked worker, or the listener died: (re)start it
+            # and check the files directly until it is up
+            catalog_events.start_subscriber(on_catalog_event)
+            return refresh(retailer)
+        catalog = _catalogs.get(retailer)
+        if catalog is not None and time.monotonic() - catalog.loaded_at < CATALOG_TTL_SECONDS:
+            return catalog
+    return refresh(retailer)
+
+
+def current_version(retailer):
+    """Version of the catalog requests are served from, including when it was built (for its time-based flags)"""
+    catalog = get_catalog(retailer)
+    return catalog.version, catalog.built_at
+
+
+def current_mtime(*retailers):
+    """Newest catalog file mtime for Last-Modified, without touching disk in live mode"""
+    if not _live:
+        return catalog_mtime(*retailers)
+    mtimes = [get_catalog(r).mtime for r in retailers]
+    return max((m for m in mtimes if m), default=None)
+
+
+def on_catalog_event(retailer):
+    """catalog_events callback: None means re-check every retailer"""
+    for key in ([retailer] if retailer in RETAILERS else RETAILERS):
+        refresh(key)
+
+
+def enable_live_updates():
+    """Load every catalog now and keep them fresh from scraper notifications"""
+    global _live
+    for retailer in RETAILERS:
+        refresh(retailer)
+    _live = True
+    catalog_events.start_subscriber(on_catalog_event)
+
+
+def find_product(product_id):
+    """(retailer, Catalog, Product) for a product ID across all retailers, or None"""
+    for retailer in RETAILERS:
+        catalog = get_catalog(retailer)
+        product = catalog.by_id.get(product_id)
+        if product is not None:
+            return retailer, catalog, product
+    return None
+
+
+def get_products(retailer):
+    """The shared product list; callers must copy it before sorting in place"""
+    return get_catalog(retailer).products
+
+
+def get_retailer_stats(retailer):
+    """Catalog-wide stats from the precomputed summary, parsing the CSV only if it is stale"""
+    path = csv_path(retailer)
+    summary = summary_stats.load_summary(path)
+    if summary is None:
+        catalog = get_catalog(retailer)
+        summary = summary_stats.rebuild_from_products(path, catalog.products, catalog.source)
+    return summary_stats.stats_from_summary(summary)
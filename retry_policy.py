@@ -0,0 +1,284 @@
+"""
+Retry policy engine and per-host circuit breaker for scraper requests.
+
+RetryPolicy decides whether a failed attempt is worth repeating and how long
+to wait: capped exponential backoff with full jitter, or the server's
+Retry-After when it sends one. CircuitBreaker tracks the recent error rate per
+host and, when it spikes, pauses requests to that host for a cooldown before
+letting a single probe request through. HostRateLimiter spaces requests to
+each host, shared by every crawl worker.
+
+    policy = RetryPolicy({'max_attempts': 3})
+    breakers = CircuitBreakers({'error_rate': 0.5, 'cooldown': 1800})
+    limiter = HostRateLimiter((2, 4))
+    response = fetch(client, url, policy, breakers, headers=..., limiter=limiter)
+
+fetch() raises FetchError once the attempts are used up or the status is not
+retryable (404, 400, ...).
+"""
+import logging
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLICY = {
+    'max_attempts': 3,
+    'base_delay': 2.0,          # seconds; doubles each attempt
+    'max_delay': 60.0,          # cap for the backoff
+    'max_retry_after': 300.0,   # ignore Retry-After values longer than this
+    'retry_statuses': (403, 408, 429, 500, 502, 503, 504)
+}
+
+DEFAULT_BREAKER = {
+    'window': 20,               # most recent requests considered per host
+    'min_requests': 10,         # don't judge a host on fewer than this
+    'error_rate': 0.5,          # open the circuit at or above this share of failures
+    'cooldown': 1800.0,         # seconds to pause the host once open
+    'probe_timeout': 120.0      # let another request probe if the first never reports back
+}
+BLOCK_STATUSES = (403, 429)     # the host is refusing us: always a breaker failure, retried or not
+PROBE_POLL_SECONDS = 5.0        # how often requests queued behind a probe re-check the breaker
+
+
+class FetchError(Exception):
+    """A URL could not be fetched within the retry policy"""
+
+    def __init__(self, message, status=None, cause=None):
+        super().__init__(message)
+        self.status = status
+        self.cause = cause
+
+
+def _default_sleep(seconds, reason=''):
+    time.sleep(seconds)
+
+
+def parse_retry_after(value, now=None):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date), or None"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    now = now or datetime.now(timezone.utc)
+    return max(0.0, (when - now).total_seconds())
+
+
+class RetryPolicy:
+    """Which failures to retry and how long to back off"""
+
+    def __init__(self, config=None):
+        self.config = {**DEFAULT_POLICY, **(config or {})}
+        self.retry_statuses = frozenset(self.config['retry_statuses'])
+
+    @property
+    def max_attempts(self):
+        return self.config['max_attempts']
+
+    def backoff(self, attempt):
+        """Full-jitter exponential backoff for the given (0-based) attempt"""
+        ceiling = min(self.config['max_delay'], self.config['base_delay'] * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+    def delay(self, attempt, response=None):
+        """Wait before the next attempt, honouring Retry-After when present"""
+        if response is not None:
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is not None:
+                return min(retry_after, self.config['max_retry_after'])
+        return self.backoff(attempt)
+
+    def should_retry_status(self, status):
+        return status in self.retry_statuses
+
+
+class CircuitBreaker:
+    """Error-rate breaker for one host: closed -> open (cooldown) -> half-open probe"""
+
+    def __init__(self, host, config):
+        self.host = host
+        self.config = config
+        self.results = deque(maxlen=config['window'])
+        self.opened_at = None
+        self.probing = False
+        self.probe_started = None
+        self.lock = threading.Lock()
+
+    def wait_time(self):
+        """
+        Seconds until a request may be sent: 0 when closed, or to the one caller
+        that becomes the half-open probe; everyone else keeps waiting for its result
+        """
+        with self.lock:
+            if self.opened_at is None:
+                return 0.0
+            now = time.monotonic()
+            remaining = self.opened_at + self.config['cooldown'] - now
+            if remaining > 0:
+                return remaining
+            if self.probing:
+                probe_left = self.probe_started + self.config['probe_timeout'] - now
+                if probe_left > 0:
+                    return min(PROBE_POLL_SECONDS, probe_left)
+                logger.warning(f"Probe to {self.host} never reported back; sending another")
+            self.probing = True
+            self.probe_started = now
+            return 0.0
+
+    def record(self, success):
+        """
+        Record a request outcome; returns True if this opened the circuit.
+        success=None is a neutral outcome (e.g. a 404): it frees the probe slot
+        without closing the circuit and doesn't count towards the error rate.
+        """
+        with self.lock:
+            if self.probing:
+                self.probing = False
+                if success is None:
+                    return False
+                if success:
+                    self.opened_at = None
+                    self.results.clear()
+                    logger.info(f"Circuit for {self.host} closed after successful probe")
+                    return False
+                self.opened_at = time.monotonic()
+                logger.warning(f"Probe to {self.host} failed; circuit stays open for {self.config['cooldown']:.0f}s")
+                return False
+
+            if success is None:
+                return False
+            self.results.append(success)
+            if self.opened_at is not None or len(self.results) < self.config['min_requests']:
+                return False
+            failures = self.results.count(False)
+            if failures / len(self.results) >= self.config['error_rate']:
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def error_rate(self):
+        with self.lock:
+            return self.results.count(False) / len(self.results) if self.results else 0.0
+
+
+class CircuitBreakers:
+    """Per-host breakers sharing one config; on_open(host, error_rate) is called when one trips"""
+
+    def __init__(self, config=None, on_open=None):
+        self.config = {**DEFAULT_BREAKER, **(config or {})}
+        self.on_open = on_open
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def for_url(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = self._breakers[host] = CircuitBreaker(host, self.config)
+            return breaker
+
+    def record(self, breaker, success):
+        if breaker.record(success):
+            rate = breaker.error_rate()
+            logger.warning(f"Circuit for {breaker.host} opened: error rate {rate:.0%}, pausing for {self.config['cooldown']:.0f}s")
+            if self.on_open:
+                self.on_open(breaker.host, rate)
+
+
+class HostRateLimiter:
+    """
+    Politeness spacing per host, shared by every thread. Each request reserves
+    the next slot for its host, uniform(*interval) seconds after the previous
+    one, so N parallel workers still send at most one request per interval
+    instead of N.
+    """
+
+    def __init__(self, interval):
+        self.interval = tuple(interval)
+        self._next = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, url):
+        """Seconds the caller must wait before sending its request to url"""
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next.get(host, now))
+            self._next[host] = slot + random.uniform(*self.interval)
+            return slot - now
+
+    def requests_per_second(self):
+        """Upper bound on the average request rate per host"""
+        return 2.0 / sum(self.interval) if sum(self.interval) else float('inf')
+
+
+def fetch(client, url, policy, breakers=None, headers=None, sleep=_default_sleep, on_error=None, limiter=None):
+    """
+    GET url through client with retries.
+
+    headers: dict, or a callable returning a fresh dict per attempt
+    sleep: sleep(seconds, reason), e.g. tracing.sleep so waits show up in traces
+    on_error: on_error(exception_or_None, status, attempt) for caller-side accounting
+    limiter: HostRateLimiter applied before every attempt, retries included
+    """
+    breaker = breakers.for_url(url) if breakers else None
+    last_error = None
+    for attempt in range(policy.max_attempts):
+        if breaker:
+            wait = breaker.wait_time()
+            while wait > 0:
+                sleep(wait, 'circuit open')
+                wait = breaker.wait_time()  # 0 once closed, or when this request is the half-open probe
+        if limiter:
+            wait = limiter.reserve(url)
+            if wait > 0:
+                sleep(wait, 'request delay')
+
+        response = None
+        try:
+            response = client.get(url, headers=headers() if callable(headers) else headers)
+        except requests.exceptions.RequestException as e:
+            last_error = FetchError(f"{type(e).__name__} fetching {url}: {e}", cause=e)
+            if breaker:
+                breakers.record(breaker, False)
+            if on_error:
+                on_error(e, None, attempt)
+        else:
+            status = response.status_code
+            if status < 400:
+                if breaker:
+                    breakers.record(breaker, True)
+                return response
+            retryable = policy.should_retry_status(status)
+            if breaker:
+                # 404s and other client errors say nothing about the host's health: neutral,
+                # so they neither count as errors nor close the circuit as a probe
+                neutral = status < 500 and status not in BLOCK_STATUSES and not retryable
+                breakers.record(breaker, None if neutral else False)
+            if on_error:
+                on_error(None, status, attempt)
+            last_error = FetchError(f"HTTP {status} fetching {url}", status=status)
+            if not retryable:
+                raise last_error
+
+        if attempt < policy.max_attempts - 1:
+            delay = policy.delay(attempt, response)
+            logger.debug(f"Retrying {url} in {delay:.1f}s (attempt {attempt + 2}/{policy.max_attempts})")
+            sleep(delay, 'retry backoff')
+
+    raise last_error
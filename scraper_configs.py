@@ -0,0 +1,158 @@
+"""
+Declarative scraper configs, one per retailer, run by scraper_engine.
+
+Keys:
+    'retailer'      key in retailers.RETAILERS (CSV / price history the web app reads)
+    'base_url'      joins relative product links
+    'categories'    {name: {'url', 'min_discount', 'max_pages', 'max_products_per_page',
+                            'excluded_keywords' (optional)}}; Backendtemp also
+                    reads 'state_file' and 'log_tag'
+    'pagination'    {'scheme': 'page_chunk' | 'page' | 'offset', ...}
+                      page_chunk: &page=N&chunk=M, up to 'max_chunks' chunks per page
+                      page:       ?<param>=N (page 1 is the bare URL)
+                      offset:     ?<param>=(N-1)*page_size
+    'listing'       'json_ld_type' / 'json_ld_items' / 'json_ld_url' / 'json_ld_price'
+                    dotted paths into the listing JSON-LD, then CSS fallbacks:
+                    'card' (one element per product), 'link' and 'price' inside it,
+                    'url_contains' to drop non-product links
+    'product'       'json_ld' {field: dotted path} into the Product JSON-LD and
+                    'css' {field: [selectors tried in order]} fallbacks; 'image_attr'
+    'id_pattern'    regex with one group, applied to the normalized product URL
+    'concurrency'   product pages fetched in parallel (also sizes the HTTP pool)
+    'request_delay' (min, max) seconds between requests to the retailer's host,
+                    shared by all workers (retry_policy.HostRateLimiter), so
+                    concurrency overlaps latency but never raises the request
+                    rate above 2 / (min + max) per second
+    'interval'      (min, max) seconds between full cycles
+    'enabled'       False for configs scraper_engine must not run: selectors not yet
+                    checked against the live site, or a retailer another scraper
+                    already writes; scraper_engine refuses to run them without --force
+    'min_keep_ratio'  a cycle that finds fewer than this share of the products in
+                    the current CSV keeps the old catalog (default 0.5)
+    'excluded_keywords'  default exclusion list for every category
+"""
+EXCLUDED_KEYWORDS = [
+    "kids", "baby", "bikini", "top", "bra", "hat", "bodysuit", "dress", "pyjama", "boys", "girls", "Knickers", "Blouse", "Cincher", "Children", "Swimsuit", "Skirt", "Briefs"
+]
+
+# Backendtemp scrapes John Lewis: it reads the categories and listing rules
+# from here but parses product pages with extraction_rules and writes through
+# its own product store. Disabled in the engine so two pipelines never write
+# johnlewisv2.csv and its price history at once.
+JOHN_LEWIS = {
+    'retailer': 'johnlewis',
+    'enabled': False,
+    'base_url': 'https://www.johnlewis.com',
+    'categories': {
+        "John Lewis Branded": {
+            "url": "https://www.johnlewis.com/brand/john-lewis/all-offers/_/N-1z141ilZ1yzvw1q?sortBy=discount",
+            "min_discount": 50.0,
+            "max_pages": 4,
+            "max_products_per_page": 192,
+            "state_file": 'category_state.json',
+            "log_tag": "John Lewis Branded"
+        },
+        "Boots": {
+            "url": "https://www.johnlewis.com/browse/women/womens-boots/all-offers/_/N-7oo3Z1yzvw1q?sortBy=discount",
+            "min_discount": 50.0,
+            "max_pages": 2,
+            "max_products_per_page": 192,
+            "state_file": 'boots_state.json',
+            "log_tag": "Boots"
+        }
+    },
+    'pagination': {'scheme': 'page_chunk', 'max_chunks': 8, 'max_requests': 50},
+    'listing': {
+        'json_ld_type': 'ItemList',
+        'json_ld_items': 'itemListElement',
+        'json_ld_url': 'url',
+        'json_ld_price': 'offers.price',
+        'card': 'div[data-testid="product-card"]',
+        'link': 'a.product-card_c-product-card__link___7IQk',
+        'price': '[data-testid="product-card-price-now"], .product-card_c-product-card__price___3n7wN',
+        'url_contains': '/p'
+    },
+    'product': {
+        'json_ld': {
+            'name': 'name',
+            'current_price': 'offers.price',
+            'availability': 'offers.availability',
+            'image': 'image'
+        },
+        'css': {
+            'name': ['h1.product-header__name'],
+            'current_price': ['.prod-price__current', "span[data-testid='price-current']"],
+            'original_price': ["span[data-testid='price-prev']", '.prod-price__was'],
+            'stock': ['.stock-availability-message'],
+            'image': ['img.product-image'],
+            'sizes': ["a[data-testid='size:option:button']"]
+        }
+    },
+    'id_pattern': r'p(\d+)$',
+    'concurrency': 4,
+    'request_delay': (2, 4),  # ~0.33 requests/s to johnlewis.com whatever the concurrency
+    'interval': (6900, 7500),
+    'excluded_keywords': EXCLUDED_KEYWORDS
+}
+
+# Not yet verified against live Selfridges pages (selectors, 'pn' pagination
+# and the ID pattern): disabled so a wrong selector can't replace the CSV the
+# app serves. Run with --force once checked.
+SELFRIDGES = {
+    'retailer': 'selfridges',
+    'enabled': False,
+    'base_url': 'https://www.selfridges.com',
+    'categories': {
+        "Women's Clothing": {
+            "url": "https://www.selfridges.com/GB/en/cat/womens/clothing/?sortBy=discount",
+            "min_discount": 60.0,
+            "max_pages": 3,
+            "max_products_per_page": 120
+        },
+        "Men's Clothing": {
+            "url": "https://www.selfridges.com/GB/en/cat/mens/clothing/?sortBy=discount",
+            "min_discount": 60.0,
+            "max_pages": 3,
+            "max_products_per_page": 120
+        }
+    },
+    'pagination': {'scheme': 'page', 'param': 'pn', 'max_requests': 20},
+    'listing': {
+        'json_ld_type': 'ItemList',
+        'json_ld_items': 'itemListElement',
+        'json_ld_url': 'item.url',
+        'json_ld_price': 'item.offers.price',
+        'card': 'div[data-testid="product-card"]',
+        'link': 'a[href*="/product/"]',
+        'price': '[data-testid="product-price-now"], .c-prod-card__cta-box-price',
+        'url_contains': '/product/'
+    },
+    'product': {
+        'json_ld': {
+            'name': 'name',
+            'brand': 'brand.name',
+            'current_price': 'offers.price',
+            'availability': 'offers.availability',
+            'image': 'image'
+        },
+        'css': {
+            'name': ['h1[data-testid="product-title"]', 'h1'],
+            'brand': ['[data-testid="product-brand"]'],
+            'current_price': ['[data-testid="product-price-now"]', '.price__now'],
+            'original_price': ['[data-testid="product-price-was"]', '.price__was'],
+            'stock': ['[data-testid="stock-message"]'],
+            'image': ['img[data-testid="product-image"]'],
+            'sizes': ['[data-testid="size-option"]']
+        }
+    },
+    'id_pattern': r'_(R\d+)$',
+    'concurrency': 4,
+    'request_delay': (1, 3),  # ~0.5 requests/s to selfridges.com
+    'interval': (3300, 3900),
+    'excluded_keywords': EXCLUDED_KEYWORDS
+}
+
+SCRAPERS = {
+    'johnlewis': JOHN_LEWIS,
+    'selfridges': SELFRIDGES
+}
@@ -0,0 +1,560 @@
+"""
+Config-driven scraper engine.
+
+A retailer is a config entry in scraper_configs.SCRAPERS (listing URL and
+pagination scheme, JSON-LD paths, CSS fallbacks, ID regex). RetailerScraper
+turns one config into listing and product parsers on top of the shared
+crawler core: one pooled HttpClient sized to the config's concurrency, the
+retry policy and per-host circuit breakers, and crawl(), which fetches
+product pages on a thread pool.
+
+A cycle writes the retailer's CSV and price history in the formats the web
+app reads (retailers.RETAILERS), updates the tiered price store and
+analytics, and publishes a catalog event:
+
+    python scraper_engine.py selfridges           # run forever
+    python scraper_engine.py selfridges --once    # one cycle
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urljoin, urlparse
+
+from bs4 import BeautifulSoup
+
+import atomic_io
+import catalog_events
+import http_client
+import keyword_filter
+import log_config
+import price_analytics
+import price_store
+import product_store
+import retailers
+import retry_policy
+import scraper_configs
+import summary_stats
+import tracing
+import watchlist
+from extraction_rules import NON_PRICE_CHARS, PRICE_RANGE_SPLIT, SIZE_PREFIX, Selector
+from product import Product
+
+CSV_HEADER = ["Product ID", "Product Name", "Current Price", "Original Price", "Discount", "Stock Status",
+              "Sizes", "URL", "Event Type", "Timestamp", "Image", "Category", "Variants"]
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+LOG_DIR = 'logs'
+STATE_DIR = 'state'
+MIN_KEEP_RATIO = 0.5  # share of the current catalog a cycle must find before it replaces the CSV
+
+USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36"
+
+logger = logging.getLogger(__name__)
+
+
+def crawl(items, worker, concurrency):
+    """
+    Run worker(index, item) for every item on a pool of `concurrency` threads
+    and return the results in input order. The worker should handle its own
+    errors; an exception propagates and stops the crawl.
+    """
+    items = list(items)
+    if concurrency <= 1 or len(items) <= 1:
+        return [worker(index, item) for index, item in enumerate(items, 1)]
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='crawl') as pool:
+        return list(pool.map(worker, range(1, len(items) + 1), items))
+
+
+def json_path(data, path):
+    """Follow a dotted path through JSON-LD; lists resolve to their first element"""
+    if not path:
+        return None
+    for key in path.split('.'):
+        if isinstance(data, list):
+            data = data[0] if data else None
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    if isinstance(data, list):
+        data = data[0] if data else None
+    return data
+
+
+def json_ld_blocks(soup):
+    """Every JSON-LD object on the page (top-level lists and @graph flattened)"""
+    blocks = []
+    for script in soup.find_all('script', attrs={'type': 'application/ld+json'}):
+        try:
+            data = json.loads(script.string or '')
+        except (json.JSONDecodeError, TypeError):
+            continue
+        for item in data if isinstance(data, list) else [data]:
+            if isinstance(item, dict):
+                blocks.append(item)
+                blocks.extend(b for b in item.get('@graph', []) if isinstance(b, dict))
+    return blocks
+
+
+def find_json_ld(soup, type_name):
+    for block in json_ld_blocks(soup):
+        block_type = block.get('@type')
+        if block_type == type_name or (isinstance(block_type, list) and type_name in block_type):
+            return block
+    return None
+
+
+def parse_price(value):
+    """Price from a JSON number or text such as '£1,299.00' or '£20 - £30'"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = NON_PRICE_CHARS.sub('', PRICE_RANGE_SPLIT.split(str(value), 1)[0])
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def normalize_url(url):
+    """Drop query string, fragment and trailing slash"""
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}{parsed.path.rstrip('/')}"
+
+
+class RetailerScraper:
+    """Listing and product extraction for one retailer config, on the shared crawler core"""
+
+    def __init__(self, key, config=None, client=None, policy=None, breakers=None, limiter=None):
+        self.key = key
+        self.config = config or scraper_configs.SCRAPERS[key]
+        self.retailer = self.config['retailer']
+        self.name = retailers.get_config(self.retailer)['name']
+        self.concurrency = self.config.get('concurrency', 1)
+        self.id_pattern = re.compile(self.config['id_pattern'])
+
+        listing = self.config['listing']
+        self.listing_selectors = {field: Selector(listing[field]) for field in ('card', 'link', 'price') if listing.get(field)}
+        self.product_selectors = {field: [Selector(css) for css in selectors]
+                                  for field, selectors in self.config['product'].get('css', {}).items()}
+
+        self.client = client or http_client.HttpClient({'concurrency': self.concurrency,
+                                                        'pool_connections': self.concurrency})
+        self.policy = policy or retry_policy.RetryPolicy(self.config.get('retry'))
+        self.breakers = breakers or retry_policy.CircuitBreakers(self.config.get('breaker'))
+        self.limiter = limiter or retry_policy.HostRateLimiter(self.config.get('request_delay', (1, 2)))
+        self.rule_hits = {}  # (field, rule) -> [attempts, hits]
+        self._lock = threading.Lock()
+
+    # Fetching
+
+    def headers(self):
+        return {
+            "User-Agent": USER_AGENT,
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+            "Accept-Language": "en-GB,en;q=0.5",
+            "Accept-Encoding": "gzip, deflate, br"
+        }
+
+    def fetch(self, url):
+        """Page HTML under the retry policy, or None if it couldn't be fetched"""
+        try:
+            with tracing.span('http', url=url):
+                return retry_policy.fetch(self.client, url, self.policy, self.breakers, headers=self.headers,
+                                          sleep=tracing.sleep, limiter=self.limiter).text
+        except retry_policy.FetchError as e:
+            level = logging.WARNING if e.status in (404, 410) else logging.ERROR
+            logger.log(level, f"[{self.key}] Failed to fetch {url}: {e}")
+            return None
+
+    # Listing pages
+
+    def listing_urls(self, category_url, page):
+        """URLs to request for one listing page (several for chunked pagination)"""
+        pagination = self.config['pagination']
+        scheme = pagination['scheme']
+        separator = '&' if '?' in category_url else '?'
+        if scheme == 'page_chunk':
+            return [f"{category_url}&page={page}&chunk={chunk}" if chunk > 1 else f"{category_url}&page={page}"
+                    for chunk in range(1, pagination.get('max_chunks', 1) + 1)]
+        if scheme == 'page':
+            return [category_url if page == 1 else f"{category_url}{separator}{pagination['param']}={page}"]
+        if scheme == 'offset':
+            offset = (page - 1) * pagination['page_size']
+            return [f"{category_url}{separator}{pagination['param']}={offset}"]
+        raise ValueError(f"Unknown pagination scheme {scheme!r} for {self.key}")
+
+    def product_id(self, url):
+        match = self.id_pattern.search(url)
+        return match.group(1) if match else None
+
+    def _listing_entry(self, url, price):
+        if not url:
+            return None
+        url_contains = self.config['listing'].get('url_contains')
+        if url_contains and url_contains not in url:
+            return None
+        url = normalize_url(urljoin(self.config['base_url'], url))
+        product_id = self.product_id(url)
+        if not product_id:
+            return None
+        return {'id': product_id, 'url': url, 'price': parse_price(price)}
+
+    def parse_listing(self, html):
+        """[{'id', 'url', 'price'}] from a listing page; price is None when the page doesn't show it"""
+        listing = self.config['listing']
+        soup = BeautifulSoup(html, 'html.parser')
+        entries = []
+
+        block = find_json_ld(soup, listing.get('json_ld_type', 'ItemList'))
+        if block:
+            items = block.get(listing.get('json_ld_items', 'itemListElement')) or []
+            for item in items:
+                entry = self._listing_entry(json_path(item, listing.get('json_ld_url', 'url')),
+                                            json_path(item, listing.get('json_ld_price')))
+                if entry:
+                    entries.append(entry)
+            self._count('listing', 'json_ld', bool(entries))
+
+        if not entries and 'link' in self.listing_selectors:
+            link_selector = self.listing_selectors['link']
+            price_selector = self.listing_selectors.get('price')
+            if 'card' in self.listing_selectors:
+                for card in self.listing_selectors['card'].select(soup):
+                    link = link_selector.select_one(card)
+                    price = price_selector.select_one(card) if price_selector else None
+                    entry = self._listing_entry(link.get('href') if link else None,
+                                                price.get_text(strip=True) if price else None)
+                    if entry:
+                        entries.append(entry)
+                self._count('listing', 'css:card', bool(entries))
+            if not entries:
+                for link in link_selector.select(soup):
+                    entry = self._listing_entry(link.get('href'), None)
+                    if entry:
+                        entries.append(entry)
+                self._count('listing', 'css:link', bool(entries))
+
+        # One entry per product, first occurrence wins
+        unique = {}
+        for entry in entries:
+            unique.setdefault(entry['id'], entry)
+        return list(unique.values())
+
+    def crawl_listing(self, category_name, category):
+        """{product id: listing entry} for a category, following the pagination scheme"""
+        found = {}
+        max_requests = self.config['pagination'].get('max_requests', 50)
+        max_per_page = category.get('max_products_per_page')
+        requests_made = 0
+        for page in range(1, category.get('max_pages', 1) + 1):
+            page_new = 0
+            for url in self.listing_urls(category['url'], page):
+                if requests_made >= max_requests:
+                    logger.warning(f"[{self.key}] Reached max listing requests ({max_requests}) for {category_name}")
+                    return found
+                with tracing.span('listing_page', retailer=self.key, category=category_name, page=page):
+                    html = self.fetch(url)
+                requests_made += 1
+                entries = self.parse_listing(html) if html else []
+                new = [e for e in entries if e['id'] not in found]
+                for entry in new:
+                    found[entry['id']] = entry
+                page_new += len(new)
+                logger.info(f"[{self.key}] {category_name} page {page}: {len(entries)} products, {len(new)} new")
+                if not new or (max_per_page and page_new >= max_per_page):
+                    break
+            if not page_new:
+                break
+        logger.info(f"[{self.key}] {category_name}: {len(found)} products listed in {requests_made} requests")
+        return found
+
+    # Product pages
+
+    def _count(self, field, rule, hit):
+        with self._lock:
+            counts = self.rule_hits.setdefault((field, rule), [0, 0])
+            counts[0] += 1
+            counts[1] += bool(hit)
+
+    def _css(self, soup, field):
+        for index, selector in enumerate(self.product_selectors.get(field, [])):
+            element = selector.select_one(soup)
+            self._count(field, f"css[{index}]", element is not None)
+            if element is not None:
+                return element
+        return None
+
+    def _text(self, soup, field):
+        element = self._css(soup, field)
+        return element.get_text(strip=True) if element is not None else None
+
+    def parse_product(self, html, url, category_name):
+        """Product from a product page, or None if it has no ID, name or price"""
+        product_config = self.config['product']
+        paths = product_config.get('json_ld', {})
+        soup = BeautifulSoup(html, 'html.parser')
+        data = find_json_ld(soup, 'Product') or {}
+
+        def field(name):
+            if name not in paths:
+                return None
+            value = json_path(data, paths[name]) if data else None
+            self._count(name, 'json_ld', value not in (None, ''))
+            return value
+
+        product_id = self.product_id(normalize_url(url))
+        name = field('name') or self._text(soup, 'name')
+        current_price = parse_price(field('current_price')) or parse_price(self._text(soup, 'current_price'))
+        original_price = parse_price(field('original_price')) or parse_price(self._text(soup, 'original_price'))
+        if not product_id or not name or current_price is None:
+            logger.warning(f"[{self.key}] Incomplete product page {url} (id={product_id}, name={name!r}, price={current_price})")
+            return None
+
+        brand = field('brand') or self._text(soup, 'brand') or retailers.get_config(self.retailer).get('brand', '')
+        if isinstance(brand, dict):
+            brand = brand.get('name', '')
+
+        availability = field('availability')
+        if availability:
+            stock_status = "In Stock" if "InStock" in str(availability) else "Out of Stock"
+        else:
+            stock_status = self._text(soup, 'stock') or "Not listed"
+
+        image = field('image')
+        if isinstance(image, dict):
+            image = image.get('url') or image.get('contentUrl')
+        if not image:
+            image_elem = self._css(soup, 'image')
+            image = image_elem.get(product_config.get('image_attr', 'src')) if image_elem is not None else ''
+
+        sizes = []
+        for selector in self.product_selectors.get('sizes', []):
+            labels = [element.get_text(strip=True) for element in selector.select(soup)]
+            sizes = [SIZE_PREFIX.sub(r'\1 \2', label) for label in labels if label]
+            if sizes:
+                break
+
+        discount = 0.0
+        if original_price and current_price and original_price > current_price > 0:
+            discount = (original_price - current_price) / original_price * 100
+
+        return Product(
+            id=product_id,
+            name=name,
+            url=url,
+            current_price=current_price,
+            original_price=original_price,
+            discount=discount,
+            stock_status=stock_status,
+            image=image or '',
+            sizes=sizes or ["One Size"],
+            category=category_name,
+            retailer=self.name,
+            brand=brand or ''
+        )
+
+    def fetch_product(self, url, category_name):
+        html = self.fetch(url)
+        if html is None:
+            return None
+        try:
+            with tracing.span('parse', url=url):
+                return self.parse_product(html, url, category_name)
+        except Exception as e:
+            logger.error(f"[{self.key}] Error parsing {url}: {e}")
+            return None
+
+    def keyword_matcher(self, category):
+        return keyword_filter.matcher_for(category.get('excluded_keywords', self.config.get('excluded_keywords', ())))
+
+    def scrape_category(self, category_name, category, urls=None):
+        """Fetch a category's product pages concurrently; products passing its discount and keyword filters"""
+        if urls is None:
+            urls = [entry['url'] for entry in self.crawl_listing(category_name, category).values()]
+        matcher = self.keyword_matcher(category)
+        min_discount = category.get('min_discount', 0)
+        total = len(urls)
+        parent = tracing.current_span()  # workers run on pool threads with their own span stacks
+
+        def worker(index, url):
+            with tracing.span('product', parent=parent, retailer=self.key, url=url, category=category_name):
+                product = self.fetch_product(url, category_name)
+            if product is None:
+                return None
+            product.excluded_keyword = matcher.search(product.name)
+            if product.excluded_keyword:
+                logger.info(f"[{self.key}] Skipping {product.name}: excluded keyword '{product.excluded_keyword}'")
+                return None
+            if product.discount < min_discount:
+                logger.debug(f"[{self.key}] Skipping {product.name}: {product.discount:.1f}% < {min_discount}%")
+                return None
+            logger.info(f"[{self.key}] Fetched {index}/{total} ({category_name}): {product.name}, £{product.current_price} ({product.discount:.1f}% off)")
+            return product
+
+        return [p for p in crawl(urls, worker, self.concurrency) if p is not None]
+
+    # Output in the web app's formats
+
+    def update_history(self, products):
+        """
+        One load and one atomic write of the retailer's price history JSON for
+        the whole cycle; sets recently_reduced on each product.
+        """
+        path = retailers.price_history_path(self.retailer)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                history = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            history = {}
+        now = datetime.now().isoformat()
+        db_path = price_store.store_path(path)
+        for product in products:
+            product.recently_reduced = price_store.apply_price(history, product.id, product.current_price,
+                                                               product.name, now)
+            price_store.record(db_path, product.id, product.current_price)
+        atomic_io.write_json(path, history, indent=2)
+        return path
+
+    def read_csv(self):
+        """The retailer's current CSV rows by product ID ({} if there isn't one yet)"""
+        try:
+            with open(retailers.csv_path(self.retailer), 'r', newline='', encoding='utf-8') as f:
+                return {row["Product ID"]: row for row in csv.DictReader(f)}
+        except FileNotFoundError:
+            return {}
+
+    def store_path(self):
+        """The retailer's product store; its CSV is an export of the store"""
+        return os.path.join(STATE_DIR, f"{self.retailer}_products.db")
+
+    def write_csv(self, products, previous=None):
+        """
+        Replace the retailer's rows in the product store with this cycle's
+        products, export the CSV and rebuild its summary. First-seen
+        timestamps carry over; Event Type is New / Price Change / Unchanged.
+        Returns (new, price_changes): new products, and (product, previous
+        price) pairs for the re-priced ones.
+        """
+        path = retailers.csv_path(self.retailer)
+        if previous is None:
+            previous = self.read_csv()
+
+        # Retailers whose brand varies per product keep it in an extra column
+        brand_column = retailers.get_config(self.retailer).get('brand_column')
+        columns = CSV_HEADER + ([brand_column] if brand_column else [])
+        now = datetime.now().strftime(TIMESTAMP_FORMAT)
+        new, changed, rows = [], [], []
+        for product in products:
+            old = previous.get(product.id)
+            if old is None:
+                event, timestamp = "New", now
+                new.append(product)
+            else:
+                timestamp = old.get("Timestamp") or now
+                previous_price = parse_price(old.get("Current Price"))
+                if previous_price != product.current_price:
+                    event = "Price Change"
+                    changed.append((product, previous_price))
+                else:
+                    event = "Unchanged"
+            rows.append(dict(zip(columns, [
+                product.id, product.name,
+                f"{product.current_price:.2f}" if product.current_price is not None else "",
+                f"{product.original_price:.2f}" if product.original_price is not None else "",
+                f"{product.discount:.2f}", product.stock_status,
+                ", ".join(product.sizes) if isinstance(product.sizes, list) else product.sizes,
+                product.url, event, timestamp, product.image, product.category,
+                ", ".join(product.variants) if product.variants else "None"
+            ] + ([product.brand] if brand_column else []))))
+
+        store = self.store_path()
+        os.makedirs(os.path.dirname(store), exist_ok=True)
+        product_store.replace_all(store, rows, columns)
+        product_store.export_csv(store, path)
+        summary_stats.rebuild_from_rows(path, rows, {p.id for p in products if p.recently_reduced})
+        return new, changed
+
+    def run_cycle(self):
+        """Scrape every category, write the catalog files and notify the web app"""
+        cycle_span = tracing.start_span('cycle', retailer=self.key)
+        products = {}
+        for category_name, category in self.config['categories'].items():
+            with tracing.span('category', retailer=self.key, category=category_name):
+                for product in self.scrape_category(category_name, category):
+                    products.setdefault(product.id, product)
+        products = list(products.values())
+
+        # A broken selector or a blocked crawl finds few or no products: don't let
+        # that replace the catalog the app is serving
+        previous = self.read_csv()
+        required = int(len(previous) * self.config.get('min_keep_ratio', MIN_KEEP_RATIO))
+        if not products or len(products) < required:
+            logger.warning(f"[{self.key}] Only {len(products)} products scraped against {len(previous)} in the current "
+                           f"catalog (need {max(required, 1)}); keeping the previous catalog")
+            tracing.end_span(cycle_span, products=len(products), kept_previous=True)
+            return {'products': len(products), 'new': 0, 'price_changes': 0}
+
+        history_path = self.update_history(products)
+        new, changed = self.write_csv(products, previous)
+        price_store.compact(price_store.store_path(history_path))
+        price_analytics.run(history_path)
+        try:
+            watchlist.match_events(watchlist.DEFAULT_PATH,
+                                   [(product, 'new', None) for product in new] +
+                                   [(product, 'price_change', previous) for product, previous in changed], self.retailer)
+        except Exception as e:
+            logger.error(f"[{self.key}] Watchlist matching failed: {e}")
+        catalog_events.publish(self.retailer, atomic_io.read_generation(retailers.csv_path(self.retailer)))
+
+        metrics = self.client.metrics()
+        logger.info(f"[{self.key}] Cycle complete: {len(products)} products, {len(new)} new, {len(changed)} price changes; "
+                    f"{metrics['requests']} requests over {metrics['connections_opened']} connections")
+        self.log_rule_hits()
+        tracing.end_span(cycle_span, products=len(products), new=len(new), changes=len(changed),
+                         http_requests=metrics['requests'])
+        return {'products': len(products), 'new': len(new), 'price_changes': len(changed)}
+
+    def log_rule_hits(self):
+        with self._lock:
+            hits = sorted(self.rule_hits.items())
+            self.rule_hits.clear()
+        for (field, rule), (attempts, hit) in hits:
+            logger.info(f"[{self.key}] Extraction [{field}] {rule}: {hit}/{attempts}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a config-driven retailer scraper")
+    parser.add_argument('retailer', choices=sorted(scraper_configs.SCRAPERS))
+    parser.add_argument('--once', action='store_true', help="run a single cycle and exit")
+    parser.add_argument('--force', action='store_true', help="run a config that is marked disabled")
+    args = parser.parse_args(argv)
+
+    log_config.setup_logging(os.path.join(LOG_DIR, f'{args.retailer}_scraper.log'), console=True)
+    tracing.configure(os.path.join(LOG_DIR, 'trace.jsonl'))
+    if not scraper_configs.SCRAPERS[args.retailer].get('enabled', True) and not args.force:
+        logger.error(f"[{args.retailer}] Scraper config is disabled (see scraper_configs); pass --force to run it")
+        return 2
+    scraper = RetailerScraper(args.retailer)
+    while True:
+        try:
+            scraper.run_cycle()
+        except Exception as e:
+            logger.error(f"[{args.retailer}] Cycle failed: {e}")
+        if args.once:
+            return 0
+        interval = random.uniform(*scraper.config.get('interval', (3600, 3600)))
+        logger.info(f"[{args.retailer}] Next cycle in {interval / 60:.1f} minutes")
+        time.sleep(interval)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""
+Persistent "have we ever seen this product" index.
+
+On disk the index is a snapshot file with one ID per line (<base>.ids) plus
+an append-only log of IDs added since the snapshot (<base>.log). Loading reads
+both once; add()/add_many() append only the IDs that are new, and compact()
+folds the log back into the snapshot once it grows past COMPACT_LOG_LINES.
+Because only new IDs are logged, compacting is a streaming copy and never
+holds the IDs in memory.
+
+In memory the IDs are an exact set by default (O(1) membership). With
+exact=False a scalable Bloom filter is kept instead: a few bytes per ID at
+millions of IDs, no false negatives, and a false-positive rate of about
+error_rate. An ID hit by a false positive is treated as seen and never
+written to disk, so after a restart it can come up as new once.
+
+    seen = SeenIndex('state/seen_ids')
+    seen.migrate_from_json('global_state.json')   # one-off import of seen_product_ids
+    if product_id not in seen: ...
+    seen.add_many(ids)
+"""
+import hashlib
+import json
+import logging
+import math
+import threading
+
+import atomic_io
+
+COMPACT_LOG_LINES = 10000
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over a bytearray (double hashing with blake2b)"""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self.array = bytearray((self.bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.array[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.array[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+
+class ScalableBloomFilter:
+    """Chain of Bloom filters, each twice the size and tighter than the last, so it never fills up"""
+
+    def __init__(self, initial_capacity=100000, error_rate=0.001, growth=2, tightening=0.5):
+        self.error_rate = error_rate
+        self.growth = growth
+        self.tightening = tightening
+        self.filters = [BloomFilter(initial_capacity, error_rate * (1 - tightening))]
+
+    def add(self, key):
+        current = self.filters[-1]
+        if current.count >= current.capacity:
+            rate = self.error_rate * (1 - self.tightening) * self.tightening ** len(self.filters)
+            current = BloomFilter(current.capacity * self.growth, rate)
+            self.filters.append(current)
+        current.add(key)
+
+    def __contains__(self, key):
+        return any(key in f for f in reversed(self.filters))
+
+    def nbytes(self):
+        return sum(len(f.array) for f in self.filters)
+
+
+class SeenIndex:
+    """Snapshot + append-log ID index with set (exact) or Bloom filter membership"""
+
+    def __init__(self, base_path, exact=True, error_rate=0.001):
+        self.snapshot_path = base_path + '.ids'
+        self.log_path = base_path + '.log'
+        self.exact = exact
+        self.error_rate = error_rate
+        self.log_lines = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _read_ids(self, path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        yield line
+        except FileNotFoundError:
+            return
+
+    def _load(self):
+        self._ids = set() if self.exact else ScalableBloomFilter(error_rate=self.error_rate)
+        self.size = 0
+        for product_id in self._read_ids(self.snapshot_path):
+            if product_id not in self:  # older files could hold duplicates
+                self._remember(product_id)
+        for product_id in self._read_ids(self.log_path):
+            if product_id not in self:
+                self._remember(product_id)
+            self.log_lines += 1
+        logger.info(f"Seen-ID index loaded: {self.size} IDs ({'set' if self.exact else 'bloom filter'})")
+
+    def _remember(self, product_id):
+        self._ids.add(product_id)
+        self.size += 1
+
+    def __contains__(self, product_id):
+        return str(product_id) in self._ids
+
+    def __len__(self):
+        return self.size
+
+    def add(self, product_id):
+        """Record an ID; True if it had not been seen before"""
+        return bool(self.add_many([product_id]))
+
+    def add_many(self, product_ids):
+        """Record IDs with one append to the log; returns the IDs that were new"""
+        with self._lock:
+            new = []
+            for product_id in product_ids:
+                product_id = str(product_id)
+                if product_id and product_id not in self._ids:
+                    self._remember(product_id)
+                    new.append(product_id)
+            if new:
+                with atomic_io.append(self.log_path, encoding='utf-8') as f:
+                    f.write(''.join(f"{product_id}\n" for product_id in new))
+                self.log_lines += len(new)
+        if self.log_lines >= COMPACT_LOG_LINES:
+            self.compact()
+        return new
+
+    def compact(self):
+        """Fold the append log into the snapshot and empty the log (the log only holds new IDs)"""
+        with self._lock:
+            if not self.log_lines:
+                return
+            written = 0
+            with atomic_io.atomic_write(self.snapshot_path, 'w', encoding='utf-8') as f:
+                for path in (self.snapshot_path, self.log_path):
+                    for product_id in self._read_ids(path):
+                        f.write(f"{product_id}\n")
+                        written += 1
+            with atomic_io.atomic_write(self.log_path, 'w', encoding='utf-8'):
+                pass
+            self.log_lines = 0
+        logger.info(f"Seen-ID index compacted to {written} IDs")
+
+    def migrate_from_json(self, json_path, key='seen_product_ids'):
+        """One-off import of an ID list from a JSON state file (e.g. global_state.json)"""
+        if self.size:
+            return 0
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                ids = json.load(f).get(key, [])
+        except (FileNotFoundError, json.JSONDecodeError, AttributeError):
+            return 0
+        added = self.add_many(ids)
+        self.compact()
+        logger.info(f"Imported {len(added)} seen IDs from {json_path}")
+        return len(added)
@@ -0,0 +1,282 @@
+/*
+ * Virtualized product grid for the retailer page.
+ *
+ * The server renders the first page of cards and embeds the same cards as
+ * JSON (#gridCards). Further pages come from /api/<retailer>/products as the
+ * user scrolls. Only the rows in (and just around) the viewport are kept in
+ * the DOM; the rows above and below are stood in for by container padding, so
+ * the scrollbar still reflects the whole result set. Card interactions go
+ * through delegated listeners on the container instead of one per card.
+ */
+(function () {
+    const container = document.getElementById('productsContainer');
+    const initial = document.getElementById('gridCards');
+    if (!container || !initial) {
+        return;
+    }
+
+    const OVERSCAN_ROWS = 2;        // rows rendered beyond each edge of the viewport
+    const MAX_CACHED_CARDS = 240;   // built card elements kept for reuse when scrolling back
+
+    const apiUrl = container.dataset.api;
+    const query = container.dataset.query;
+    const pageSize = parseInt(container.dataset.pageSize, 10);
+    let total = parseInt(container.dataset.total, 10);
+
+    const items = JSON.parse(initial.textContent);  // sparse: index -> card data
+    const pending = new Set();                      // page offsets being fetched
+    const cards = new Map();                        // index -> built element
+    const spinner = container.querySelector('.loading-spinner');
+
+    let columns = 1;
+    let rowStride = 0;
+    let rendered = { start: -1, end: -1 };
+    let frame = null;
+
+    // Adopt the server-rendered cards so the first paint isn't rebuilt
+    container.querySelectorAll('.product-link[data-index]').forEach(link => {
+        cards.set(parseInt(link.dataset.index, 10), link);
+    });
+
+    function escapeHtml(value) {
+        return String(value == null ? '' : value)
+            .replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;')
+            .replace(/"/g, '&quot;').replace(/'/g, '&#39;');
+    }
+
+    function money(value) {
+        return '£' + Number(value || 0).toFixed(2);
+    }
+
+    // The watchlist star every card carries; watchlist.js paints its state and handles clicks
+    function favoriteButton(item) {
+        return `<button type="button" class="btn-favorite" data-product="${escapeHtml(item.id)}"
+                        aria-pressed="false" title="Watch for price drops">☆</button>`;
+    }
+
+    // Mirrors the card markup in modern_retailer.html, star included
+    function buildCard(index, item) {
+        const link = document.createElement('a');
+        link.className = 'product-link';
+        link.dataset.index = index;
+        link.href = item.url;
+        link.target = '_blank';
+        link.rel = 'noopener';
+
+        const image = item.image
+            ? `<img src="${escapeHtml(item.image)}" srcset="${escapeHtml(item.srcset)}"
+                    sizes="(max-width: 768px) 50vw, 320px" loading="lazy" decoding="async"
+                    alt="${escapeHtml(item.name)}" class="product-image">
+               <div class="image-placeholder" style="display: none;">No image available</div>`
+            : '<div class="image-placeholder">No image available</div>';
+        const discount = item.discount > 0
+            ? `<div class="discount-badge">-${Number(item.discount).toFixed(1)}%</div>` : '';
+        const reduced = item.recently_reduced
+            ? '<div class="recently-reduced-badge"><span>🔥</span> Recently Reduced</div>' : '';
+        const added = item.recently_added
+            ? '<div class="recently-added-badge"><span>✨</span> Recently Added</div>' : '';
+        const original = item.original_price && item.original_price > item.current_price
+            ? `<span class="original-price">${money(item.original_price)}</span>
+               <span class="savings-amount">Save ${money(item.original_price - item.current_price)}</span>` : '';
+        const sizes = item.sizes && item.sizes !== 'See product page'
+            ? `<div class="product-sizes"><strong>Sizes:</strong> ${escapeHtml(item.sizes.slice(0, 60))}${item.sizes.length > 60 ? '...' : ''}</div>` : '';
+        const stock = (item.stock_status || '').includes('In Stock') ? 'in-stock' : 'out-of-stock';
+
+        link.innerHTML = `
+            <div class="product-card ${item.recently_reduced ? 'recently-reduced' : ''}">
+                <div class="product-image-container">
+                    ${image}
+                    <div class="product-badges">
+                        <div>${discount}</div>
+                        <div style="display: flex; flex-direction: column; gap: 8px; align-items: flex-end;">
+                            ${favoriteButton(item)}
+                            ${reduced}${added}
+                        </div>
+                    </div>
+                </div>
+                <div class="product-info">
+                    <h3 class="product-name">${escapeHtml(item.name)}</h3>
+                    <div class="product-prices">
+                        <span class="current-price">${money(item.current_price)}</span>
+                        ${original}
+                    </div>
+                    ${sizes}
+                    <div class="product-meta">
+                        <span class="stock-status ${stock}">${escapeHtml(item.stock_status)}</span>
+                        <span class="retailer-badge">${escapeHtml(item.retailer)}</span>
+                    </div>
+                </div>
+            </div>`;
+        return link;
+    }
+
+    // Keeps the grid cell while the card's page is still loading
+    function buildPlaceholder(index) {
+        const cell = document.createElement('div');
+        cell.className = 'product-link grid-placeholder';
+        cell.dataset.index = index;
+        cell.innerHTML = '<div class="product-card"></div>';
+        return cell;
+    }
+
+    function cardFor(index) {
+        let card = cards.get(index);
+        if (!card) {
+            const item = items[index];
+            if (!item) {
+                return buildPlaceholder(index);
+            }
+            card = buildCard(index, item);
+            cards.set(index, card);
+        }
+        return card;
+    }
+
+    function trimCache(start, end) {
+        if (cards.size <= MAX_CACHED_CARDS) {
+            return;
+        }
+        for (const index of cards.keys()) {
+            if (index < start || index >= end) {
+                cards.delete(index);
+                if (cards.size <= MAX_CACHED_CARDS) {
+                    break;
+                }
+            }
+        }
+    }
+
+    function fetchPage(offset) {
+        if (pending.has(offset)) {
+            return;
+        }
+        pending.add(offset);
+        fetch(`${apiUrl}?${query}&offset=${offset}&limit=${pageSize}`, { headers: { 'Accept': 'application/json' } })
+            .then(response => response.ok ? response.json() : Promise.reject(response.status))
+            .then(page => {
+                if (page.total !== total) {
+                    // The catalog was republished: the loaded cards no longer line up
+                    total = page.total;
+                    items.length = 0;
+                    cards.clear();
+                }
+                page.products.forEach((item, i) => { items[page.offset + i] = item; });
+                rendered = { start: -1, end: -1 };
+                schedule();
+            })
+            .catch(error => console.warn('Product page failed to load', offset, error))
+            .finally(() => pending.delete(offset));
+    }
+
+    function measure() {
+        const style = getComputedStyle(container);
+        columns = Math.max(1, style.gridTemplateColumns.split(' ').filter(Boolean).length);
+        const sample = container.querySelector('.product-link');
+        if (sample) {
+            rowStride = sample.getBoundingClientRect().height + (parseFloat(style.rowGap) || 0);
+        }
+    }
+
+    function render() {
+        frame = null;
+        if (!rowStride) {
+            measure();
+        }
+        const rows = Math.ceil(total / columns);
+        const top = container.getBoundingClientRect().top + window.scrollY;
+        const stride = rowStride || 1;
+        const firstRow = Math.max(0, Math.floor((window.scrollY - top) / stride) - OVERSCAN_ROWS);
+        const lastRow = Math.min(rows, Math.ceil((window.scrollY + window.innerHeight - top) / stride) + OVERSCAN_ROWS);
+        const start = Math.min(firstRow * columns, total);
+        const end = Math.min(Math.max(lastRow, firstRow) * columns, total);
+
+        for (let index = start; index < end; index += pageSize) {
+            if (!items[index]) {
+                fetchPage(Math.floor(index / pageSize) * pageSize);
+            }
+        }
+        const lastIndex = end - 1;
+        if (lastIndex >= 0 && !items[lastIndex]) {
+            fetchPage(Math.floor(lastIndex / pageSize) * pageSize);
+        }
+
+        if (start === rendered.start && end === rendered.end) {
+            return;
+        }
+        rendered = { start, end };
+
+        const nodes = [];
+        for (let index = start; index < end; index++) {
+            nodes.push(cardFor(index));
+        }
+        container.replaceChildren(...(spinner ? [spinner] : []), ...nodes);
+        container.style.paddingTop = `${firstRow * rowStride}px`;
+        container.style.paddingBottom = `${Math.max(0, rows - Math.max(lastRow, firstRow)) * rowStride}px`;
+        trimCache(start, end);
+
+        // The first render (or a view switch) may have changed the card height
+        const before = rowStride;
+        measure();
+        if (Math.abs(rowStride - before) > 1) {
+            relayout();
+        }
+    }
+
+    function schedule() {
+        if (frame === null) {
+            frame = requestAnimationFrame(render);
+        }
+    }
+
+    function relayout() {
+        rowStride = 0;
+        rendered = { start: -1, end: -1 };
+        schedule();
+    }
+
+    window.addEventListener('scroll', schedule, { passive: true });
+    window.addEventListener('resize', relayout);
+    // The grid/gallery toggle swaps the container class, which changes columns and card height
+    new MutationObserver(relayout).observe(container, { attributes: true, attributeFilter: ['class'] });
+
+    // Delegated listeners: broken images, and the 3D tilt on the card under the pointer
+    container.addEventListener('error', event => {
+        const img = event.target;
+        if (img.tagName === 'IMG' && img.classList.contains('product-image')) {
+            img.style.display = 'none';
+            img.nextElementSibling.style.display = 'flex';
+        }
+    }, true);
+
+    let tilted = null;
+    container.addEventListener('pointermove', event => {
+        const card = event.target.closest('.product-card');
+        if (tilted && tilted !== card) {
+            tilted.style.transform = '';
+        }
+        tilted = card;
+        if (!card) {
+            return;
+        }
+        const rect = card.getBoundingClientRect();
+        const rotateX = (event.clientY - rect.top - rect.height / 2) / 20;
+        const rotateY = (rect.width / 2 - (event.clientX - rect.left)) / 20;
+        card.style.transform = `perspective(1000px) rotateX(${rotateX}deg) rotateY(${rotateY}deg) translateZ(10px)`;
+    });
+    container.addEventListener('pointerleave', () => {
+        if (tilted) {
+            tilted.style.transform = '';
+            tilted = null;
+        }
+    });
+
+    // Images that failed before this script ran
+    container.querySelectorAll('img.product-image').forEach(img => {
+        if (img.complete && img.naturalWidth === 0 && img.getAttribute('src')) {
+            img.style.display = 'none';
+            img.nextElementSibling.style.display = 'flex';
+        }
+    });
+
+    render();
+})();
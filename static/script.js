@@ -54,26 +54,5 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     });
 
-    // Favorite Button Logic
-    document.querySelectorAll('.btn-favorite').forEach(button => {
-        button.addEventListener('click', () => {
-            const product = button.getAttribute('data-product');
-            let favorites = document.cookie
-                .split('; ')
-                .find(row => row.startsWith('favorites='));
-            favorites = favorites ? JSON.parse(decodeURIComponent(favorites.split('=')[1])) : [];
-
-            if (favorites.includes(product)) {
-                favorites = favorites.filter(fav => fav !== product);
-                button.textContent = '☆';
-                button.closest('.deal-card').dataset.favorite = 'false';
-            } else {
-                favorites.push(product);
-                button.textContent = '★';
-                button.closest('.deal-card').dataset.favorite = 'true';
-            }
-
-            document.cookie = `favorites=${encodeURIComponent(JSON.stringify(favorites))}; path=/; max-age=3600`;
-        });
-    });
+    // Favorites (the star on each card) are kept server-side: see watchlist.js
 });
@@ -0,0 +1,159 @@
+/*
+ * Watchlist client: the star on each card, "Save search" and the alerts
+ * banner, backed by the per-browser watchlist in the app (/api/watchlist,
+ * /api/searches, /api/alerts). One delegated click listener covers every
+ * card, including the ones the virtualized grid adds later.
+ */
+(function () {
+    const MAX_BANNER_ALERTS = 5;
+    const watched = new Set();
+    let ready = null;  // settles once the server has issued this browser's user cookie
+
+    function api(method, url, body) {
+        return fetch(url, {
+            method,
+            headers: body ? { 'Content-Type': 'application/json' } : {},
+            body: body ? JSON.stringify(body) : undefined,
+            credentials: 'same-origin'
+        }).then(response => response.json().then(data => response.ok ? data : Promise.reject(data.error || response.status)));
+    }
+
+    function paint(button) {
+        const on = watched.has(button.dataset.product);
+        button.textContent = on ? '★' : '☆';
+        button.setAttribute('aria-pressed', on ? 'true' : 'false');
+        button.title = on ? 'Stop watching' : 'Watch for price drops';
+        const card = button.closest('.product-card, .deal-card');
+        if (card) {
+            card.dataset.favorite = on ? 'true' : 'false';
+        }
+    }
+
+    function paintAll(root) {
+        root.querySelectorAll('.btn-favorite').forEach(paint);
+    }
+
+    function toggleWatch(button) {
+        const productId = button.dataset.product;
+        const watching = watched.has(productId);
+        const request = ready.then(() => watching
+            ? api('DELETE', `/api/watchlist/${encodeURIComponent(productId)}`)
+            : api('POST', '/api/watchlist', { product_id: productId }));
+        button.disabled = true;
+        request
+            .then(() => {
+                if (watching) {
+                    watched.delete(productId);
+                } else {
+                    watched.add(productId);
+                }
+                document.querySelectorAll(`.btn-favorite[data-product="${CSS.escape(productId)}"]`).forEach(paint);
+            })
+            .catch(error => { button.title = String(error); })
+            .finally(() => { button.disabled = false; });
+    }
+
+    function saveSearch(button) {
+        const form = button.closest('form');
+        const data = new FormData(form);
+        const label = button.textContent;
+        ready.then(() => api('POST', '/api/searches', {
+            term: data.get('search') || '',
+            category: data.get('category') || '',
+            retailer: button.dataset.retailer || ''
+        }))
+            .then(() => { button.textContent = '🔔 Saved'; })
+            .catch(error => { button.textContent = String(error); })
+            .finally(() => setTimeout(() => { button.textContent = label; }, 2500));
+    }
+
+    function escapeHtml(value) {
+        return String(value == null ? '' : value)
+            .replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;')
+            .replace(/"/g, '&quot;').replace(/'/g, '&#39;');
+    }
+
+    function showAlerts(alerts) {
+        const unseen = alerts.filter(alert => !alert.seen_at);
+        if (!unseen.length) {
+            return;
+        }
+        const banner = document.createElement('div');
+        banner.className = 'watch-alerts';
+        const items = unseen.slice(0, MAX_BANNER_ALERTS).map(alert => {
+            const reason = alert.kind === 'watch' ? 'Price drop' : alert.event === 'new' ? 'New match' : 'Reduced match';
+            const was = alert.previous_price ? ` (was £${Number(alert.previous_price).toFixed(2)})` : '';
+            return `<li>${reason}: <a href="${escapeHtml(alert.url)}" target="_blank" rel="noopener">${escapeHtml(alert.name)}</a>
+                    £${Number(alert.price || 0).toFixed(2)}${was}</li>`;
+        }).join('');
+        const more = unseen.length > MAX_BANNER_ALERTS ? `<p>and ${unseen.length - MAX_BANNER_ALERTS} more</p>` : '';
+        banner.innerHTML = `<button type="button" class="watch-alerts-dismiss" aria-label="Dismiss">×</button>
+                            <strong>Watchlist alerts</strong><ul>${items}</ul>${more}`;
+        banner.dataset.upTo = unseen[0].id;
+        document.body.appendChild(banner);
+    }
+
+    document.addEventListener('click', event => {
+        const favorite = event.target.closest('.btn-favorite');
+        if (favorite) {
+            // The star sits inside the card's product link
+            event.preventDefault();
+            event.stopPropagation();
+            toggleWatch(favorite);
+            return;
+        }
+        const save = event.target.closest('.btn-save-search');
+        if (save) {
+            event.preventDefault();
+            saveSearch(save);
+            return;
+        }
+        const dismiss = event.target.closest('.watch-alerts-dismiss');
+        if (dismiss) {
+            const banner = dismiss.closest('.watch-alerts');
+            api('POST', '/api/alerts/seen', { up_to: parseInt(banner.dataset.upTo, 10) }).catch(() => {});
+            banner.remove();
+        }
+    });
+
+    // Cards added later (grid scrolling, view switches) get their star state
+    new MutationObserver(mutations => {
+        mutations.forEach(mutation => mutation.addedNodes.forEach(node => {
+            if (node.nodeType === Node.ELEMENT_NODE) {
+                paintAll(node);
+            }
+        }));
+    }).observe(document.body, { childList: true, subtree: true });
+
+    // Favourites used to live in a one-hour cookie: move any left over to the server.
+    // Runs after the first request has issued the user cookie, one POST at a time,
+    // so every favourite lands on the same user.
+    function migrateCookie() {
+        const cookie = document.cookie.split('; ').find(row => row.startsWith('favorites='));
+        if (!cookie) {
+            return Promise.resolve();
+        }
+        let legacy = [];
+        try {
+            legacy = JSON.parse(decodeURIComponent(cookie.split('=')[1]));
+        } catch (error) {
+            legacy = [];
+        }
+        return legacy.reduce((chain, productId) => chain.then(() =>
+            api('POST', '/api/watchlist', { product_id: String(productId) })
+                .then(() => watched.add(String(productId)))
+                .catch(() => {})), Promise.resolve())
+            .then(() => { document.cookie = 'favorites=; path=/; max-age=0'; });
+    }
+
+    // One request first: it issues the user cookie every later request shares
+    ready = api('GET', '/api/watchlist')
+        .then(data => data.watches.forEach(watch => watched.add(watch.product_id)));
+
+    ready
+        .then(migrateCookie)
+        .then(() => paintAll(document))
+        .then(() => api('GET', '/api/alerts'))
+        .then(data => showAlerts(data.alerts))
+        .catch(error => console.warn('Watchlist unavailable', error));
+})();
@@ -0,0 +1,220 @@
+"""
+Precomputed catalog summary for the homepage and retailer stats.
+
+The scraper updates the summary as it appends rows to a retailer CSV, so the
+Flask app can render stats without parsing the product data. The summary
+lives next to the CSV (johnlewisv2.csv -> johnlewisv2_summary.json) and
+records the CSV size/mtime it was built from; if the CSV changes behind its
+back (e.g. the Selfridges export), the app rebuilds it once.
+
+Appended rows are queued with ingest_row() and folded in by flush(), one load
+and one write per batch of alerts rather than per row:
+
+    summary_stats.ingest_row(csv_path, row, recently_reduced)
+    summary_stats.flush(csv_path)
+"""
+import csv
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+
+import atomic_io
+
+RECENTLY_ADDED_HOURS = 24
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+logger = logging.getLogger(__name__)
+
+_pending = {}  # csv_path -> {'source': summary stamp when the batch started, 'rows': [(row, recently_reduced)]}
+_pending_lock = threading.Lock()
+
+
+def summary_path(csv_path):
+    """Path of the summary record that belongs to a CSV file"""
+    return os.path.splitext(csv_path)[0] + '_summary.json'
+
+
+def source_signature(csv_path):
+    """Size/mtime of a CSV as stamped on its summary (None if missing)"""
+    try:
+        st = os.stat(csv_path)
+        return [st.st_size, st.st_mtime_ns]
+    except OSError:
+        return None
+
+
+def _to_float(value):
+    try:
+        return float(value) if value not in (None, '', 'N/A') else 0.0
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def empty_summary():
+    return {
+        'total': 0,
+        'max_discount': 0.0,
+        'discount_sum': 0.0,
+        'discounted_count': 0,
+        'total_savings': 0.0,
+        'recently_reduced': 0,
+        'added_timestamps': [],
+        'source': None
+    }
+
+
+def _prune_added(summary, now=None):
+    """Drop added timestamps that have fallen out of the recently added window"""
+    cutoff = ((now or datetime.now()) - timedelta(hours=RECENTLY_ADDED_HOURS)).strftime(TIMESTAMP_FORMAT)
+    summary['added_timestamps'] = [ts for ts in summary['added_timestamps'] if ts >= cutoff]
+
+
+def add_product(summary, discount, current_price, original_price, timestamp='', recently_reduced=False):
+    """Fold one product into the running aggregates"""
+    discount = _to_float(discount)
+    current_price = _to_float(current_price)
+    original_price = _to_float(original_price)
+
+    summary['total'] += 1
+    summary['max_discount'] = max(summary['max_discount'], discount)
+    if discount > 0:
+        summary['discount_sum'] += discount
+        summary['discounted_count'] += 1
+    if original_price and current_price:
+        summary['total_savings'] += original_price - current_price
+    if recently_reduced:
+        summary['recently_reduced'] += 1
+    if timestamp:
+        summary['added_timestamps'].append(timestamp)
+
+
+def load_summary(csv_path):
+    """Load the summary for a CSV, or None if it is missing or out of date"""
+    try:
+        with open(summary_path(csv_path), 'r', encoding='utf-8') as f:
+            summary = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+    if summary.get('source') != source_signature(csv_path):
+        return None
+    return summary
+
+
+def save_summary(csv_path, summary, source=None):
+    """Write the summary, stamped with the CSV signature it was built from (default: the current one)"""
+    _prune_added(summary)
+    summary['source'] = source if source is not None else source_signature(csv_path)
+    try:
+        atomic_io.write_json(summary_path(csv_path), summary)
+    except Exception as e:
+        logger.error(f"Failed to save summary for {csv_path}: {e}")
+
+
+def ingest_row(csv_path, row, recently_reduced=False):
+    """
+    Queue one row that has been appended to the CSV; flush() adds it to the
+    summary. row uses the CSV column names ('Discount', 'Current Price', ...).
+    """
+    with _pending_lock:
+        batch = _pending.get(csv_path)
+        if batch is None:
+            base = load_summary_for_update(csv_path)
+            batch = _pending[csv_path] = {'source': base.get('source') if base else None, 'rows': []}
+        batch['rows'].append((row, recently_reduced))
+
+
+def flush(csv_path):
+    """Fold the queued rows into the summary with one load and one write"""
+    with _pending_lock:
+        batch = _pending.pop(csv_path, None)
+    if not batch:
+        return
+    summary = load_summary_for_update(csv_path)
+    if summary is None or summary.get('source') != batch['source']:
+        # First run against an existing CSV, or the app rebuilt the summary
+        # from a CSV that already has some of these rows: rescan it once
+        rebuild_from_csv(csv_path)
+        return
+    for row, recently_reduced in batch['rows']:
+        add_product(
+            summary,
+            row.get('Discount'),
+            row.get('Current Price'),
+            row.get('Original Price'),
+            row.get('Timestamp', ''),
+            recently_reduced
+        )
+    save_summary(csv_path, summary)
+
+
+def load_summary_for_update(csv_path):
+    """Load the summary as the base for an incremental update (None if unreadable)"""
+    try:
+        with open(summary_path(csv_path), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def rebuild_from_csv(csv_path):
+    """Recompute the summary by scanning the CSV once"""
+    rows = []
+    if os.path.exists(csv_path):
+        with open(csv_path, 'r', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+    reduced_ids = {row.get('Product ID', '') for row in rows if row.get('Recently Reduced') == 'Yes'}
+    return rebuild_from_rows(csv_path, rows, reduced_ids)
+
+
+def rebuild_from_rows(csv_path, rows, recently_reduced_ids=()):
+    """Recompute the summary from a full set of CSV rows (after a rewrite)"""
+    with _pending_lock:
+        _pending.pop(csv_path, None)  # queued rows are among these rows
+    summary = empty_summary()
+    for row in rows:
+        add_product(
+            summary,
+            row.get('Discount'),
+            row.get('Current Price'),
+            row.get('Original Price'),
+            row.get('Timestamp', ''),
+            row.get('Product ID', '') in recently_reduced_ids
+        )
+    save_summary(csv_path, summary)
+    return summary
+
+
+def rebuild_from_products(csv_path, products, source):
+    """
+    Recompute the summary from already-parsed Product records (app fallback).
+    source is the signature of the CSV the products were read from, so a
+    summary built from an older catalog is rebuilt once the catalog catches up.
+    """
+    summary = empty_summary()
+    for p in products:
+        add_product(
+            summary,
+            p.discount,
+            p.current_price,
+            p.original_price,
+            p.timestamp,
+            p.recently_reduced
+        )
+    save_summary(csv_path, summary, source)
+    return summary
+
+
+def stats_from_summary(summary, now=None):
+    """Homepage/retailer stats dict computed from a summary record"""
+    _prune_added(summary, now)
+    return {
+        'total': summary['total'],
+        'max_discount': summary['max_discount'],
+        'avg_discount': round(summary['discount_sum'] / max(1, summary['discounted_count']), 1),
+        'total_savings': summary['total_savings'],
+        'recently_reduced': summary['recently_reduced'],
+        'recently_added': len(summary['added_timestamps'])
+    }
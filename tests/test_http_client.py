@@ -0,0 +1,101 @@
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip('requests')
+
+import http_client  # noqa: E402
+
+ETAG = '"v1"'
+
+
+@pytest.fixture
+def server():
+    """Local keep-alive server: / answers 200 (304 when revalidated), anything else 404"""
+    connections = set()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            connections.add(self.client_address)
+            if self.path != '/':
+                status, body = 404, b'not found'
+            elif self.headers.get('If-None-Match') == ETAG:
+                status, body = 304, b''
+            else:
+                status, body = 200, b'<html><body>ok</body></html>'
+            self.send_response(status)
+            self.send_header('ETag', ETAG)
+            if status != 304:
+                self.send_header('Content-Type', 'text/html')
+                self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}', connections
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def client():
+    client = http_client.HttpClient({'concurrency': 2})
+    yield client
+    client.close()
+
+
+def test_requests_reuse_one_connection(client, server):
+    base, connections = server
+    for _ in range(10):
+        assert client.get(base + '/').status_code == 200
+
+    metrics = client.metrics()
+    assert len(connections) == 1
+    assert metrics['requests'] == 10
+    assert metrics['connections_opened'] == 1
+    assert metrics['reuse_ratio'] == 0.9
+
+
+def test_conditional_get_returns_304(client, server):
+    base, _ = server
+    first = client.get(base + '/')
+    revalidated = client.get(base + '/', headers={'If-None-Match': first.headers['ETag']})
+
+    assert revalidated.status_code == 304
+    assert revalidated.content == b''
+
+
+def test_missing_page_is_404(client, server):
+    base, _ = server
+    response = client.get(base + '/missing')
+
+    assert response.status_code == 404
+    with pytest.raises(http_client.requests.exceptions.HTTPError):
+        response.raise_for_status()
+
+
+def test_dns_cache_is_opt_in_and_installed_once():
+    real = http_client._real_getaddrinfo
+    try:
+        http_client.HttpClient().close()
+        assert socket.getaddrinfo is real
+
+        http_client.HttpClient({'dns_cache_ttl': 300}).close()
+        assert socket.getaddrinfo is http_client._cached_getaddrinfo
+
+        # A later client can't change the TTL or remove the cache
+        http_client.HttpClient({'dns_cache_ttl': 5}).close()
+        http_client.HttpClient({'dns_cache_ttl': 0}).close()
+        assert socket.getaddrinfo is http_client._cached_getaddrinfo
+        assert http_client._dns_ttl == 300
+    finally:
+        http_client.uninstall_dns_cache()
+    assert socket.getaddrinfo is real
@@ -0,0 +1,141 @@
+import io
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip('requests')
+flask = pytest.importorskip('flask')
+PIL_Image = pytest.importorskip('PIL.Image')
+
+import image_proxy  # noqa: E402
+
+
+@pytest.fixture
+def origin():
+    """Local image server that records every request it gets"""
+    buffer = io.BytesIO()
+    PIL_Image.new('RGB', (476, 634), (200, 30, 60)).save(buffer, 'JPEG')
+    body = buffer.getvalue()
+    fetches = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            fetches.append(self.path)
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/jpeg')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}/product.jpg?wid=476&hei=634', fetches
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_proxy, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(image_proxy, '_sources', {})
+    app = flask.Flask(__name__)
+    app.add_url_rule('/img/<key>', 'image', image_proxy.serve)
+    return app
+
+
+def test_thumbnail_is_fetched_from_origin_once(app, origin):
+    source, fetches = origin
+    client = app.test_client()
+    with app.test_request_context():
+        path = image_proxy.image_url(source, 240)
+
+    first = client.get(path)
+    second = client.get(path)
+
+    assert first.status_code == 200
+    assert first.mimetype == 'image/webp'
+    assert 'immutable' in first.headers['Cache-Control']
+    assert second.status_code == 200
+    assert second.data == first.data
+    assert len(fetches) == 1
+
+
+def test_revalidation_returns_304(app, origin):
+    source, fetches = origin
+    client = app.test_client()
+    with app.test_request_context():
+        path = image_proxy.image_url(source)
+
+    first = client.get(path)
+    revalidated = client.get(path, headers={'If-None-Match': first.headers['ETag']})
+
+    assert revalidated.status_code == 304
+    assert len(fetches) == 1
+
+
+def test_unknown_hash_is_404(app, origin):
+    _, fetches = origin
+    response = app.test_client().get('/img/' + '0' * 20)
+
+    assert response.status_code == 404
+    assert fetches == []
+
+
+def test_srcset_lists_every_width(app, origin):
+    source, _ = origin
+    with app.test_request_context():
+        srcset = image_proxy.image_srcset(source)
+
+    assert [entry.rsplit(' ', 1)[1] for entry in srcset.split(', ')] == [f'{w}w' for w in image_proxy.WIDTHS]
+
+
+def test_without_pillow_images_are_hot_linked(app, origin, monkeypatch):
+    source, fetches = origin
+    monkeypatch.setattr(image_proxy, 'Image', None)
+    with app.test_request_context():
+        assert image_proxy.image_url(source) == source
+        assert image_proxy.image_srcset(source) == ''
+        key = image_proxy.register(source)
+
+    response = app.test_client().get(f'/img/{key}')
+
+    assert response.status_code == 302
+    assert response.headers['Location'] == source
+    assert fetches == []
+
+
+def test_first_request_writes_every_width_and_no_original(app, origin, tmp_path):
+    source, fetches = origin
+    with app.test_request_context():
+        path = image_proxy.image_url(source, 240)
+        key = image_proxy.register(source)
+
+    assert app.test_client().get(path).status_code == 200
+
+    cached = sorted(p.name for p in tmp_path.rglob(f'{key}*'))
+    assert cached == sorted([f'{key}.src'] + [f'{key}_{w}.webp' for w in image_proxy.WIDTHS])
+    assert len(fetches) == 1
+
+
+def test_sweep_evicts_least_recently_served_first(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_proxy, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(image_proxy, 'MAX_CACHE_BYTES', 250)
+    now = 1_000_000
+    for name, age in [('old_240.webp', 300), ('mid_240.webp', 200), ('new_240.webp', 100), ('stale.src', 10 ** 9)]:
+        path = tmp_path / 'ab' / name
+        path.parent.mkdir(exist_ok=True)
+        path.write_bytes(b'x' * 100)
+        os.utime(path, (now - age, now - age))
+
+    assert image_proxy.sweep(now) == 1
+    assert sorted(p.name for p in tmp_path.rglob('*')
+                  if p.is_file()) == ['mid_240.webp', 'new_240.webp', 'stale.src']
+
+    monkeypatch.setattr(image_proxy, 'MAX_CACHE_AGE', 150)
+    assert image_proxy.sweep(now) == 1
+    assert not (tmp_path / 'ab' / 'mid_240.webp').exists()
@@ -0,0 +1,266 @@
+"""
+Lightweight tracing spans for the SaleScout scraper.
+
+Each span is written as one JSON line to the trace file when it finishes, so a
+slow cycle can be broken down into sleeps, network, parsing and disk writes.
+The file is rotated at MAX_TRACE_BYTES (trace.jsonl.1, .2, ...), keeping
+TRACE_BACKUPS old files; summarize reads the backups too.
+
+Summarize a trace file with:
+    python tracing.py summarize logs/trace.jsonl --top 15
+"""
+import argparse
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+
+TRACE_FILE = os.path.join('logs', 'trace.jsonl')
+MAX_TRACE_BYTES = 50 * 1024 * 1024
+TRACE_BACKUPS = 3
+
+_state = threading.local()
+_write_lock = threading.Lock()
+_trace_file = TRACE_FILE
+_trace_bytes = None  # size of the current trace file, read on the first write
+_max_bytes = MAX_TRACE_BYTES
+_backups = TRACE_BACKUPS
+_enabled = True
+
+
+def configure(trace_file=None, enabled=True, max_bytes=MAX_TRACE_BYTES, backups=TRACE_BACKUPS):
+    """Set the trace file path, its rotation size/backups, and enable/disable span recording"""
+    global _trace_file, _trace_bytes, _max_bytes, _backups, _enabled
+    if trace_file:
+        _trace_file = trace_file
+    _trace_bytes = None
+    _max_bytes = max_bytes
+    _backups = backups
+    _enabled = enabled
+    directory = os.path.dirname(_trace_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+
+def _stack():
+    if not hasattr(_state, 'stack'):
+        _state.stack = []
+    return _state.stack
+
+
+def _backup_paths(trace_file, backups):
+    """Rotated files, newest first"""
+    return [f'{trace_file}.{n}' for n in range(1, backups + 1)]
+
+
+def _rotate():
+    paths = _backup_paths(_trace_file, _backups)
+    for older, newer in zip(reversed(paths), reversed([_trace_file] + paths[:-1])):
+        if os.path.exists(newer):
+            os.replace(newer, older)
+
+
+def _write(record):
+    global _trace_bytes
+    line = (json.dumps(record, default=str) + '\n').encode('utf-8')
+    with _write_lock:
+        if _trace_bytes is None:
+            try:
+                _trace_bytes = os.path.getsize(_trace_file)
+            except OSError:
+                _trace_bytes = 0
+        if _max_bytes and _trace_bytes and _trace_bytes + len(line) > _max_bytes:
+            if _backups:
+                _rotate()
+            else:
+                os.remove(_trace_file)
+            _trace_bytes = 0
+        with open(_trace_file, 'ab') as f:
+            f.write(line)
+        _trace_bytes += len(line)
+
+
+def current_span():
+    """The innermost open span on this thread, or None"""
+    stack = _stack()
+    return stack[-1] if stack else None
+
+
+def start_span(name, parent=None, **attrs):
+    """
+    Open a span and make it the parent of spans started after it on this
+    thread. Work handed to another thread passes its parent explicitly
+    (parent=current_span() captured before submitting), since each thread
+    has its own span stack.
+    """
+    stack = _stack()
+    if parent is None:
+        parent = stack[-1] if stack else None
+    span = {
+        'trace_id': parent['trace_id'] if parent else uuid.uuid4().hex[:16],
+        'span_id': uuid.uuid4().hex[:16],
+        'parent_id': parent['span_id'] if parent else None,
+        'name': name,
+        'start': time.time(),
+        '_perf': time.perf_counter(),
+        'attrs': attrs
+    }
+    stack.append(span)
+    return span
+
+
+def end_span(span, error=None, **attrs):
+    """Close a span and append it to the trace file"""
+    stack = _stack()
+    if any(s is span for s in stack):
+        # Children left open by an early return are closed (and recorded) with their parent
+        while stack[-1] is not span:
+            _finish(stack.pop())
+        stack.pop()
+    _finish(span, error, attrs)
+
+
+def _finish(span, error=None, attrs=None):
+    if attrs:
+        span['attrs'].update(attrs)
+    if not _enabled:
+        return
+
+    record = {
+        'trace_id': span['trace_id'],
+        'span_id': span['span_id'],
+        'parent_id': span['parent_id'],
+        'name': span['name'],
+        'start': round(span['start'], 3),
+        'duration_ms': round((time.perf_counter() - span['_perf']) * 1000, 2),
+        'attrs': span['attrs']
+    }
+    if error is not None:
+        record['error'] = str(error)[:300]
+
+    try:
+        _write(record)
+    except OSError:
+        # Tracing must never take the scraper down
+        pass
+
+
+@contextmanager
+def span(name, parent=None, **attrs):
+    """Context manager that records a span around the enclosed block"""
+    current = start_span(name, parent=parent, **attrs)
+    try:
+        yield current
+    except BaseException as e:
+        end_span(current, error=e)
+        raise
+    else:
+        end_span(current)
+
+
+def sleep(seconds, reason=''):
+    """time.sleep that shows up in the trace as a 'sleep' span"""
+    with span('sleep', reason=reason, seconds=round(seconds, 2)):
+        time.sleep(seconds)
+
+
+# Trace file analysis
+
+def load_spans(trace_file, backups=TRACE_BACKUPS):
+    """Read all span records from a trace file and its rotated backups (oldest first), skipping torn lines"""
+    spans = []
+    for path in reversed([trace_file] + _backup_paths(trace_file, backups)):
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    spans.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return spans
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(spans, top=10):
+    """Return per-stage timing stats and the slowest URL spans"""
+    by_stage = defaultdict(list)
+    for record in spans:
+        by_stage[record['name']].append(record)
+
+    stages = []
+    for name, records in by_stage.items():
+        durations = sorted(r['duration_ms'] for r in records)
+        stages.append({
+            'stage': name,
+            'count': len(durations),
+            'total_s': round(sum(durations) / 1000, 2),
+            'mean_ms': round(sum(durations) / len(durations), 1),
+            'p95_ms': round(_percentile(durations, 95), 1),
+            'max_ms': round(durations[-1], 1),
+            'errors': sum(1 for r in records if r.get('error'))
+        })
+    stages.sort(key=lambda s: s['total_s'], reverse=True)
+
+    # Outliers: URL spans slower than the p95 of their own stage
+    outliers = []
+    for name, records in by_stage.items():
+        durations = sorted(r['duration_ms'] for r in records)
+        threshold = _percentile(durations, 95)
+        for r in records:
+            url = r.get('attrs', {}).get('url')
+            if url and r['duration_ms'] >= threshold:
+                outliers.append({
+                    'stage': name,
+                    'url': url,
+                    'duration_ms': r['duration_ms'],
+                    'error': r.get('error')
+                })
+    outliers.sort(key=lambda o: o['duration_ms'], reverse=True)
+
+    return {'stages': stages, 'outliers': outliers[:top]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Summarize SaleScout scraper traces')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    summary_parser = subparsers.add_parser('summarize', help='Show slowest stages and outlier URLs')
+    summary_parser.add_argument('trace_file', nargs='?', default=TRACE_FILE)
+    summary_parser.add_argument('--top', type=int, default=10, help='Number of outlier URLs to show')
+    summary_parser.add_argument('--last-cycle', action='store_true', help='Only include the most recent cycle')
+    args = parser.parse_args(argv)
+
+    spans = load_spans(args.trace_file)
+    if args.last_cycle:
+        cycles = [s for s in spans if s['name'] == 'cycle']
+        if cycles:
+            last_trace = cycles[-1]['trace_id']
+            spans = [s for s in spans if s['trace_id'] == last_trace]
+
+    if not spans:
+        print(f"No spans found in {args.trace_file}")
+        return
+
+    result = summarize(spans, top=args.top)
+    print(f"{'Stage':<18}{'Count':>8}{'Total (s)':>12}{'Mean (ms)':>12}{'p95 (ms)':>12}{'Max (ms)':>12}{'Errors':>8}")
+    for s in result['stages']:
+        print(f"{s['stage']:<18}{s['count']:>8}{s['total_s']:>12}{s['mean_ms']:>12}{s['p95_ms']:>12}{s['max_ms']:>12}{s['errors']:>8}")
+
+    if result['outliers']:
+        print("\nSlowest URLs (>= p95 of their stage):")
+        for o in result['outliers']:
+            suffix = f"  [error: {o['error']}]" if o['error'] else ""
+            print(f"  {o['duration_ms']:>10.1f} ms  {o['stage']:<14} {o['url']}{suffix}")
+
+
+if __name__ == '__main__':
+    main()
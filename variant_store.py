@@ -0,0 +1,187 @@
+"""
+Hierarchical product -> variants price store (SQLite).
+
+A multi-colour product page is written in one transaction by record_page():
+every variant row is upserted and the parent product row is refreshed with
+its cheapest variant and "any variant dropped / recently reduced" flags, so
+those questions are a primary-key lookup rather than a scan of the history.
+The parent summary covers only the variants on the page just recorded; rows
+for variants the retailer has since removed are kept for their history but
+no longer count.
+
+Variant IDs keep the scraper's existing form, {base_product_id}_{Variant_Name}
+(see variant_id()). Recently reduced follows update_price_history's rule: at
+least 5% below the first price seen, or lower than the price two checks ago.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+RECENT_REDUCTION_THRESHOLD = 5.0
+RECENT_PRICES = 3
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    base_id TEXT PRIMARY KEY,
+    name TEXT,
+    variant_count INTEGER NOT NULL DEFAULT 0,
+    cheapest_variant TEXT,
+    cheapest_price REAL,
+    any_dropped INTEGER NOT NULL DEFAULT 0,
+    any_recently_reduced INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS products_dropped ON products (any_dropped) WHERE any_dropped = 1;
+CREATE TABLE IF NOT EXISTS variants (
+    base_id TEXT NOT NULL,
+    variant_id TEXT NOT NULL,
+    name TEXT,
+    initial_price REAL,
+    current_price REAL,
+    original_price REAL,
+    discount REAL,
+    recent_prices TEXT,
+    dropped INTEGER NOT NULL DEFAULT 0,
+    recently_reduced INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL,
+    PRIMARY KEY (base_id, variant_id)
+) WITHOUT ROWID;
+"""
+
+_connections = {}
+_lock = threading.Lock()
+
+
+def variant_id(base_product_id, variant_name):
+    """Stable per-variant ID, matching the IDs the scraper already writes"""
+    return f"{base_product_id}_{variant_name.replace(' ', '_')[:20]}"
+
+
+def connect(path):
+    with _lock:
+        conn = _connections.get(path)
+        if conn is None:
+            conn = sqlite3.connect(path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(_SCHEMA)
+            _connections[path] = conn
+        return conn
+
+
+def _reduced(initial_price, recent_prices):
+    current = recent_prices[-1]
+    if initial_price and current is not None and initial_price > 0:
+        if (initial_price - current) / initial_price * 100 >= RECENT_REDUCTION_THRESHOLD:
+            return True
+    priced = [p for p in recent_prices if p is not None]
+    return len(recent_prices) >= RECENT_PRICES and len(priced) >= 2 and priced[-1] < priced[0]
+
+
+def record_page(path, base_id, base_name, variants, now=None):
+    """
+    Store every variant of one product page in a single transaction.
+
+    variants: dicts with name, current_price, original_price, discount
+    Returns {variant_id: recently_reduced}.
+    """
+    now = now if now is not None else time.time()
+    conn = connect(path)
+    result = {}
+    with _lock, conn:
+        existing = {row['variant_id']: row for row in conn.execute(
+            'SELECT variant_id, initial_price, current_price, recent_prices FROM variants WHERE base_id = ?', (base_id,))}
+
+        rows = {}  # variant_id -> row; a repeated variant name keeps its last entry
+        for variant in variants:
+            vid = variant_id(base_id, variant['name'])
+            price = variant.get('current_price')
+            previous = existing.get(vid)
+            if previous is None:
+                initial_price, recent, dropped = price, [price], False
+            else:
+                initial_price = previous['initial_price'] if previous['initial_price'] else price
+                recent = (json.loads(previous['recent_prices'] or '[]') + [price])[-RECENT_PRICES:]
+                dropped = price is not None and previous['current_price'] is not None and price < previous['current_price']
+            reduced = previous is not None and _reduced(initial_price, recent)
+            result[vid] = reduced
+            rows[vid] = (base_id, vid, variant['name'], initial_price, price, variant.get('original_price'),
+                         variant.get('discount'), json.dumps(recent), int(dropped), int(reduced), now)
+
+        conn.executemany("""
+            INSERT INTO variants (base_id, variant_id, name, initial_price, current_price, original_price,
+                                  discount, recent_prices, dropped, recently_reduced, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (base_id, variant_id) DO UPDATE SET
+                name = excluded.name,
+                initial_price = excluded.initial_price,
+                current_price = excluded.current_price,
+                original_price = excluded.original_price,
+                discount = excluded.discount,
+                recent_prices = excluded.recent_prices,
+                dropped = excluded.dropped,
+                recently_reduced = excluded.recently_reduced,
+                updated_at = excluded.updated_at
+        """, list(rows.values()))
+
+        # Parent summary from this page's variants only, not every variant ever stored
+        priced = [row for row in rows.values() if row[4] is not None]
+        cheapest = min(priced, key=lambda row: row[4]) if priced else None
+        conn.execute("""
+            INSERT INTO products (base_id, name, variant_count, cheapest_variant, cheapest_price,
+                                  any_dropped, any_recently_reduced, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (base_id) DO UPDATE SET
+                name = excluded.name,
+                variant_count = excluded.variant_count,
+                cheapest_variant = excluded.cheapest_variant,
+                cheapest_price = excluded.cheapest_price,
+                any_dropped = excluded.any_dropped,
+                any_recently_reduced = excluded.any_recently_reduced,
+                updated_at = excluded.updated_at
+        """, (base_id, base_name, len(rows), cheapest[2] if cheapest else None,
+              cheapest[4] if cheapest else None, int(any(row[8] for row in rows.values())),
+              int(any(row[9] for row in rows.values())), now))
+    return result
+
+
+def get_product(path, base_id):
+    """Parent summary row as a dict, or None"""
+    conn = connect(path)
+    with _lock:
+        row = conn.execute('SELECT * FROM products WHERE base_id = ?', (base_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def cheapest_variant(path, base_id):
+    """(variant name, price) of the cheapest variant, or None"""
+    product = get_product(path, base_id)
+    if not product or product['cheapest_variant'] is None:
+        return None
+    return product['cheapest_variant'], product['cheapest_price']
+
+
+def any_variant_dropped(path, base_id):
+    """True if any variant's price fell at its last check"""
+    product = get_product(path, base_id)
+    return bool(product and product['any_dropped'])
+
+
+def dropped_products(path):
+    """Base IDs with at least one variant that dropped at its last check (partial index)"""
+    conn = connect(path)
+    with _lock:
+        return [row['base_id'] for row in conn.execute('SELECT base_id FROM products WHERE any_dropped = 1')]
+
+
+def get_variants(path, base_id):
+    """Variant rows for a product, cheapest first"""
+    conn = connect(path)
+    with _lock:
+        rows = conn.execute('SELECT * FROM variants WHERE base_id = ? ORDER BY current_price', (base_id,)).fetchall()
+    return [dict(row) for row in rows]
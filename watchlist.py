@@ -0,0 +1,306 @@
+"""
+Per-user watchlist, saved searches and alerts (SQLite).
+
+Users are the anonymous browser IDs the web app hands out. A watch pins one
+product ID; a saved search is a term and/or category (optionally a retailer
+and minimum discount), with the same word matching as the scraper's keyword
+filter (plurals included).
+
+The scraper calls match_events() with the products it found new or re-priced
+in a cycle. Matching never scans the whole watchlist: watches are looked up
+by product ID, and saved searches by an indexed key. A search's key is its
+longest term word, or its category when it has no term. Each product
+produces a handful of candidate keys from its name and category words, so
+only searches that share a key are checked in full. Matches are stored as
+alerts (one per user, product and price), and the app serves them from
+/api/alerts.
+
+    watchlist.add_watch(db, user_id, product)
+    watchlist.add_search(db, user_id, term='linen shirt', min_discount=30)
+    watchlist.match_events(db, [(product, 'price_change', previous_price), ...])
+"""
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import keyword_filter
+
+# Shared by the app and the scraper, so anchored to this directory rather than the CWD
+DEFAULT_PATH = os.environ.get('SALESCOUT_WATCHLIST_DB',
+                              os.path.join(os.path.dirname(os.path.abspath(__file__)), 'state', 'watchlist.db'))
+MAX_WATCHES = 500          # per user
+MAX_SEARCHES = 50          # per user
+MAX_ALERTS = 200           # newest alerts kept per user
+LOOKUP_CHUNK = 500         # IN (...) parameters per query
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS watches (
+    user_id TEXT NOT NULL,
+    product_id TEXT NOT NULL,
+    retailer TEXT NOT NULL DEFAULT '',
+    name TEXT NOT NULL DEFAULT '',
+    added_price REAL,
+    added_at REAL NOT NULL,
+    PRIMARY KEY (user_id, product_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS watches_product ON watches (product_id);
+CREATE TABLE IF NOT EXISTS searches (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    term TEXT NOT NULL DEFAULT '',
+    category TEXT NOT NULL DEFAULT '',
+    retailer TEXT NOT NULL DEFAULT '',
+    min_discount REAL NOT NULL DEFAULT 0,
+    match_key TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS searches_user ON searches (user_id);
+CREATE INDEX IF NOT EXISTS searches_match_key ON searches (match_key);
+CREATE TABLE IF NOT EXISTS alerts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    product_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    search_id INTEGER,
+    event TEXT NOT NULL,
+    price REAL,
+    previous_price REAL,
+    data TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    seen_at REAL,
+    UNIQUE (user_id, product_id, price)
+);
+CREATE INDEX IF NOT EXISTS alerts_user ON alerts (user_id, id);
+"""
+
+_connections = {}
+_lock = threading.RLock()
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def connect(path=DEFAULT_PATH):
+    """Shared connection per database path (created with the schema on first use)"""
+    with _lock:
+        conn = _connections.get(path)
+        if conn is None:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=5000')  # the scraper and the app write to the same file
+            conn.executescript(_SCHEMA)
+            _connections[path] = conn
+        return conn
+
+
+def _words(text):
+    return _WORD.findall((text or '').lower())
+
+
+def _normalize(text):
+    return ' '.join(_words(text))
+
+
+def _match_key(term, category):
+    """Index key for a saved search: its longest term word, else its category"""
+    words = _words(term)
+    if words:
+        return 'w:' + max(words, key=len)
+    return 'c:' + _normalize(category)
+
+
+def _candidate_keys(product):
+    """Every key a saved search matching this product could be filed under"""
+    keys = set()
+    for word in _words(product.name):
+        keys.add('w:' + word)
+        # 'dresses' also matches a search for 'dress' (keyword_filter's e?s plurals)
+        if word.endswith('es'):
+            keys.add('w:' + word[:-2])
+        if word.endswith('s'):
+            keys.add('w:' + word[:-1])
+    # Category searches match whole words of the category, so file under every run of words
+    category_words = _words(product.category)
+    for start in range(len(category_words)):
+        for end in range(start + 1, len(category_words) + 1):
+            keys.add('c:' + ' '.join(category_words[start:end]))
+    return keys
+
+
+def _search_matches(search, product, retailer):
+    """Full check of a candidate search against a product"""
+    if search['retailer'] and retailer and search['retailer'] != retailer:
+        return False
+    if search['min_discount'] and (product.discount or 0) < search['min_discount']:
+        return False
+    if search['category'] and not re.search(r'\b' + re.escape(search['category']) + r'\b', _normalize(product.category)):
+        return False
+    return all(keyword_filter.matcher_for((word,)).search(product.name) for word in _words(search['term']))
+
+
+def _chunks(values):
+    values = list(values)
+    for start in range(0, len(values), LOOKUP_CHUNK):
+        yield values[start:start + LOOKUP_CHUNK]
+
+
+# Watches
+
+def add_watch(path, user_id, product, retailer=''):
+    """Watch a product; False if the user's watchlist is full"""
+    conn = connect(path)
+    with _lock, conn:
+        count = conn.execute('SELECT COUNT(*) FROM watches WHERE user_id = ?', (user_id,)).fetchone()[0]
+        exists = conn.execute('SELECT 1 FROM watches WHERE user_id = ? AND product_id = ?',
+                              (user_id, product.id)).fetchone()
+        if count >= MAX_WATCHES and not exists:
+            return False
+        conn.execute('INSERT INTO watches (user_id, product_id, retailer, name, added_price, added_at) '
+                     'VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (user_id, product_id) DO NOTHING',
+                     (user_id, product.id, retailer, product.name, product.current_price, time.time()))
+    return True
+
+
+def remove_watch(path, user_id, product_id):
+    conn = connect(path)
+    with _lock, conn:
+        return conn.execute('DELETE FROM watches WHERE user_id = ? AND product_id = ?', (user_id, product_id)).rowcount > 0
+
+
+def get_watches(path, user_id):
+    with _lock:
+        rows = connect(path).execute('SELECT product_id, retailer, name, added_price, added_at FROM watches '
+                                     'WHERE user_id = ? ORDER BY added_at DESC', (user_id,))
+        return [dict(row) for row in rows]
+
+
+# Saved searches
+
+def add_search(path, user_id, term='', category='', retailer='', min_discount=0):
+    """Save a search; returns its ID, or None when it's empty or the user has too many"""
+    term, category = _normalize(term), _normalize(category)
+    if not term and not category:
+        return None
+    conn = connect(path)
+    with _lock, conn:
+        count = conn.execute('SELECT COUNT(*) FROM searches WHERE user_id = ?', (user_id,)).fetchone()[0]
+        if count >= MAX_SEARCHES:
+            return None
+        cursor = conn.execute('INSERT INTO searches (user_id, term, category, retailer, min_discount, match_key, created_at) '
+                              'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                              (user_id, term, category, retailer or '', float(min_discount or 0),
+                               _match_key(term, category), time.time()))
+        return cursor.lastrowid
+
+
+def remove_search(path, user_id, search_id):
+    conn = connect(path)
+    with _lock, conn:
+        return conn.execute('DELETE FROM searches WHERE user_id = ? AND id = ?', (user_id, search_id)).rowcount > 0
+
+
+def get_searches(path, user_id):
+    with _lock:
+        rows = connect(path).execute('SELECT id, term, category, retailer, min_discount, created_at FROM searches '
+                                     'WHERE user_id = ? ORDER BY id', (user_id,))
+        return [dict(row) for row in rows]
+
+
+# Matching
+
+def match_events(path, events, retailer=''):
+    """
+    Turn a cycle's events into alerts. events are (product, event, previous_price)
+    with event 'new' or 'price_change'. Watches alert on price drops; saved
+    searches on new products and price drops. Returns the number of alerts stored.
+    """
+    drops = {}
+    interesting = {}
+    for product, event, previous_price in events:
+        dropped = (event == 'price_change' and product.current_price is not None
+                   and previous_price is not None and product.current_price < previous_price)
+        if event == 'new' or dropped:
+            interesting[product.id] = (product, event, previous_price)
+            if dropped:
+                drops[product.id] = interesting[product.id]
+    if not interesting:
+        return 0
+
+    conn = connect(path)
+    alerts = []
+    with _lock:
+        for chunk in _chunks(drops):
+            rows = conn.execute(f"SELECT user_id, product_id FROM watches WHERE product_id IN ({','.join('?' * len(chunk))})",
+                                chunk)
+            for row in rows:
+                alerts.append((row['user_id'], 'watch', None, *drops[row['product_id']]))
+
+        by_key = {}
+        for product_id, entry in interesting.items():
+            for key in _candidate_keys(entry[0]):
+                by_key.setdefault(key, []).append(entry)
+        for chunk in _chunks(by_key):
+            rows = conn.execute(f"SELECT * FROM searches WHERE match_key IN ({','.join('?' * len(chunk))})", chunk)
+            for search in rows:
+                for product, event, previous_price in by_key[search['match_key']]:
+                    if _search_matches(search, product, retailer):
+                        alerts.append((search['user_id'], 'search', search['id'], product, event, previous_price))
+
+        stored = 0
+        now = time.time()
+        with conn:
+            for user_id, kind, search_id, product, event, previous_price in alerts:
+                data = {
+                    'name': product.name,
+                    'url': product.url,
+                    'image': product.image,
+                    'retailer': retailer,
+                    'original_price': product.original_price,
+                    'discount': product.discount,
+                }
+                stored += conn.execute(
+                    'INSERT OR IGNORE INTO alerts (user_id, product_id, kind, search_id, event, price, previous_price, data, created_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (user_id, product.id, kind, search_id, event, product.current_price, previous_price,
+                     json.dumps(data), now)).rowcount
+            if stored:
+                users = {alert[0] for alert in alerts}
+                conn.executemany('DELETE FROM alerts WHERE user_id = ? AND id NOT IN '
+                                 '(SELECT id FROM alerts WHERE user_id = ? ORDER BY id DESC LIMIT ?)',
+                                 [(user_id, user_id, MAX_ALERTS) for user_id in users])
+    if stored:
+        logger.info(f"Watchlist: {stored} alerts from {len(interesting)} new/reduced products")
+    return stored
+
+
+# Alerts
+
+def get_alerts(path, user_id, since_id=0, limit=50):
+    """The user's alerts newer than since_id, newest first"""
+    with _lock:
+        rows = connect(path).execute('SELECT * FROM alerts WHERE user_id = ? AND id > ? ORDER BY id DESC LIMIT ?',
+                                     (user_id, since_id, limit))
+        alerts = []
+        for row in rows:
+            alert = dict(row)
+            alert.update(json.loads(alert.pop('data')))
+            del alert['user_id']
+            alerts.append(alert)
+        return alerts
+
+
+def mark_seen(path, user_id, up_to_id):
+    conn = connect(path)
+    with _lock, conn:
+        return conn.execute('UPDATE alerts SET seen_at = ? WHERE user_id = ? AND id <= ? AND seen_at IS NULL',
+                            (time.time(), user_id, up_to_id)).rowcount